@@ -0,0 +1,254 @@
+"""
+Offline benchmarks for the research pipelines (no API keys, no network).
+
+Each case runs a pipeline as a subprocess with RESEARCH_PROVIDERS=replay:
+Perplexity calls go over HTTP to an in-process StubServer
+(shared/stub_server.py), and Gemini calls are answered in the subprocess by
+ReplayLLMClient. Both replay recorded runs/* artifacts (or synthetic text),
+with injected latency/errors. Runs, outputs and caches go to a temp dir.
+
+Cases:
+  overhead     market research + prediction pipeline at 0 ms provider latency
+               (pure orchestration cost: process start, imports, parsing, I/O)
+  latency      market research at --latency-ms per provider call
+  concurrency  gap research (critic asks --questions questions) at
+               PERPLEXITY_MAX_CONCURRENCY 1/2/4/8: stage.gap_research time
+  retries      market research against a stand-in failing --error-rate of
+               requests with --error-status (503; 429 adds Retry-After: 1):
+               retries taken, run success rate and the Perplexity rate
+               limiter's queueing/AIMD counters (shared/rate_limit.py)
+
+Usage:
+  python benchmarks/bench_pipelines.py [--cases overhead,latency,concurrency,retries]
+      [--latency-ms 200] [--questions 8] [--error-rate 0.3] [--error-status 503] [--repeat 3] [--json out.json]
+      [--async]   (market research runs use AsyncResearchAgent)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TOOLS_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(TOOLS_ROOT))
+from shared.providers import FaultInjector, get_fixtures
+from shared.stub_server import StubServer
+from shared.telemetry import METRICS_FILENAME
+
+MARKET_RESEARCH = TOOLS_ROOT / "market_research" / "MarketResearch.py"
+PREDICTION_PIPELINE = TOOLS_ROOT / "prediction_questions" / "prediction_market_pipeline.py"
+TOPIC = "Offline benchmark: B2B payments infrastructure in India"
+ALL_CASES = ("overhead", "latency", "concurrency", "retries")
+
+
+def _base_env(stub: StubServer, work: Path) -> dict[str, str]:
+    env = dict(os.environ)
+    # Blank (not just unset) so the tools' .env loader can't fill them back in.
+    for key in ("PERPLEXITY_API_KEY", "GEMINI_API_KEY", "NOTION_TOKEN", "NOTION_PARENT_PAGE_ID", "SUPABASE_URL",
+                "SUPABASE_SERVICE_ROLE_KEY"):
+        env[key] = ""
+    env.update({
+        "RESEARCH_PROVIDERS": "replay",
+        "PERPLEXITY_BASE_URL": stub.base_url,
+        "RESEARCH_RUNS_DIR": str(work / "runs"),
+        "RESEARCH_OUTPUT_DIR": str(work / "outputs"),
+        "PREDICTION_RUNS_DIR": str(work / "prediction_runs"),
+        "RESEARCH_CACHE_PATH": str(work / "cache.sqlite3"),
+        "SOURCE_INDEX_PATH": str(work / "source_index.sqlite3"),
+        "FEED_CACHE_PATH": str(work / "feed_cache.sqlite3"),
+        "FEED_MAX_AGE_MIN": "0",  # revalidate every run (304s) so each run still exercises the RSS path
+        "PERPLEXITY_CACHE_DIR": str(work / "perplexity_cache"),
+        "PERPLEXITY_USE_CACHE": "0",
+        "GEMINI_USE_CACHE": "0",
+        "REPLAY_LATENCY_MS": "0",
+        "REPLAY_ERROR_RATE": "0",
+    })
+    return env
+
+
+def _run(cmd: list[str], env: dict[str, str], runs_dir: Path | None = None) -> dict:
+    """Run one pipeline; returns wall time, exit code and (market research) the run's metrics.json."""
+    before = set(runs_dir.glob("*")) if runs_dir is not None and runs_dir.exists() else set()
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    result = {"wall_s": time.perf_counter() - t0, "ok": proc.returncode == 0, "metrics": None}
+    if proc.returncode != 0:
+        result["stderr"] = proc.stderr[-2000:]
+    if runs_dir is not None and runs_dir.exists():
+        for run_dir in set(runs_dir.glob("*")) - before:
+            path = run_dir / METRICS_FILENAME
+            if path.exists():
+                result["metrics"] = json.loads(path.read_text(encoding="utf-8"))
+            if (run_dir / "run.log").exists():
+                result["log"] = (run_dir / "run.log").read_text(encoding="utf-8")
+    return result
+
+
+def _research(env: dict[str, str], **overrides: str) -> dict:
+    return _run([sys.executable, str(MARKET_RESEARCH), TOPIC], {**env, **overrides}, Path(env["RESEARCH_RUNS_DIR"]))
+
+
+def _prediction(env: dict[str, str], stub: StubServer) -> dict:
+    return _run(
+        [sys.executable, str(PREDICTION_PIPELINE), "--inc42", f"{stub.base_url}/rss/inc42", "--entrackr", f"{stub.base_url}/rss/entrackr"],
+        env,
+    )
+
+
+def _stage_ms(result: dict, name: str) -> float | None:
+    metrics = result.get("metrics") or {}
+    return (metrics.get("by_name", {}).get(name) or {}).get("total_ms")
+
+
+def _median(values: list[float | None]) -> float | None:
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def _fmt(v: float | None, unit: str = "s") -> str:
+    if v is None:
+        return "-"
+    return f"{v:.2f}{unit}" if unit == "s" else f"{v:.0f}{unit}"
+
+
+def bench_overhead(stub: StubServer, env: dict[str, str], repeat: int) -> list[dict]:
+    stub.faults = FaultInjector()
+    rows = []
+    for name, fn in (("market_research", lambda: _research(env)), ("prediction_pipeline", lambda: _prediction(env, stub))):
+        results = [fn() for _ in range(repeat)]
+        rows.append({
+            "case": "overhead", "pipeline": name, "ok": sum(r["ok"] for r in results), "runs": repeat,
+            "wall_s": _median([r["wall_s"] for r in results]),
+            "run_ms": _median([(r.get("metrics") or {}).get("totals", {}).get("wall_ms") for r in results]),
+            "errors": [r["stderr"] for r in results if not r["ok"]][:1],
+        })
+    return rows
+
+
+def bench_latency(stub: StubServer, env: dict[str, str], repeat: int, latency_ms: float) -> list[dict]:
+    stub.faults = FaultInjector(latency_ms=latency_ms)
+    results = [_research(env, REPLAY_LATENCY_MS=str(latency_ms)) for _ in range(repeat)]
+    return [{
+        "case": "latency", "pipeline": "market_research", "latency_ms": latency_ms, "ok": sum(r["ok"] for r in results), "runs": repeat,
+        "wall_s": _median([r["wall_s"] for r in results]),
+        "run_ms": _median([(r.get("metrics") or {}).get("totals", {}).get("wall_ms") for r in results]),
+        "writer_ms": _median([_stage_ms(r, "stage.writer") for r in results]),
+        "errors": [r["stderr"] for r in results if not r["ok"]][:1],
+    }]
+
+
+def bench_concurrency(stub: StubServer, env: dict[str, str], repeat: int, latency_ms: float, questions: int) -> list[dict]:
+    stub.faults = FaultInjector(latency_ms=latency_ms)
+    rows = []
+    for workers in (1, 2, 4, 8):
+        results = [
+            _research(env, REPLAY_CRITIC_REJECTIONS="1", REPLAY_GAP_QUESTIONS=str(questions),
+                      PERPLEXITY_MAX_CONCURRENCY=str(workers), PERPLEXITY_MIN_INTERVAL_S="0")
+            for _ in range(repeat)
+        ]
+        rows.append({
+            "case": "concurrency", "pipeline": "market_research", "workers": workers, "questions": questions,
+            "latency_ms": latency_ms, "ok": sum(r["ok"] for r in results), "runs": repeat,
+            "gap_research_ms": _median([_stage_ms(r, "stage.gap_research") for r in results]),
+            "wall_s": _median([r["wall_s"] for r in results]),
+            "errors": [r["stderr"] for r in results if not r["ok"]][:1],
+        })
+    base = rows[0]["gap_research_ms"]
+    for row in rows:
+        row["speedup"] = round(base / row["gap_research_ms"], 2) if base and row["gap_research_ms"] else None
+    return rows
+
+
+def _rate_limit_stats(result: dict) -> dict:
+    # Logged by the run at exit: "[RateLimit] {...}".
+    for line in reversed(result.get("log", "").splitlines()):
+        if "[RateLimit] " in line:
+            return json.loads(line.split("[RateLimit] ", 1)[1]).get("perplexity", {})
+    return {}
+
+
+def bench_retries(stub: StubServer, env: dict[str, str], repeat: int, error_rate: float, questions: int,
+                  error_status: int = 503) -> list[dict]:
+    results = []
+    served_before = dict(stub.stats)
+    stub.error_status = error_status
+    stub.retry_after_s = 1 if error_status == 429 else None
+    for seed in range(repeat):
+        # A fresh seed per run, so the success rate reflects different failure patterns.
+        stub.faults = FaultInjector(error_rate=error_rate, seed=seed)
+        results.append(_research(env, REPLAY_CRITIC_REJECTIONS="1", REPLAY_GAP_QUESTIONS=str(questions),
+                                 PERPLEXITY_RETRY_BACKOFF_S="0.05", PERPLEXITY_MIN_INTERVAL_S="0"))
+    return [{
+        "case": "retries", "pipeline": "market_research", "error_rate": error_rate, "ok": sum(r["ok"] for r in results), "runs": repeat,
+        "success_rate": round(sum(r["ok"] for r in results) / repeat, 2),
+        "requests": stub.stats["requests"] - served_before["requests"],
+        "injected_errors": stub.stats["errors"] - served_before["errors"],
+        "retries": sum((r.get("metrics") or {}).get("totals", {}).get("retries", 0) for r in results),
+        "error_status": error_status,
+        "limiter_decreases": sum(_rate_limit_stats(r).get("decreases", 0) for r in results),
+        "limiter_pauses": sum(_rate_limit_stats(r).get("pauses", 0) for r in results),
+        "queue_ms": sum((r.get("metrics") or {}).get("totals", {}).get("queue_ms", 0) for r in results),
+        "wall_s": _median([r["wall_s"] for r in results]),
+        "errors": [r["stderr"] for r in results if not r["ok"]][:1],
+    }]
+
+
+def _print_rows(rows: list[dict]) -> None:
+    for row in rows:
+        extra = {k: v for k, v in row.items() if k not in ("case", "pipeline", "wall_s", "run_ms", "errors")}
+        timing = f"wall={_fmt(row.get('wall_s'))}"
+        if row.get("run_ms") is not None:
+            timing += f" | in-run={_fmt(row['run_ms'], 'ms')}"
+        print(f"{row['case']:<12} {row['pipeline']:<20} {timing} | " + " | ".join(f"{k}={v}" for k, v in extra.items()))
+        for err in row.get("errors") or []:
+            print("    first failure:\n      " + err.strip().replace("\n", "\n      "))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks against replayed providers")
+    parser.add_argument("--cases", default=",".join(ALL_CASES), help=f"Comma-separated subset of {', '.join(ALL_CASES)}")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Injected latency per provider call")
+    parser.add_argument("--questions", type=int, default=8, help="Gap questions per critic rejection")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="Share of Perplexity requests failing (retries case)")
+    parser.add_argument("--error-status", type=int, default=503, help="Status of failed requests (retries case; 429 adds Retry-After)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (the median is reported)")
+    parser.add_argument("--json", default="", help="Optional path to write all results as JSON")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Run market research with the asyncio agent")
+    args = parser.parse_args()
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(ALL_CASES)
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(sorted(unknown))}")
+
+    print(f"Fixtures: {json.dumps(get_fixtures().stats())}")
+    rows: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="bench_pipelines_") as tmp, StubServer() as stub:
+        env = _base_env(stub, Path(tmp))
+        if args.use_async:
+            env["RESEARCH_ASYNC"] = "1"
+        for case in cases:
+            if case == "overhead":
+                case_rows = bench_overhead(stub, env, args.repeat)
+            elif case == "latency":
+                case_rows = bench_latency(stub, env, args.repeat, args.latency_ms)
+            elif case == "concurrency":
+                case_rows = bench_concurrency(stub, env, args.repeat, args.latency_ms, args.questions)
+            else:
+                case_rows = bench_retries(stub, env, args.repeat, args.error_rate, args.questions, args.error_status)
+            _print_rows(case_rows)
+            rows.extend(case_rows)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+        print(f"Results: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import os
-import requests
+import sys
 import json
 import time
 import logging
 import uuid
-import hashlib
 from datetime import datetime, timezone
 from pathlib import Path
 import re
 import argparse
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
 
 # Supabase client (optional - only needed for --publish)
 try:
@@ -18,24 +21,25 @@ except ImportError:
     _SUPABASE_AVAILABLE = False
     SupabaseClient = None  # type: ignore
 
-# Gemini client compatibility:
-# - Preferred: google-genai (import path: from google import genai)
-# - Fallback: google-generativeai (import path: import google.generativeai as genai)
-try:
-    from google import genai as _genai  # type: ignore
-    from google.genai import types as _genai_types  # type: ignore
-    _GEMINI_BACKEND = "google-genai"
-except Exception:
-    _genai = None
-    _genai_types = None
-    _GEMINI_BACKEND = "google-generativeai"
-    import google.generativeai as _genai_fallback  # type: ignore
+# Shared infrastructure (pooled HTTP client, Gemini client, ...) lives in ../shared
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from shared.http_client import get_http_client, get_async_http_client, aclose_async_http_client, TRANSPORT_ERRORS
+from shared.llm_client import get_llm_client, GEMINI_BACKEND as _GEMINI_BACKEND, EMBED_MODEL
+from shared.providers import perplexity_chat_url, provider_mode, require_key
+from shared.rate_limit import get_limiter, limiter_stats
+from shared.research_cache import get_research_cache, cache_key, PERPLEXITY_NAMESPACE, PERPLEXITY_MODEL
+from shared.source_index import get_source_index, normalize_url
+from shared.telemetry import Tracer, current_span, METRICS_FILENAME, TRACE_FILENAME
+from research_context import ResearchContext, estimate_tokens
+from notion_blocks import iter_blocks
+from notion_export import NotionExporter
 
 # --- CONFIGURATION ---
 REPO_ROOT = Path(__file__).resolve().parents[1]  # for shared .env
 MARKET_RESEARCH_DIR = Path(__file__).resolve().parent  # for MR-owned data dirs
-RUNS_DIR = MARKET_RESEARCH_DIR / "runs"
-OUTPUT_DIR = MARKET_RESEARCH_DIR / "outputs"
+# Overridable so benchmarks/offline replays don't write into the real run history.
+RUNS_DIR = Path(os.getenv("RESEARCH_RUNS_DIR") or MARKET_RESEARCH_DIR / "runs")
+OUTPUT_DIR = Path(os.getenv("RESEARCH_OUTPUT_DIR") or MARKET_RESEARCH_DIR / "outputs")
 DEFAULT_CACHE_DIR = MARKET_RESEARCH_DIR / "cache" / "perplexity"
 
 def _load_env_file(path: str = ".env") -> None:
@@ -69,13 +73,8 @@ def _load_env_file(path: str = ".env") -> None:
 
 _load_env_file(str(REPO_ROOT / ".env"))
 
-PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not PERPLEXITY_API_KEY:
-    raise RuntimeError("Missing PERPLEXITY_API_KEY. Add it to your .env or environment variables.")
-if not GEMINI_API_KEY:
-    raise RuntimeError("Missing GEMINI_API_KEY. Add it to your .env or environment variables.")
+# PERPLEXITY_API_KEY / GEMINI_API_KEY are read on use via require_key(), so this module
+# imports without credentials (RESEARCH_PROVIDERS=replay needs none; see shared/providers.py).
 
 # Supabase config (optional - only needed for --publish)
 # Uses same env vars as the backend
@@ -95,7 +94,8 @@ def _get_supabase_client() -> "SupabaseClient":
 
 def _get_research_community_id(supabase: "SupabaseClient") -> str:
     """Get the 'market-research' community ID from forum_communities."""
-    result = supabase.table("forum_communities").select("id").eq("slug", "market-research").single().execute()
+    with get_limiter("supabase").permit():
+        result = supabase.table("forum_communities").select("id").eq("slug", "market-research").single().execute()
     if not result.data:
         raise RuntimeError("Market Research community not found. Run migration 113 first.")
     return result.data["id"]
@@ -133,7 +133,8 @@ def publish_research_to_forum(
         "post_type": "research_report",
     }
     
-    result = supabase.table("forum_posts").insert(post_data).execute()
+    with get_limiter("supabase").permit():
+        result = supabase.table("forum_posts").insert(post_data).execute()
     post_id = result.data[0]["id"] if result.data else None
     
     if logger:
@@ -157,8 +158,42 @@ PERPLEXITY_READ_TIMEOUT_S = float(os.getenv("PERPLEXITY_READ_TIMEOUT_S", "180"))
 PERPLEXITY_MAX_RETRIES = int(os.getenv("PERPLEXITY_MAX_RETRIES", "3"))
 PERPLEXITY_RETRY_BACKOFF_S = float(os.getenv("PERPLEXITY_RETRY_BACKOFF_S", "2.0"))
 PERPLEXITY_USE_CACHE = os.getenv("PERPLEXITY_USE_CACHE", "1").strip() not in ("0", "false", "False", "no", "NO")
+# Responses live in the shared research cache (shared/research_cache.py); this dir only
+# holds legacy loose-file entries, which are migrated into it on first lookup.
 PERPLEXITY_CACHE_DIR = Path(os.getenv("PERPLEXITY_CACHE_DIR", str(DEFAULT_CACHE_DIR)))
+# Opt-in semantic tier: serve a cached answer for a rephrased query when the cosine
+# similarity of the query embeddings is >= SEMANTIC_CACHE_THRESHOLD (within the cache TTL).
+SEMANTIC_CACHE = (os.getenv("SEMANTIC_CACHE") or "").strip() in ("1", "true", "True", "yes", "YES")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Cited sources are recorded across runs in the source index (shared/source_index.py): normalized
+# URL, topics and the findings that cited them (SOURCE_INDEX=0 disables it). Opt-in
+# SOURCE_INDEX_ANSWERS answers a search from indexed facts instead of Perplexity when at least
+# SOURCE_INDEX_MIN_FACTS of them, cited within SOURCE_INDEX_MAX_AGE_DAYS, cover
+# SOURCE_INDEX_MIN_COVERAGE of the question's terms.
+SOURCE_INDEX = (os.getenv("SOURCE_INDEX") or "1").strip() not in ("0", "false", "False", "no", "NO")
+SOURCE_INDEX_ANSWERS = (os.getenv("SOURCE_INDEX_ANSWERS") or "").strip() in ("1", "true", "True", "yes", "YES")
+SOURCE_INDEX_MIN_FACTS = int(os.getenv("SOURCE_INDEX_MIN_FACTS", "5"))
+SOURCE_INDEX_MIN_COVERAGE = float(os.getenv("SOURCE_INDEX_MIN_COVERAGE", "0.8"))
+SOURCE_INDEX_MAX_AGE_DAYS = float(os.getenv("SOURCE_INDEX_MAX_AGE_DAYS", "30"))
+# Opt-in: reuse Gemini responses for byte-identical prompts (handy for reruns/debugging).
+GEMINI_USE_CACHE = (os.getenv("GEMINI_USE_CACHE") or "").strip() in ("1", "true", "True", "yes", "YES")
 SEED_CACHE_FROM_RUN_ID = (os.getenv("SEED_CACHE_FROM_RUN_ID") or "").strip()
+# Gap questions from the critic are researched concurrently. Every provider call (Perplexity,
+# Gemini, Notion, Supabase) goes through that provider's process-wide RateLimiter
+# (shared/rate_limit.py): PERPLEXITY_MAX_CONCURRENCY / PERPLEXITY_MIN_INTERVAL_S,
+# GEMINI_MAX_CONCURRENCY, NOTION_MIN_INTERVAL_S, ... with AIMD backoff on 429/5xx.
+# Async agent (AsyncResearchAgent, --async or RESEARCH_ASYNC=1): one event loop per run. A run
+# that exceeds RESEARCH_DEADLINE_S is cancelled (continue it with --resume); a Perplexity call
+# that exceeds PERPLEXITY_CALL_TIMEOUT_S (retries included) fails its stage. 0 = no limit.
+RESEARCH_ASYNC = (os.getenv("RESEARCH_ASYNC") or "").strip() in ("1", "true", "True", "yes", "YES")
+RESEARCH_DEADLINE_S = float(os.getenv("RESEARCH_DEADLINE_S", "0"))
+PERPLEXITY_CALL_TIMEOUT_S = float(os.getenv("PERPLEXITY_CALL_TIMEOUT_S", "0"))
+# Batch mode: topics researched in parallel within one process.
+BATCH_TOPIC_CONCURRENCY = max(1, int(os.getenv("BATCH_TOPIC_CONCURRENCY", "4")))
+# Every run writes runs/<run_id>/metrics.json (see shared/telemetry.py); RESEARCH_TRACE=1 also
+# writes an OpenTelemetry-style span trace to runs/<run_id>/trace.jsonl.
+# Gemini cost estimates use GEMINI_USD_PER_1M_INPUT / GEMINI_USD_PER_1M_OUTPUT (see shared/llm_client.py).
+RESEARCH_TRACE = (os.getenv("RESEARCH_TRACE") or "").strip() in ("1", "true", "True", "yes", "YES")
 
 # Output + report controls (intentionally simple: only WORD_LIMIT is user-tunable)
 WRITE_OUTPUT_COPY = True
@@ -179,48 +214,246 @@ WORD_LIMIT = _parse_int_env("WORD_LIMIT", 0)
 ENFORCE_WORD_LIMIT = WORD_LIMIT > 0
 REPORT_TARGET_WORDS = WORD_LIMIT if WORD_LIMIT > 0 else 1000
 REPORT_WORD_TOLERANCE = 200
+# Stream writer/revision output into the run artifacts as it is generated (WRITER_STREAM=0 to disable).
+WRITER_STREAM = os.getenv("WRITER_STREAM", "1").strip() not in ("0", "false", "False", "no", "NO")
+WRITER_PROGRESS_EVERY_WORDS = 250
+# Opt-in: draft the report concurrently with the first critic call. An approval uses the draft
+# as-is (saving a full writer round trip); a rejection cancels and discards it. The draft is
+# written before the critic's notes exist, so it only sees the notes of earlier passes (none).
+SPECULATIVE_DRAFT = (os.getenv("SPECULATIVE_DRAFT") or "").strip() in ("1", "true", "True", "yes", "YES")
+# Prompt budgets (estimated tokens). The critic always gets a deduplicated digest; the
+# writer gets the full evidence only when it fits WRITER_CONTEXT_TOKENS.
+CRITIC_CONTEXT_TOKENS = _parse_int_env("CRITIC_CONTEXT_TOKENS", 12000)
+WRITER_CONTEXT_TOKENS = _parse_int_env("WRITER_CONTEXT_TOKENS", 800000)
+_SOURCES_HEADING_RE = re.compile(r"^#{1,6}\s*(?:\d+\)\s*)?Sources\b", re.IGNORECASE | re.MULTILINE)
 
 # Optional Notion export (Path 1: real Notion UI)
 # Keep .env simple: set these as environment variables only when you want to publish.
 NOTION_TOKEN = (os.getenv("NOTION_TOKEN") or "").strip()
 NOTION_PARENT_PAGE_ID = (os.getenv("NOTION_PARENT_PAGE_ID") or "").strip()
 NOTION_VERSION = (os.getenv("NOTION_VERSION") or "2022-06-28").strip()
+# Opt-in: re-exporting a topic updates its existing page in place (block-level diff)
+# instead of creating a new one; per-topic page state lives in NOTION_STATE_DIR.
+NOTION_UPDATE_EXISTING = (os.getenv("NOTION_UPDATE_EXISTING") or "").strip() in ("1", "true", "True", "yes", "YES")
+NOTION_STATE_DIR = Path(os.getenv("NOTION_STATE_DIR", str(MARKET_RESEARCH_DIR / "cache" / "notion")))
+
+def _gemini_generate(
+    prompt: str,
+    *,
+    temperature: float,
+    response_mime_type: str | None = None,
+    label: str = "gemini",
+    logger: logging.Logger | None = None,
+    calls: list[dict] | None = None,
+) -> str:
+    """
+    Generate content using the process-wide Gemini client (see shared/llm_client.py).
+    Returns plain text; latency and token usage go to `logger` / `calls`.
+    """
+    return get_llm_client(require_key("GEMINI_API_KEY")).generate(
+        prompt,
+        model=GEMINI_MODEL,
+        temperature=temperature,
+        response_mime_type=response_mime_type,
+        label=label,
+        logger=logger,
+        calls=calls,
+        cache=get_research_cache() if GEMINI_USE_CACHE else None,
+    )
+
+def _gemini_generate_stream(
+    prompt: str,
+    *,
+    temperature: float,
+    label: str = "gemini",
+    logger: logging.Logger | None = None,
+    calls: list[dict] | None = None,
+):
+    """Streaming variant of _gemini_generate: yields text chunks as they arrive."""
+    yield from get_llm_client(require_key("GEMINI_API_KEY")).generate_stream(
+        prompt,
+        model=GEMINI_MODEL,
+        temperature=temperature,
+        label=label,
+        logger=logger,
+        calls=calls,
+        cache=get_research_cache() if GEMINI_USE_CACHE else None,
+    )
+
+async def _agemini_generate(
+    prompt: str,
+    *,
+    temperature: float,
+    response_mime_type: str | None = None,
+    label: str = "gemini",
+    logger: logging.Logger | None = None,
+    calls: list[dict] | None = None,
+) -> str:
+    """Async variant of _gemini_generate."""
+    return await get_llm_client(require_key("GEMINI_API_KEY")).agenerate(
+        prompt,
+        model=GEMINI_MODEL,
+        temperature=temperature,
+        response_mime_type=response_mime_type,
+        label=label,
+        logger=logger,
+        calls=calls,
+        cache=get_research_cache() if GEMINI_USE_CACHE else None,
+    )
+
+def _agemini_generate_stream(
+    prompt: str,
+    *,
+    temperature: float,
+    label: str = "gemini",
+    logger: logging.Logger | None = None,
+    calls: list[dict] | None = None,
+):
+    """Async variant of _gemini_generate_stream (an async iterator of text chunks)."""
+    return get_llm_client(require_key("GEMINI_API_KEY")).agenerate_stream(
+        prompt,
+        model=GEMINI_MODEL,
+        temperature=temperature,
+        label=label,
+        logger=logger,
+        calls=calls,
+        cache=get_research_cache() if GEMINI_USE_CACHE else None,
+    )
+
+
+def _step(name: str, *args, **kwargs) -> tuple[str, tuple, dict]:
+    """A provider call yielded by ResearchAgent._stage_flow(): agent method name and arguments."""
+    return name, args, kwargs
 
-def _gemini_generate(prompt: str, *, temperature: float, response_mime_type: str | None = None) -> str:
+
+class _ArtifactStream:
     """
-    Generate content using Gemini, supporting both google-genai and google-generativeai.
-    Returns plain text.
+    Bookkeeping for streaming a Gemini response into a run artifact (shared by the
+    sync and async writers): live word count, progress logging and the optional
+    cut at the last paragraph break that keeps the text within `stop_after_words`.
     """
-    if _GEMINI_BACKEND == "google-genai":
-        client = _genai.Client(api_key=GEMINI_API_KEY)  # type: ignore[union-attr]
-        config_kwargs = {"temperature": temperature}
-        if response_mime_type:
-            config_kwargs["response_mime_type"] = response_mime_type
-        config = _genai_types.GenerateContentConfig(**config_kwargs)  # type: ignore[union-attr]
-        resp = client.models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config)
-        return resp.text
-
-    # Fallback backend (google-generativeai)
-    _genai_fallback.configure(api_key=GEMINI_API_KEY)
-    model = _genai_fallback.GenerativeModel(GEMINI_MODEL)
-    # Keep it dependency-light: generation_config as dict is supported across versions.
-    resp = model.generate_content(prompt, generation_config={"temperature": temperature})
-    return getattr(resp, "text", str(resp))
+
+    def __init__(self, f, filename: str, logger: logging.Logger, *, stop_after_words: int | None = None):
+        self.f = f
+        self.filename = filename
+        self.logger = logger
+        self.stop_after_words = stop_after_words
+        self.parts: list[str] = []
+        self.wc = 0
+        self.tail = ""  # trailing partial word carried into the next chunk
+        self.next_progress = WRITER_PROGRESS_EVERY_WORDS
+        self.cut_reason = None
+        # (file position, len(parts)) at the last paragraph break within stop_after_words
+        self.last_break: tuple[int, int] | None = None
+        self.t0 = time.perf_counter()
+
+    def feed(self, chunk: str) -> bool:
+        """Write one chunk (flushed); returns False once the stream should stop."""
+        if not self.parts:
+            self.logger.info(f"[Writer] First chunk | artifact={self.filename} | ttfb_ms={int((time.perf_counter() - self.t0) * 1000)}")
+        prev_wc, prev_tail = self.wc, self.tail
+        text = self.tail + chunk
+        words = text.split()
+        if words and not text[-1].isspace():
+            self.tail = words.pop()
+        else:
+            self.tail = ""
+        self.wc += len(words)
+        if self.wc >= self.next_progress:
+            self.logger.info(f"[Writer] Streaming | artifact={self.filename} | words={self.wc}")
+            self.next_progress = self.wc + WRITER_PROGRESS_EVERY_WORDS
+
+        limit = self.stop_after_words
+        if limit is None:
+            self._write(chunk)
+            return True
+
+        # Last paragraph break in this chunk that still fits, and the first one past the limit.
+        fits, over = None, None
+        for m in re.finditer(r"\n\n", chunk):
+            if prev_wc + len((prev_tail + chunk[:m.start()]).split()) <= limit:
+                fits = m.start()
+            else:
+                over = m.start()
+                break
+        if fits is not None:
+            self._write(chunk[:fits])
+            self.last_break = (self.f.tell(), len(self.parts))
+            chunk = chunk[fits:]
+        if self.wc <= limit:
+            self._write(chunk)
+            return True
+
+        if fits is not None:
+            self.cut_reason = f"words>{limit}: cut at the last paragraph break within the limit"
+            return False
+        if self.last_break is not None:
+            # The overrun began after an earlier break: drop what was written since.
+            pos, n_parts = self.last_break
+            self.f.seek(pos)
+            self.f.truncate()
+            self.f.flush()
+            del self.parts[n_parts:]
+            self.cut_reason = f"words>{limit}: cut back to the last paragraph break within the limit"
+            return False
+        if over is not None:
+            # No break fits (one long opening paragraph): stop at the first break past the limit.
+            self._write(chunk[:over])
+            self.cut_reason = f"words>{limit} at paragraph break"
+            return False
+        self._write(chunk)
+        return True
+
+    def _write(self, text: str) -> None:
+        self.parts.append(text)
+        self.f.write(text)
+        self.f.flush()
+
+    def finish(self) -> str:
+        response_text = "".join(self.parts)
+        wc = ResearchAgent._word_count(response_text)
+        if self.cut_reason:
+            self.logger.info(f"[Writer] Stream cut short | artifact={self.filename} | words={wc} | reason={self.cut_reason}")
+        self.logger.info(f"[Writer] Stream complete | artifact={self.filename} | words={wc} | ms={int((time.perf_counter() - self.t0) * 1000)}")
+        return response_text
+
 
 class ResearchAgent:
-    def __init__(self):
+    def __init__(self, run_id: str | None = None):
+        """Start a new run, or reopen runs/<run_id> (see load_checkpoint / --resume)."""
         self.context = [] # Memory of what we've found
+        self.research = ResearchContext()  # the same findings, structured + deduplicated
+        self._citations_by_idx: dict[int, list[str]] = {}
+        # Answers not fetched live: idx -> cache entry created_at, or None if the source index served it.
+        self._reused_at: dict[int, float | None] = {}
         self.max_loops = 3 # Don't get stuck in infinite loops
         self.target_report_words = REPORT_TARGET_WORDS
         self.report_word_tolerance = REPORT_WORD_TOLERANCE  # target +/- tolerance
         self.sources: set[str] = set()
+        self._sources_lock = threading.Lock()
+        self.llm_calls: list[dict] = []  # per-call latency/token usage (see shared/llm_client.py)
+        self.perplexity_usage = {"live_calls": 0, "cache_hits": 0, "semantic_hits": 0, "index_hits": 0, "cost_usd": 0.0}
+        self._usage_lock = threading.Lock()
+
+        self.checkpoint: dict = {}
 
         # Per-run artifacts (so you can audit what happened later)
-        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
-        self.run_dir = RUNS_DIR / self.run_id
-        self.run_dir.mkdir(parents=True, exist_ok=True)
+        if run_id:
+            self.run_id = run_id
+            self.run_dir = RUNS_DIR / run_id
+            if not self.run_dir.exists():
+                raise FileNotFoundError(f"Run dir not found: {self.run_dir}")
+        else:
+            self.run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
+            self.run_dir = RUNS_DIR / self.run_id
+            self.run_dir.mkdir(parents=True, exist_ok=True)
         self.logger = self._setup_logger(self.run_dir / "run.log")
-        self.logger.info(f"Gemini backend selected | backend={_GEMINI_BACKEND} | model={GEMINI_MODEL}")
+        self.tracer = Tracer(
+            self.run_id,
+            metrics_path=self.run_dir / METRICS_FILENAME,
+            trace_path=self.run_dir / TRACE_FILENAME if RESEARCH_TRACE else None,
+        )
+        self.logger.info(f"Gemini backend selected | providers={provider_mode()} | backend={_GEMINI_BACKEND} | model={GEMINI_MODEL}")
         self.logger.info(
             "Perplexity config | connect_timeout_s=%s | read_timeout_s=%s | max_retries=%s | backoff_s=%s",
             PERPLEXITY_CONNECT_TIMEOUT_S,
@@ -251,191 +484,131 @@ class ResearchAgent:
             logger.addHandler(fh)
         return logger
 
+    def _count_perplexity(self, kind: str, *, cost_usd: float = 0.0) -> None:
+        with self._usage_lock:
+            self.perplexity_usage[kind] += 1
+            self.perplexity_usage["cost_usd"] += cost_usd
+        # Called once per search_perplexity(), inside its "perplexity.search" span.
+        span = current_span()
+        if span is not None:
+            span.set(cache={"cache_hits": "hit", "semantic_hits": "semantic", "index_hits": "index"}.get(kind, "miss"), cost_usd=cost_usd)
+
+    def usage_summary(self) -> dict:
+        """Per-run usage for manifests: Perplexity calls/cost and Gemini latency/tokens/cost estimate."""
+        tokens_in = sum(c["tokens_in"] or 0 for c in self.llm_calls)
+        tokens_out = sum(c["tokens_out"] or 0 for c in self.llm_calls)
+        priced = [c["cost_usd"] for c in self.llm_calls if c.get("cost_usd") is not None]
+        with self._usage_lock:
+            perplexity = dict(self.perplexity_usage)
+        perplexity["cost_usd"] = round(perplexity["cost_usd"], 4)
+        return {
+            "perplexity": perplexity,
+            "gemini": {
+                "calls": len(self.llm_calls),
+                "ms": sum(c["ms"] for c in self.llm_calls),
+                "tokens_in": tokens_in,
+                "tokens_out": tokens_out,
+                "cost_usd": round(sum(priced), 4) if priced else None,
+            },
+        }
+
+    # -----------------------
+    # Stage checkpoints (--resume)
+    # -----------------------
+    def _save_checkpoint(self, stage: str, **state) -> None:
+        """
+        Record everything needed to continue after `stage` in checkpoint.json.
+        Written atomically (temp file + os.replace) so a crash never leaves it half-written.
+        """
+        self.checkpoint.update(state)
+        with self._sources_lock:
+            sources = sorted(self.sources)
+            citations_by_idx = {str(k): v for k, v in self._citations_by_idx.items()}
+        with self._usage_lock:
+            perplexity_usage = dict(self.perplexity_usage)
+        self.checkpoint.update({
+            "version": 1,
+            "run_id": self.run_id,
+            "stage": stage,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "context": list(self.context),
+            "answers": self.research.answers(),
+            "sources": sources,
+            "citations_by_idx": citations_by_idx,
+            "llm_calls": list(self.llm_calls),
+            "perplexity_usage": perplexity_usage,
+        })
+        path = self.run_dir / "checkpoint.json"
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self.checkpoint, indent=2), encoding="utf-8")
+        os.replace(tmp_path, path)
+        self.logger.info(f"[Checkpoint] Saved | stage={stage}")
+
+    def load_checkpoint(self) -> dict:
+        """Restore context, sources, critic state and usage from runs/<run_id>/checkpoint.json."""
+        path = self.run_dir / "checkpoint.json"
+        if not path.exists():
+            raise FileNotFoundError(f"No checkpoint in {self.run_dir}; this run cannot be resumed")
+        self.checkpoint = json.loads(path.read_text(encoding="utf-8"))
+        self.context = list(self.checkpoint.get("context", []))
+        self.sources = set(self.checkpoint.get("sources", []))
+        self._citations_by_idx = {int(k): v for k, v in self.checkpoint.get("citations_by_idx", {}).items()}
+        self.research = ResearchContext()
+        for a in self.checkpoint.get("answers", []):
+            self.research.add_answer(a["text"], idx=a["idx"], question=a["question"], citations=self._citations_by_idx.get(a["idx"]))
+        self.llm_calls = list(self.checkpoint.get("llm_calls", []))
+        self.perplexity_usage.update(self.checkpoint.get("perplexity_usage", {}))
+        self.logger.info(
+            f"[Checkpoint] Loaded | stage={self.checkpoint.get('stage')} | answers={len(self.context)} | "
+            f"loop_count={self.checkpoint.get('loop_count', 0)} | sources={len(self.sources)}"
+        )
+        return self.checkpoint
+
     def _save_text(self, filename: str, content: str) -> None:
         path = self.run_dir / filename
         path.write_text(content or "", encoding="utf-8")
 
+    def _add_sources(self, urls, *, idx: int | None = None) -> None:
+        # Called from concurrent Perplexity workers.
+        with self._sources_lock:
+            if idx is not None:
+                # Perplexity's [n] markers index into this answer's own citations list.
+                self._citations_by_idx[idx] = [u for u in urls or [] if isinstance(u, str)]
+            for u in urls or []:
+                if isinstance(u, str) and u.startswith("http"):
+                    self.sources.add(u)
+            self._save_sources()
+
     def _save_sources(self) -> None:
         urls = sorted(self.sources)
         (self.run_dir / "sources_urls.json").write_text(json.dumps(urls, indent=2), encoding="utf-8")
         (self.run_dir / "sources_urls.md").write_text("\n".join([f"- {u}" for u in urls]), encoding="utf-8")
 
     # -----------------------
-    # Notion export utilities
+    # Notion export
     # -----------------------
-    @staticmethod
-    def _chunk_text(text: str, max_chars: int = 1800) -> list[str]:
-        # Notion rich_text has practical per-item limits; keep chunks conservative.
-        t = text or ""
-        chunks: list[str] = []
-        while t:
-            chunks.append(t[:max_chars])
-            t = t[max_chars:]
-        return chunks or [""]
-
-    @staticmethod
-    def _rt(text: str) -> list[dict]:
-        # Notion rich_text array
-        return [{"type": "text", "text": {"content": chunk}} for chunk in ResearchAgent._chunk_text(text)]
-
-    def _md_to_notion_blocks(self, markdown: str) -> list[dict]:
-        """
-        Minimal Markdown -> Notion blocks converter.
-        Supports headings, paragraphs, bullet/numbered lists, dividers, and code fences.
-        """
-        lines = (markdown or "").splitlines()
-        blocks: list[dict] = []
-        para_buf: list[str] = []
-        in_code = False
-        code_lang = ""
-        code_buf: list[str] = []
-
-        def flush_paragraph() -> None:
-            nonlocal para_buf
-            text = "\n".join([l.rstrip() for l in para_buf]).strip()
-            para_buf = []
-            if not text:
-                return
-            blocks.append({"object": "block", "type": "paragraph", "paragraph": {"rich_text": self._rt(text)}})
-
-        for raw in lines:
-            line = raw.rstrip("\n")
-
-            # Code fences
-            if line.strip().startswith("```"):
-                if not in_code:
-                    flush_paragraph()
-                    in_code = True
-                    code_lang = line.strip().lstrip("`").strip() or "plain"
-                    code_buf = []
-                else:
-                    in_code = False
-                    code_text = "\n".join(code_buf).rstrip()
-                    blocks.append(
-                        {
-                            "object": "block",
-                            "type": "code",
-                            "code": {
-                                "rich_text": self._rt(code_text),
-                                "language": code_lang if code_lang else "plain",
-                            },
-                        }
-                    )
-                    code_lang = ""
-                    code_buf = []
-                continue
-
-            if in_code:
-                code_buf.append(line)
-                continue
-
-            s = line.strip()
-            if s == "---":
-                flush_paragraph()
-                blocks.append({"object": "block", "type": "divider", "divider": {}})
-                continue
-
-            if s.startswith("### "):
-                flush_paragraph()
-                blocks.append({"object": "block", "type": "heading_3", "heading_3": {"rich_text": self._rt(s[4:])}})
-                continue
-            if s.startswith("## "):
-                flush_paragraph()
-                blocks.append({"object": "block", "type": "heading_2", "heading_2": {"rich_text": self._rt(s[3:])}})
-                continue
-            if s.startswith("# "):
-                flush_paragraph()
-                blocks.append({"object": "block", "type": "heading_1", "heading_1": {"rich_text": self._rt(s[2:])}})
-                continue
-
-            # Bullets
-            if s.startswith("- ") or s.startswith("* "):
-                flush_paragraph()
-                item = s[2:].strip()
-                blocks.append(
-                    {"object": "block", "type": "bulleted_list_item", "bulleted_list_item": {"rich_text": self._rt(item)}}
-                )
-                continue
-
-            # Numbered lists (very simple)
-            m = re.match(r"^(\d+)\.\s+(.*)$", s)
-            if m:
-                flush_paragraph()
-                blocks.append(
-                    {
-                        "object": "block",
-                        "type": "numbered_list_item",
-                        "numbered_list_item": {"rich_text": self._rt(m.group(2).strip())},
-                    }
-                )
-                continue
-
-            # Blank line => paragraph break
-            if s == "":
-                flush_paragraph()
-                continue
-
-            para_buf.append(line)
-
-        flush_paragraph()
-        return blocks
-
-    def _notion_headers(self) -> dict:
-        return {
-            "Authorization": f"Bearer {NOTION_TOKEN}",
-            "Notion-Version": NOTION_VERSION,
-            "Content-Type": "application/json",
-        }
-
-    def _notion_post(self, url: str, payload: dict) -> dict:
-        # Basic retry for rate limits / transient server errors
-        for attempt in range(1, 5):
-            resp = requests.post(url, headers=self._notion_headers(), json=payload, timeout=(10, 60))
-            if resp.status_code in (429, 500, 502, 503, 504) and attempt < 4:
-                backoff = 1.5 ** attempt
-                self.logger.info(f"[Notion] Retry | status={resp.status_code} | backoff_s={backoff}")
-                time.sleep(backoff)
-                continue
-            if 200 <= resp.status_code < 300:
-                return resp.json()
-            raise RuntimeError(f"Notion API error (status {resp.status_code}): {resp.text}")
-        raise RuntimeError("Notion API failed after retries")
-
     def export_report_to_notion(self, *, title: str, report_markdown: str) -> dict | None:
         """
-        Creates a Notion page under NOTION_PARENT_PAGE_ID and uploads the report.
-        Returns the Notion page object on success, else None if Notion is not configured.
+        Exports the report to a Notion page under NOTION_PARENT_PAGE_ID (see notion_export.py).
+        With NOTION_UPDATE_EXISTING, a page previously exported for the same title is updated
+        in place, sending only the changed blocks.
+        Returns the page state ({"page_id", "blocks"}) on success, else None if Notion is not configured.
         """
         if not NOTION_TOKEN or not NOTION_PARENT_PAGE_ID:
             self.logger.info("[Notion] Skipping export (missing NOTION_TOKEN or NOTION_PARENT_PAGE_ID)")
             return None
 
-        blocks = self._md_to_notion_blocks(report_markdown)
-        # Notion API limit: append in batches of up to 100 blocks.
-        first_batch = blocks[:100]
-        rest = blocks[100:]
-
-        create_payload = {
-            "parent": {"page_id": NOTION_PARENT_PAGE_ID},
-            "properties": {"title": {"title": [{"type": "text", "text": {"content": title}}]}},
-            "children": first_batch,
-        }
-        page = self._notion_post("https://api.notion.com/v1/pages", create_payload)
-        page_id = page.get("id")
-        self._save_text("notion_page.json", json.dumps(page, indent=2))
-        self.logger.info(f"[Notion] Page created | page_id={page_id}")
-
-        # Append remaining blocks
-        append_url = f"https://api.notion.com/v1/blocks/{page_id}/children"
-        i = 0
-        while rest:
-            batch = rest[:100]
-            rest = rest[100:]
-            i += 1
-            self._notion_post(append_url, {"children": batch})
-            self.logger.info(f"[Notion] Appended batch | idx={i} | blocks={len(batch)}")
-
-        return page
+        exporter = NotionExporter(NOTION_TOKEN, version=NOTION_VERSION, limiter=get_limiter("notion"), logger=self.logger)
+        state_path = NOTION_STATE_DIR / f"{self._safe_slug(title)}.json" if NOTION_UPDATE_EXISTING else None
+        state = exporter.export(
+            title=title,
+            blocks=iter_blocks(report_markdown),
+            parent_page_id=NOTION_PARENT_PAGE_ID,
+            state_path=state_path,
+        )
+        self._save_text("notion_page.json", json.dumps(state, indent=2))
+        self.logger.info(f"[Notion] Export done | page_id={state['page_id']} | blocks={len(state['blocks'])} | calls={exporter.calls}")
+        return state
 
     @staticmethod
     def _safe_slug(text: str, *, max_len: int = 80) -> str:
@@ -448,48 +621,90 @@ class ResearchAgent:
         title = title[:max_len].strip("_")
         return title or "report"
 
-    def _cache_key(self, *, model: str, query: str) -> str:
-        h = hashlib.sha256(f"{model}\n{query}".encode("utf-8")).hexdigest()
-        return h
-
     def seed_perplexity_cache_from_run(self, run_id: str) -> bool:
         """
-        Seed the Perplexity query-cache from an existing run folder so reruns don't waste calls.
-        Returns True if at least one entry was seeded.
+        Seed the research cache with every Perplexity result of an existing run folder
+        so reruns don't waste calls. Returns True if at least one entry was seeded.
         """
         run_dir = RUNS_DIR / run_id
         if not run_dir.exists():
             self.logger.info(f"[Cache] Seed skipped: run dir not found | run_id={run_id!r}")
             return False
 
-        topic_path = run_dir / "topic.txt"
-        content_path = run_dir / "perplexity_01_content.md"
-        raw_path = run_dir / "perplexity_01_attempt_01_raw.json"
-        if not topic_path.exists() or not content_path.exists():
-            self.logger.info(f"[Cache] Seed skipped: missing files | run_id={run_id!r}")
+        seeded = get_research_cache().import_run(run_dir)
+        if not seeded:
+            self.logger.info(f"[Cache] Seed skipped: no perplexity artifacts | run_id={run_id!r}")
             return False
+        self.logger.info(f"[Cache] Seeded from run | run_id={run_id!r} | entries={seeded}")
+        return True
 
-        topic = topic_path.read_text(encoding="utf-8")
-        query = f"Comprehensive deep dive data on {topic}. Market size, players, risks."
-        cache_key = self._cache_key(model="sonar-deep-research", query=query)
-
-        cache_dir = PERPLEXITY_CACHE_DIR
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        cache_content_path = cache_dir / f"{cache_key}.content.md"
-        cache_raw_path = cache_dir / f"{cache_key}.raw.json"
-        cache_query_path = cache_dir / f"{cache_key}.query.txt"
-
-        if cache_content_path.exists():
-            self.logger.info(f"[Cache] Seed not needed (already cached) | key={cache_key[:12]}")
-            return True
-
-        cache_content_path.write_text(content_path.read_text(encoding="utf-8"), encoding="utf-8")
-        cache_query_path.write_text(query, encoding="utf-8")
-        if raw_path.exists():
-            cache_raw_path.write_text(raw_path.read_text(encoding="utf-8"), encoding="utf-8")
+    def _legacy_cache_entry(self, key: str):
+        """Migrate a loose-file cache entry (pre research_cache) into the shared cache."""
+        if not (PERPLEXITY_CACHE_DIR / f"{key}.content.md").exists():
+            return None
+        cache = get_research_cache()
+        cache.import_legacy_dir(PERPLEXITY_CACHE_DIR, keys=[key])
+        return cache.get(key)
 
-        self.logger.info(f"[Cache] Seeded from run | run_id={run_id!r} | key={cache_key[:12]}")
-        return True
+    def _semantic_cache_lookup(self, query: str, *, idx: int) -> tuple[list[float] | None, str | None]:
+        """
+        Near-duplicate lookup for a query that missed the exact cache.
+        Returns (query_embedding, cached_content); the embedding is kept so a live
+        result can be indexed under it. Embedding failures just disable the tier.
+        """
+        try:
+            query_embedding = get_llm_client(require_key("GEMINI_API_KEY")).embed(query, model=EMBED_MODEL)
+        except Exception as e:
+            self.logger.exception(f"[Hunter] Semantic cache embed failed | idx={idx:02d} | {e}")
+            return None, None
+        match = get_research_cache().nearest(
+            query_embedding, namespace=PERPLEXITY_NAMESPACE, model=EMBED_MODEL, threshold=SEMANTIC_CACHE_THRESHOLD
+        )
+        if match is None:
+            return query_embedding, None
+        entry, similarity = match
+        self.logger.info(
+            f"[Hunter] Semantic cache hit | idx={idx:02d} | key={entry.key[:12]} | similarity={similarity:.4f} | "
+            f"threshold={SEMANTIC_CACHE_THRESHOLD} | matched_query={entry.query!r}"
+        )
+        self._save_text(f"perplexity_{idx:02d}_content.md", entry.content)
+        self._save_text(f"perplexity_{idx:02d}_cache_match.json", json.dumps({
+            "query": query, "matched_query": entry.query, "key": entry.key, "similarity": similarity,
+        }, indent=2))
+        if entry.raw_json:
+            self._save_text(f"perplexity_{idx:02d}_raw.json", entry.raw_json)
+        self._add_sources(entry.citations, idx=idx)
+        self._reused_at[idx] = entry.created_at
+        self._count_perplexity("semantic_hits")
+        return query_embedding, entry.content
+
+    def _source_index_answer(self, query: str, *, idx: int) -> str | None:
+        """Answer a query from facts earlier runs indexed (see SOURCE_INDEX_ANSWERS), or None."""
+        try:
+            answer = get_source_index().answer(
+                query,
+                min_facts=SOURCE_INDEX_MIN_FACTS,
+                min_coverage=SOURCE_INDEX_MIN_COVERAGE,
+                max_age_s=SOURCE_INDEX_MAX_AGE_DAYS * 86400 or None,
+            )
+        except Exception as e:
+            self.logger.exception(f"[Hunter] Source index lookup failed | idx={idx:02d} | {e}")
+            return None
+        if answer is None:
+            return None
+        self.logger.info(
+            f"[Hunter] Source index hit | idx={idx:02d} | facts={len(answer.facts)} | sources={len(answer.citations)} | "
+            f"coverage={answer.coverage:.2f}"
+        )
+        self._save_text(f"perplexity_{idx:02d}_content.md", answer.content)
+        self._save_text(f"perplexity_{idx:02d}_index_match.json", json.dumps({
+            "query": query, "coverage": answer.coverage, "citations": answer.citations,
+            "facts": [{"claim": f.claim, "urls": f.urls, "last_seen": f.last_seen} for f in answer.facts],
+        }, indent=2))
+        self._add_sources(answer.citations, idx=idx)
+        self._reused_at[idx] = None
+        self._count_perplexity("index_hits")
+        return answer.content
 
     @staticmethod
     def _safe_json_loads(text: str) -> dict:
@@ -502,39 +717,71 @@ class ResearchAgent:
                 raw = raw.split("\n", 1)[1].strip()
         return json.loads(raw)
 
-    def search_perplexity(self, query):
-        """The Hunter: Uses Perplexity's Deep Research model to find raw facts."""
-        self.logger.info(f"[Hunter] Searching | query={query!r}")
+    def search_perplexity(self, query, *, idx: int | None = None):
+        """
+        The Hunter: Uses Perplexity's Deep Research model to find raw facts.
+        idx numbers the perplexity_NN_* artifacts; defaults to the next context slot.
+        """
+        # Use a stable index for filenames even across retries
+        if idx is None:
+            idx = len(self.context) + 1
+        with self.tracer.span("perplexity.search", idx=idx):
+            return self._search_perplexity(query, idx=idx)
+
+    def _search_perplexity(self, query, *, idx: int):
+        key, query_embedding, content = self._perplexity_cache_lookup(query, idx=idx)
+        if content is not None:
+            return content
+
+        attempts = {"last": 0}
+        t0 = time.time()
+        try:
+            response = get_http_client().post(
+                perplexity_chat_url(), **self._perplexity_request(query), on_attempt=self._perplexity_attempt_logger(idx, attempts)
+            )
+        except TRANSPORT_ERRORS as e:
+            self.logger.exception(f"[Hunter] Request failed after retries | idx={idx:02d} | {e}")
+            raise RuntimeError(f"Perplexity failed after retries. Last error: {e!r}")
+        return self._handle_perplexity_response(
+            query, response, idx=idx, key=key, query_embedding=query_embedding, attempt=attempts["last"], t0=t0
+        )
+
+    def _perplexity_cache_lookup(self, query, *, idx: int) -> tuple[str, list[float] | None, str | None]:
+        """Save the query artifact and try the exact + semantic cache tiers. Returns (key, query_embedding, content)."""
+        self.logger.info(f"[Hunter] Searching | idx={idx:02d} | query={query!r}")
+
+        self._save_text(f"perplexity_{idx:02d}_query.txt", query)
 
         # Query-based cache to avoid wasting expensive deep-research calls on reruns.
-        cache_key = self._cache_key(model="sonar-deep-research", query=query)
-        cache_dir = PERPLEXITY_CACHE_DIR
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        cache_content_path = cache_dir / f"{cache_key}.content.md"
-        cache_raw_path = cache_dir / f"{cache_key}.raw.json"
-        cache_query_path = cache_dir / f"{cache_key}.query.txt"
-        if PERPLEXITY_USE_CACHE and cache_content_path.exists():
-            cached = cache_content_path.read_text(encoding="utf-8")
-            self.logger.info(f"[Hunter] Cache hit | key={cache_key[:12]} | path={str(cache_content_path)!r}")
-            # Also mirror into run artifacts for easy inspection.
-            idx = len(self.context) + 1
-            self._save_text(f"perplexity_{idx:02d}_content.md", cached)
-            if cache_raw_path.exists():
-                raw_text = cache_raw_path.read_text(encoding="utf-8")
-                self._save_text(f"perplexity_{idx:02d}_raw.json", raw_text)
-                try:
-                    raw_json = json.loads(raw_text)
-                    for u in raw_json.get("citations", []) or []:
-                        if isinstance(u, str) and u.startswith("http"):
-                            self.sources.add(u)
-                    self._save_sources()
-                except Exception as e:
-                    self.logger.exception(f"[Hunter] Cache citations parse failed | {e}")
-            return cached
-        
-        url = "https://api.perplexity.ai/chat/completions"
+        key = cache_key(model=PERPLEXITY_MODEL, query=query)
+        if PERPLEXITY_USE_CACHE:
+            entry = get_research_cache().get(key) or self._legacy_cache_entry(key)
+            if entry is not None:
+                self.logger.info(f"[Hunter] Cache hit | idx={idx:02d} | key={key[:12]} | hits={entry.hits}")
+                # Also mirror into run artifacts for easy inspection.
+                self._save_text(f"perplexity_{idx:02d}_content.md", entry.content)
+                if entry.raw_json:
+                    self._save_text(f"perplexity_{idx:02d}_raw.json", entry.raw_json)
+                self._add_sources(entry.citations, idx=idx)
+                self._reused_at[idx] = entry.created_at
+                self._count_perplexity("cache_hits")
+                return key, None, entry.content
+
+        query_embedding = None
+        if PERPLEXITY_USE_CACHE and SEMANTIC_CACHE:
+            query_embedding, content = self._semantic_cache_lookup(query, idx=idx)
+            if content is not None:
+                return key, query_embedding, content
+        if SOURCE_INDEX and SOURCE_INDEX_ANSWERS:
+            content = self._source_index_answer(query, idx=idx)
+            if content is not None:
+                return key, query_embedding, content
+        return key, query_embedding, None
+
+    def _perplexity_request(self, query) -> dict:
+        """Request kwargs for the shared (sync or async) HTTP client, minus the URL and on_attempt."""
         payload = {
-            "model": "sonar-deep-research", # The best retrieval model available
+            "model": PERPLEXITY_MODEL, # sonar-deep-research: the best retrieval model available
             "messages": [
                 {
                     "role": "system",
@@ -547,83 +794,189 @@ class ResearchAgent:
             ]
         }
         headers = {
-            "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
+            "Authorization": f"Bearer {require_key('PERPLEXITY_API_KEY')}",
             "Content-Type": "application/json"
         }
-        
-        attempt = 0
-        last_err: Exception | None = None
-        # Use a stable index for filenames even across retries
-        idx = len(self.context) + 1
+        return {
+            "endpoint": "perplexity.chat_completions",
+            "json": payload,
+            "headers": headers,
+            "timeout": (PERPLEXITY_CONNECT_TIMEOUT_S, PERPLEXITY_READ_TIMEOUT_S),
+            "max_retries": PERPLEXITY_MAX_RETRIES,
+            "backoff_s": PERPLEXITY_RETRY_BACKOFF_S,
+            "limiter": get_limiter("perplexity"),
+            "logger": self.logger,
+        }
 
-        while attempt <= PERPLEXITY_MAX_RETRIES:
-            attempt += 1
-            t0 = time.time()
-            try:
-                self.logger.info(f"[Hunter] Perplexity request | attempt={attempt}/{PERPLEXITY_MAX_RETRIES + 1}")
-                response = requests.post(
-                    url,
-                    json=payload,
-                    headers=headers,
-                    timeout=(PERPLEXITY_CONNECT_TIMEOUT_S, PERPLEXITY_READ_TIMEOUT_S),
-                )
-                elapsed_ms = int((time.time() - t0) * 1000)
-                self.logger.info(f"[Hunter] Perplexity response | status={response.status_code} | ms={elapsed_ms}")
-                self._save_text(f"perplexity_{idx:02d}_attempt_{attempt:02d}_raw.json", response.text)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    content = data["choices"][0]["message"]["content"]
-                    self._save_text(f"perplexity_{idx:02d}_content.md", content)
-
-                    # Capture canonical URLs from Perplexity response so final report can list sources.
-                    try:
-                        for u in data.get("citations", []) or []:
-                            if isinstance(u, str) and u.startswith("http"):
-                                self.sources.add(u)
-                        self._save_sources()
-                    except Exception as e:
-                        self.logger.exception(f"[Hunter] Citations capture failed | {e}")
-
-                    # Write-through cache so future reruns reuse this output.
-                    try:
-                        cache_content_path.write_text(content or "", encoding="utf-8")
-                        cache_raw_path.write_text(response.text or "", encoding="utf-8")
-                        cache_query_path.write_text(query or "", encoding="utf-8")
-                        self.logger.info(f"[Hunter] Cache write | key={cache_key[:12]} | dir={str(cache_dir)!r}")
-                    except Exception as e:
-                        self.logger.exception(f"[Hunter] Cache write failed | {e}")
-                    return content
-
-                # Retry on server/rate errors; fail fast on others.
-                if response.status_code in (408, 429, 500, 502, 503, 504) and attempt <= PERPLEXITY_MAX_RETRIES:
-                    backoff = PERPLEXITY_RETRY_BACKOFF_S * (2 ** (attempt - 1))
-                    self.logger.info(f"[Hunter] Retrying after HTTP {response.status_code} | backoff_s={backoff}")
-                    time.sleep(backoff)
-                    continue
-
-                raise RuntimeError(f"Perplexity API Error (status {response.status_code}): {response.text}")
-
-            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.RequestException) as e:
-                last_err = e
-                self.logger.exception(f"[Hunter] Request error | attempt={attempt} | {e}")
-                self._save_text(f"perplexity_{idx:02d}_attempt_{attempt:02d}_error.txt", repr(e))
-                if attempt <= PERPLEXITY_MAX_RETRIES:
-                    backoff = PERPLEXITY_RETRY_BACKOFF_S * (2 ** (attempt - 1))
-                    self.logger.info(f"[Hunter] Retrying after request error | backoff_s={backoff}")
-                    time.sleep(backoff)
-                    continue
-                break
-            except Exception as e:
-                # Non-retryable (e.g., JSON shape issues) — log and re-raise.
-                self.logger.exception(f"[Hunter] ERROR | {e}")
-                self._save_text(f"perplexity_{idx:02d}_attempt_{attempt:02d}_fatal.txt", repr(e))
-                raise
+    def _perplexity_attempt_logger(self, idx: int, attempts: dict):
+        def on_attempt(attempt: int, response, err: BaseException | None) -> None:
+            # Keep one artifact per attempt so failed retries stay auditable.
+            attempts["last"] = attempt
+            if err is not None:
+                self.logger.info(f"[Hunter] Request error | idx={idx:02d} | attempt={attempt} | {err!r}")
+                self._save_text(f"perplexity_{idx:02d}_attempt_{attempt:02d}_error.txt", repr(err))
+                return
+            self.logger.info(f"[Hunter] Perplexity response | idx={idx:02d} | attempt={attempt} | status={response.status_code}")
+            self._save_text(f"perplexity_{idx:02d}_attempt_{attempt:02d}_raw.json", response.text)
+
+        return on_attempt
+
+    def _handle_perplexity_response(self, query, response, *, idx: int, key: str, query_embedding, attempt: int, t0: float) -> str:
+        """Parse a Perplexity response, record usage/sources and write it through to the cache."""
+        elapsed_ms = int((time.time() - t0) * 1000)
+        self.logger.info(f"[Hunter] Perplexity done | idx={idx:02d} | status={response.status_code} | attempts={attempt} | ms={elapsed_ms}")
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Perplexity API Error (status {response.status_code}): {response.text}")
+
+        try:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+        except Exception as e:
+            # Non-retryable (e.g., JSON shape issues) — log and re-raise.
+            self.logger.exception(f"[Hunter] ERROR | {e}")
+            self._save_text(f"perplexity_{idx:02d}_attempt_{attempt:02d}_fatal.txt", repr(e))
+            raise
+        self._save_text(f"perplexity_{idx:02d}_content.md", content)
+        # Perplexity reports the request cost in usage.cost.total_cost (when available).
+        cost = ((data.get("usage") or {}).get("cost") or {}).get("total_cost")
+        self._count_perplexity("live_calls", cost_usd=cost if isinstance(cost, (int, float)) else 0.0)
+
+        # Capture canonical URLs from Perplexity response so final report can list sources.
+        try:
+            self._add_sources(data.get("citations", []), idx=idx)
+        except Exception as e:
+            self.logger.exception(f"[Hunter] Citations capture failed | {e}")
+
+        # Write-through cache so future reruns reuse this output.
+        try:
+            get_research_cache().put(
+                namespace=PERPLEXITY_NAMESPACE,
+                model=PERPLEXITY_MODEL,
+                query=query,
+                content=content or "",
+                raw_json=response.text,
+                citations=[u for u in data.get("citations", []) if isinstance(u, str)],
+            )
+            self.logger.info(f"[Hunter] Cache write | idx={idx:02d} | key={key[:12]}")
+            if query_embedding is not None:
+                get_research_cache().put_embedding(key, query_embedding, model=EMBED_MODEL)
+        except Exception as e:
+            self.logger.exception(f"[Hunter] Cache write failed | {e}")
+        return content
+
+    def research_gap_questions(self, questions: list[str]) -> list[str]:
+        """
+        The Sniper: research the critic's follow-up questions concurrently.
+        Artifacts get indices in question order, and results are returned in the
+        same order, so the run is reproducible regardless of completion order.
+        """
+        questions = [q for q in questions or [] if isinstance(q, str) and q.strip()]
+        if not questions:
+            return []
+        base_idx = len(self.context) + 1
+        # Extra workers just queue on the limiter, which may be running below its cap after 429s.
+        workers = min(len(questions), get_limiter("perplexity").max_concurrency)
+        self.logger.info(f"[Sniper] Dispatching gap research | questions={len(questions)} | workers={workers}")
+        t0 = time.time()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sniper") as pool:
+            # Each worker runs in a copy of this context so its spans nest under the current stage.
+            futures = [
+                pool.submit(contextvars.copy_context().run, self.search_perplexity, q, idx=base_idx + i)
+                for i, q in enumerate(questions)
+            ]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = next((f for f in futures if f in done and f.exception() is not None), None)
+            if failed is not None:
+                # Don't start the queued questions; calls already in flight finish (they can't be
+                # interrupted), then the failure is raised (the earliest-submitted one if several).
+                pool.shutdown(wait=True, cancel_futures=True)
+                failed.result()
+            answers = [f.result() for f in futures]
+        self.logger.info(f"[Sniper] Gap research done | questions={len(questions)} | ms={int((time.time() - t0) * 1000)}")
+        for i, (q, a) in enumerate(zip(questions, answers)):
+            self._remember(a, idx=base_idx + i, question=q)
+        return [f"Q: {q}\nA: {a}" for q, a in zip(questions, answers)]
+
+    def _remember(self, answer: str, *, idx: int, question: str | None = None) -> None:
+        added = self.research.add_answer(answer, idx=idx, question=question, citations=self._citations_by_idx.get(idx))
+        self.logger.info(f"[Context] Added answer | idx={idx:02d} | new_findings={added} | {self.research.stats()}")
+        # An answer the source index served is made of indexed facts already.
+        if SOURCE_INDEX and not (idx in self._reused_at and self._reused_at[idx] is None):
+            self._index_sources(idx, question=question)
+
+    def _index_sources(self, idx: int, *, question: str | None) -> None:
+        """
+        Record answer idx's citations and cited findings in the cross-run source index.
+        A cached answer is recorded as of when it was researched, and its sources are
+        not cited again, so SOURCE_INDEX_MAX_AGE_DAYS measures research age, not reuse.
+        """
+        seen_at = self._reused_at.get(idx)
+        try:
+            index = get_source_index()
+            topic = self.checkpoint.get("topic")
+            sources = index.add_sources(
+                self._citations_by_idx.get(idx) or [], topic=topic, seen_at=seen_at, reused=idx in self._reused_at
+            )
+            facts = index.add_facts(
+                ((f.claim, f.numbers, f.citations) for f in self.research.findings_for(idx)),
+                topic=topic, question=question, run_id=self.run_id, seen_at=seen_at,
+            )
+            self.logger.info(
+                f"[Sources] Indexed | idx={idx:02d} | sources={len(sources)} | fact_citations={facts}"
+                + (" | reused" if seen_at is not None else "")
+            )
+        except Exception as e:
+            self.logger.exception(f"[Sources] Indexing failed | idx={idx:02d} | {e}")
+
+    def _critic_context(self, loop_idx: int) -> str:
+        digest = self.research.digest(CRITIC_CONTEXT_TOKENS)
+        self._save_text(f"critic_context_{loop_idx:02d}.md", digest)
+        self.logger.info(
+            f"[Context] Critic digest | loop={loop_idx} | tokens~{estimate_tokens(digest)} | "
+            f"full_tokens~{self.research.stats()['full_text_tokens']} | budget={CRITIC_CONTEXT_TOKENS}"
+        )
+        return digest
+
+    def _writer_context(self) -> str:
+        full = self.research.full_text()
+        full_tokens = estimate_tokens(full)
+        if full_tokens <= WRITER_CONTEXT_TOKENS:
+            self.logger.info(f"[Context] Writer gets full evidence | tokens~{full_tokens}")
+            return full
+        digest = self.research.digest(WRITER_CONTEXT_TOKENS)
+        self.logger.info(
+            f"[Context] Full evidence exceeds writer budget; using digest | full_tokens~{full_tokens} | "
+            f"digest_tokens~{estimate_tokens(digest)} | budget={WRITER_CONTEXT_TOKENS}"
+        )
+        return digest
 
-        raise RuntimeError(f"Perplexity failed after retries. Last error: {last_err!r}")
+    def _writer_sources(self) -> list[str]:
+        """
+        The writer's canonical source list: URLs cited by the evidence it gets (every
+        finding, or only those kept in its digest), normalized and de-duplicated.
+        Falls back to every source of the run when no finding carries a citation.
+        """
+        budget = None if estimate_tokens(self.research.full_text()) <= WRITER_CONTEXT_TOKENS else WRITER_CONTEXT_TOKENS
+        urls = self.research.cited_urls(budget)
+        with self._sources_lock:
+            run_total = len(self.sources)
+            if not urls:
+                urls = sorted(self.sources)  # gap research may still be adding sources
+        urls = list(dict.fromkeys(normalize_url(u) or u for u in urls))
+        self.logger.info(f"[Sources] Writer list | cited={len(urls)} | run_total={run_total}")
+        return urls
 
     def critique_research(self, topic, current_data):
         """The Critic: Reviews the data for gaps, bias, or staleness."""
+        prompt = self._critic_prompt(topic, current_data)
+        response_text = _gemini_generate(
+            prompt, temperature=0.2, response_mime_type="application/json",
+            label="critic", logger=self.logger, calls=self.llm_calls,
+        )
+        return self._parse_critique(response_text)
+
+    def _critic_prompt(self, topic, current_data) -> str:
         self.logger.info("[Critic] Reviewing findings")
         
         prompt = f"""
@@ -647,7 +1000,9 @@ class ResearchAgent:
         """
         
         self._save_text("critic_prompt.txt", prompt)
-        response_text = _gemini_generate(prompt, temperature=0.2, response_mime_type="application/json")
+        return prompt
+
+    def _parse_critique(self, response_text: str) -> dict:
         self._save_text("critic_response.json", response_text)
         try:
             return self._safe_json_loads(response_text)
@@ -655,12 +1010,25 @@ class ResearchAgent:
             self.logger.exception(f"[Critic] ERROR parsing JSON | {e}")
             raise
 
-    def synthesize_report(self, topic, full_data, critic_notes):
-        """The Writer: Compiles the final report."""
-        self.logger.info("[Writer] Synthesizing final report")
+    def synthesize_report(self, topic, full_data, critic_notes, *, speculative: bool = False, cancel: threading.Event | None = None):
+        """
+        The Writer: Compiles the final report.
+        A speculative draft (see SPECULATIVE_DRAFT) uses writer_speculative_* artifacts and
+        stops streaming as soon as `cancel` is set.
+        """
+        artifact = "writer_speculative" if speculative else "writer"
+        prompt = self._writer_prompt(topic, full_data, critic_notes, artifact=artifact)
+        if WRITER_STREAM:
+            return self._stream_to_artifact(f"{artifact}_draft.md", prompt, temperature=0.7, label="writer", cancel=cancel)
+        response_text = _gemini_generate(prompt, temperature=0.7, label="writer", logger=self.logger, calls=self.llm_calls)
+        self._save_text(f"{artifact}_draft.md", response_text)
+        return response_text
 
-        target_min = max(300, self.target_report_words - self.report_word_tolerance)
-        target_max = self.target_report_words + self.report_word_tolerance
+    def _writer_prompt(self, topic, full_data, critic_notes, *, artifact: str) -> str:
+        self.logger.info(f"[Writer] Synthesizing {'speculative draft' if artifact == 'writer_speculative' else 'final report'}")
+        sources = self._writer_sources()
+
+        target_min, target_max = self._length_band()
         
         length_rule = ""
         if ENFORCE_WORD_LIMIT:
@@ -698,16 +1066,77 @@ class ResearchAgent:
         {full_data}
 
         Source URLs (canonical list; include these as full URLs in the Sources section):
-        {"".join([f"- {u}\n" for u in sorted(self.sources)]) if self.sources else "(none provided)"}
+        {"".join([f"- {u}\n" for u in sources]) if sources else "(none provided)"}
         
         Critic's Notes (Address these risks):
         {critic_notes}
         """
         
-        self._save_text("writer_prompt.txt", prompt)
-        response_text = _gemini_generate(prompt, temperature=0.7)
-        self._save_text("writer_draft.md", response_text)
-        return response_text
+        self._save_text(f"{artifact}_prompt.txt", prompt)
+        return prompt
+
+    def _start_speculative_draft(self, topic, critic_notes) -> tuple[Future, threading.Event]:
+        """Start the writer in the background (alongside the critic). Returns (future, cancel event)."""
+        cancel = threading.Event()
+        full_context = self._writer_context()
+        ctx = contextvars.copy_context()  # the draft's spans nest under the current run
+
+        def draft() -> str:
+            with self.tracer.span("stage.writer", speculative=True) as span:
+                try:
+                    return self.synthesize_report(topic, full_context, critic_notes, speculative=True, cancel=cancel)
+                finally:
+                    span.set(discarded=cancel.is_set())
+
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-writer")
+        future = pool.submit(ctx.run, draft)
+        pool.shutdown(wait=False)
+        self.logger.info("[Writer] Speculative draft started alongside the critic")
+        return future, cancel
+
+    def _discard_speculative_draft(self, speculation: tuple[Future, threading.Event], reason: str) -> None:
+        future, cancel = speculation
+        cancel.set()  # a streaming draft stops at its next chunk; a non-streaming one finishes unused
+        self.logger.info(f"[Writer] Speculative draft discarded | reason={reason} | finished={future.done()}")
+
+    def _speculative_result(self, speculation: tuple[Future, threading.Event]) -> str | None:
+        return speculation[0].result()
+
+    def _stream_to_artifact(
+        self,
+        filename: str,
+        prompt: str,
+        *,
+        temperature: float,
+        label: str,
+        stop_after_words: int | None = None,
+        cancel: threading.Event | None = None,
+    ) -> str:
+        """
+        Stream a Gemini response straight into a run artifact (flushed per chunk) while
+        counting words live. With stop_after_words, generation is cancelled once the text
+        passes that many words and it is cut back to a paragraph break within it. Setting `cancel`
+        stops generation at the next chunk.
+        A failed stream leaves the partial text on disk for inspection.
+        """
+        stream = _gemini_generate_stream(
+            prompt, temperature=temperature, label=label, logger=self.logger, calls=self.llm_calls
+        )
+        with open(self.run_dir / filename, "w", encoding="utf-8") as f:
+            out = _ArtifactStream(f, filename, self.logger, stop_after_words=stop_after_words)
+            try:
+                for chunk in stream:
+                    if cancel is not None and cancel.is_set():
+                        out.cut_reason = "cancelled"
+                        break
+                    if not out.feed(chunk):
+                        break
+            except Exception as e:
+                self.logger.exception(f"[Writer] Stream failed | artifact={filename} | partial_words={out.wc} | {e}")
+                raise
+            finally:
+                stream.close()  # cancels generation if we stopped early
+        return out.finish()
 
     @staticmethod
     def _word_count(text: str) -> int:
@@ -716,8 +1145,26 @@ class ResearchAgent:
 
     def _revise_report_to_length(self, topic: str, report_markdown: str) -> str:
         """Asks the Writer to revise only length/clarity while preserving citations and structure."""
+        prompt = self._revision_prompt(topic, report_markdown)
+        if WRITER_STREAM:
+            # A revision that runs past the allowed band can be stopped early instead of
+            # paying for (and waiting on) the rest; it is cut at a paragraph break.
+            response_text = self._stream_to_artifact(
+                "writer_revised.md", prompt, temperature=0.4, label="revision",
+                stop_after_words=self._length_band()[1],
+            )
+            return self._with_sources_section(response_text, report_markdown)
+        response_text = _gemini_generate(prompt, temperature=0.4, label="revision", logger=self.logger, calls=self.llm_calls)
+        self._save_text("writer_revised.md", response_text)
+        return response_text
+
+    def _length_band(self) -> tuple[int, int]:
+        """(min, max) report words allowed around the target."""
         target_min = max(300, self.target_report_words - self.report_word_tolerance)
-        target_max = self.target_report_words + self.report_word_tolerance
+        return target_min, self.target_report_words + self.report_word_tolerance
+
+    def _revision_prompt(self, topic: str, report_markdown: str) -> str:
+        target_min, target_max = self._length_band()
         wc = self._word_count(report_markdown)
         if wc > target_max:
             action = "TRIM"
@@ -746,76 +1193,217 @@ class ResearchAgent:
         """
 
         self._save_text("writer_revision_prompt.txt", prompt)
-        response_text = _gemini_generate(prompt, temperature=0.4)
-        self._save_text("writer_revised.md", response_text)
+        return prompt
+
+    def _with_sources_section(self, response_text: str, report_markdown: str) -> str:
+        # A cut-short revision loses its tail; carry the Sources section over from the input.
+        if not _SOURCES_HEADING_RE.search(response_text):
+            m = _SOURCES_HEADING_RE.search(report_markdown)
+            if m:
+                response_text = response_text.rstrip() + "\n\n" + report_markdown[m.start():].strip() + "\n"
+                self._save_text("writer_revised.md", response_text)
         return response_text
 
-    def run(self, topic, *, publish: bool = False):
-        self.logger.info(f"Run started | run_id={self.run_id} | topic={topic!r} | publish={publish}")
-        self._save_text("topic.txt", str(topic))
+    def run(self, topic=None, *, publish: bool = False):
+        """
+        Run the pipeline. Progress is checkpointed after every stage, so a run reopened
+        with ResearchAgent(run_id).load_checkpoint() continues from the last completed
+        stage (topic defaults to the checkpointed one).
+        Each stage is a telemetry span; metrics.json is written even if the run fails.
+        """
+        try:
+            with self.tracer.span("run", run_id=self.run_id, resumed=bool(self.checkpoint)):
+                return self._run_stages(topic, publish=publish)
+        finally:
+            self._write_run_metrics()
+
+    def _write_run_metrics(self) -> None:
+        try:
+            totals = self.tracer.write_metrics()["totals"]
+            self.logger.info(f"[Telemetry] Metrics written | file={METRICS_FILENAME} | {json.dumps(totals)}")
+            # Process-wide: in batch mode these include the other topics' calls.
+            self.logger.info(f"[RateLimit] {json.dumps(limiter_stats())}")
+        except Exception as e:
+            self.logger.exception(f"[Telemetry] Writing metrics failed | {e}")
+
+    def _start_run(self, topic, *, publish: bool) -> tuple[str, bool, bool]:
+        """Resolve topic/publish (from the checkpoint when resuming) and log the start. Returns (topic, publish, resumed)."""
+        ckpt = self.checkpoint
+        resumed = bool(ckpt)
+        topic = topic or ckpt.get("topic")
+        if not topic:
+            raise ValueError("No topic provided")
+        publish = publish or bool(ckpt.get("publish"))
+        if resumed:
+            self.logger.info(f"Run resumed | run_id={self.run_id} | stage={ckpt.get('stage')} | topic={topic!r} | publish={publish}")
+        else:
+            self.logger.info(f"Run started | run_id={self.run_id} | topic={topic!r} | publish={publish}")
+            self._save_text("topic.txt", str(topic))
+            self._save_checkpoint("started", topic=str(topic), publish=publish)
+        return topic, publish, resumed
+
+    def _run_stages(self, topic, *, publish: bool):
+        """Run _stage_flow() with every step as a plain (blocking) call."""
+        flow = self._stage_flow(topic, publish=publish)
+        value, error = None, None
+        while True:
+            try:
+                name, args, kwargs = flow.throw(error) if error is not None else flow.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                value = getattr(self, name)(*args, **kwargs)
+            except BaseException as e:
+                error = e
 
-        if SEED_CACHE_FROM_RUN_ID:
+    def _stage_flow(self, topic, *, publish: bool):
+        """
+        The pipeline's stages and checkpoints, written once for both agents. Each provider
+        call is yielded as a _step() and its result sent back in (a failure is thrown back
+        in): _run_stages() makes the call directly, AsyncResearchAgent._arun_stages()
+        awaits its async version.
+        """
+        topic, publish, resumed = self._start_run(topic, publish=publish)
+        ckpt = self.checkpoint
+
+        if SEED_CACHE_FROM_RUN_ID and not resumed:
             try:
-                self.seed_perplexity_cache_from_run(SEED_CACHE_FROM_RUN_ID)
+                yield _step("seed_perplexity_cache_from_run", SEED_CACHE_FROM_RUN_ID)
             except Exception as e:
                 self.logger.exception(f"[Cache] Seed failed | {e}")
         
         # 1. Initial Broad Search
-        current_data = self.search_perplexity(f"Comprehensive deep dive data on {topic}. Market size, players, risks.")
-        self.context.append(current_data)
+        if not self.context:
+            with self.tracer.span("stage.initial_search"):
+                current_data = yield _step("search_perplexity", f"Comprehensive deep dive data on {topic}. Market size, players, risks.")
+            self.context.append(current_data)
+            self._remember(current_data, idx=len(self.context))
+            self._save_checkpoint("initial_search", loop_count=0, final_critique="", research_done=False, pending_questions=None)
         
-        loop_count = 0
-        final_critique = ""
-        
-        # 2. The Feedback Loop
-        while loop_count < self.max_loops:
-            # Aggregate all findings so far
-            full_context = "\n---\n".join(self.context)
-            
-            # Call the Critic
-            critique = self.critique_research(topic, full_context)
-            final_critique = critique['reasoning']
-            
-            if critique['status'] == "APPROVED":
-                self.logger.info("[Critic] Approved")
-                break
-            
-            self.logger.info(f"[Critic] Rejected | missing_information={critique.get('missing_information')}")
-            
-            # 3. Targeted Re-Research (The Sniper)
-            for question in critique['missing_information']:
-                new_findings = self.search_perplexity(question)
-                self.context.append(f"Q: {question}\nA: {new_findings}")
-                
-            loop_count += 1
-
-        # 4. Final Synthesis
-        full_context = "\n---\n".join(self.context)
-        report = self.synthesize_report(topic, full_context, final_critique)
+        loop_count = ckpt.get("loop_count", 0)
+        final_critique = ckpt.get("final_critique", "")
+        speculation = None  # draft started alongside the first critic (see _start_speculative_draft)
+        try:
+            # 2. The Feedback Loop
+            while not ckpt.get("research_done") and loop_count < self.max_loops:
+                pending_questions = ckpt.get("pending_questions")
+                if pending_questions is None:
+                    # Deduplicated, token-budgeted digest of the findings so far
+                    critic_context = self._critic_context(loop_count + 1)
+
+                    if SPECULATIVE_DRAFT and loop_count == 0 and ckpt.get("report") is None:
+                        speculation = self._start_speculative_draft(topic, final_critique)
+
+                    # Call the Critic
+                    with self.tracer.span("stage.critic", loop=loop_count + 1) as span:
+                        critique = yield _step("critique_research", topic, critic_context)
+                        span.set(verdict=critique.get("status"), questions=len(critique.get("missing_information") or []))
+                    final_critique = critique['reasoning']
+
+                    if critique['status'] == "APPROVED":
+                        self.logger.info("[Critic] Approved")
+                        break
+
+                    if speculation is not None:
+                        self._discard_speculative_draft(speculation, reason="critic rejected")
+                        speculation = None
+
+                    self.logger.info(f"[Critic] Rejected | missing_information={critique.get('missing_information')}")
+                    pending_questions = critique.get('missing_information') or []
+                    self._save_checkpoint(f"critic_{loop_count + 1:02d}", final_critique=final_critique, pending_questions=pending_questions)
+
+                # 3. Targeted Re-Research (The Sniper), questions run concurrently
+                with self.tracer.span("stage.gap_research", loop=loop_count + 1, questions=len(pending_questions)):
+                    self.context.extend((yield _step("research_gap_questions", pending_questions)))
+
+                loop_count += 1
+                self._save_checkpoint(f"gap_research_{loop_count:02d}", loop_count=loop_count, pending_questions=None)
+
+            if not ckpt.get("research_done"):
+                self._save_checkpoint("research_done", research_done=True, final_critique=final_critique, pending_questions=None)
+
+            # 4. Final Synthesis
+            report = ckpt.get("report")
+            if report is None and speculation is not None:
+                # The critic approved the evidence the speculative draft was written from.
+                try:
+                    report = yield _step("_speculative_result", speculation)
+                except Exception as e:
+                    self.logger.exception(f"[Writer] Speculative draft failed; writing from scratch | {e}")
+                    report = None
+                speculation = None
+                if report is not None:
+                    self._save_text("writer_draft.md", report)
+                    self.logger.info(f"[Writer] Using speculative draft | words={self._word_count(report)}")
+                    self._save_checkpoint("synthesized", report=report, revise_loops=0)
+        finally:
+            # The critic failed or the run was stopped (e.g. its deadline): don't leave the draft running.
+            if speculation is not None:
+                self._discard_speculative_draft(speculation, reason="run stopped")
+        if report is None:
+            with self.tracer.span("stage.writer"):
+                full_context = self._writer_context()
+                report = yield _step("synthesize_report", topic, full_context, final_critique)
+            self._save_checkpoint("synthesized", report=report, revise_loops=0)
 
         # Enforce target length (optional) via a light revision loop.
         wc = self._word_count(report)
-        target_min = max(300, self.target_report_words - self.report_word_tolerance)
-        target_max = self.target_report_words + self.report_word_tolerance
-        revise_loops = 0
-        if ENFORCE_WORD_LIMIT:
+        target_min, target_max = self._length_band()
+        revise_loops = ckpt.get("revise_loops", 0)
+        if ENFORCE_WORD_LIMIT and not ckpt.get("finalized"):
             while (wc < target_min or wc > target_max) and revise_loops < 2:
                 self.logger.info(f"[Writer] Word count outside range | wc={wc} | target={target_min}-{target_max} | pass={revise_loops+1}")
-                report = self._revise_report_to_length(topic, report)
+                with self.tracer.span("stage.revision", revise_pass=revise_loops + 1, words_in=wc):
+                    report = yield _step("_revise_report_to_length", topic, report)
                 wc = self._word_count(report)
                 revise_loops += 1
+                self._save_checkpoint(f"revised_{revise_loops:02d}", report=report, revise_loops=revise_loops)
 
         self.logger.info(f"[Writer] Final word count | wc={wc}")
+        report, output_path = self._finalize_report(topic, report)
+
+        # Optional Notion export (real Notion UI)
+        if not ckpt.get("notion_done"):
+            try:
+                title = self._safe_slug(str(topic), max_len=60)
+                with self.tracer.span("stage.notion_export"):
+                    exported = yield _step("export_report_to_notion", title=title, report_markdown=report)
+                if exported is not None:
+                    self._save_checkpoint("notion_exported", notion_done=True)
+            except Exception as e:
+                self.logger.exception(f"[Notion] Export failed | {e}")
 
-        # Always save inside the run folder (safe, auditable)
-        self._save_text("final_report.md", report)
+        # Optional: Publish to Supabase forum
+        post_id = ckpt.get("post_id")
+        if publish and post_id is None:
+            try:
+                with self.tracer.span("stage.publish"):
+                    post_id = yield _step("_publish_report", topic, report)
+                self.logger.info(f"[Publish] Successfully published to forum | post_id={post_id}")
+                self._save_checkpoint("published", post_id=post_id)
+            except Exception as e:
+                self.logger.exception(f"[Publish] Failed | {e}")
 
-        # Safety net: if model forgot to include URLs in Sources section, append them.
-        if self.sources and ("http" not in report):
-            self.logger.info("[Writer] Sources URLs not detected in report; appending Sources section from canonical list")
-            report = report.rstrip() + "\n\n## Sources\n" + "\n".join([f"- {u}" for u in sorted(self.sources)]) + "\n"
+        self._log_completion(output_path, post_id)
+        return report
+
+    def _publish_report(self, topic, report: str):
+        return publish_research_to_forum(topic=topic, report_markdown=report, logger=self.logger)
+
+    def _finalize_report(self, topic, report: str) -> tuple[str, Path | None]:
+        """Save final_report.md (once) and the outputs/ copy. Returns (report, output_path)."""
+        if not self.checkpoint.get("finalized"):
+            # Always save inside the run folder (safe, auditable)
             self._save_text("final_report.md", report)
 
+            # Safety net: if model forgot to include URLs in Sources section, append them.
+            if self.sources and ("http" not in report):
+                self.logger.info("[Writer] Sources URLs not detected in report; appending Sources section from canonical list")
+                report = report.rstrip() + "\n\n## Sources\n" + "\n".join([f"- {u}" for u in sorted(self.sources)]) + "\n"
+                self._save_text("final_report.md", report)
+            self._save_checkpoint("finalized", report=report, finalized=True)
+
         # Optional: also write a friendly top-level copy with a safe filename.
         output_path = None
         if WRITE_OUTPUT_COPY:
@@ -823,36 +1411,331 @@ class ResearchAgent:
             slug = self._safe_slug(str(topic))
             output_path = OUTPUT_DIR / f"{slug}_report.md"
             output_path.write_text(report, encoding="utf-8")
+        return report, output_path
 
-        # Optional Notion export (real Notion UI)
-        try:
-            title = self._safe_slug(str(topic), max_len=60)
-            self.export_report_to_notion(title=title, report_markdown=report)
-        except Exception as e:
-            self.logger.exception(f"[Notion] Export failed | {e}")
-
-        # Optional: Publish to Supabase forum
-        post_id = None
-        if publish:
-            try:
-                post_id = publish_research_to_forum(
-                    topic=topic,
-                    report_markdown=report,
-                    logger=self.logger,
-                )
-                self.logger.info(f"[Publish] Successfully published to forum | post_id={post_id}")
-            except Exception as e:
-                self.logger.exception(f"[Publish] Failed | {e}")
-
+    def _log_completion(self, output_path: Path | None, post_id) -> None:
+        self._save_checkpoint("completed")
+        self.logger.info(f"HTTP timings | {json.dumps(get_http_client().timing_counters())}")
+        self.logger.info(
+            "LLM usage | calls=%s | total_ms=%s | tokens_in=%s | tokens_out=%s",
+            len(self.llm_calls),
+            sum(c["ms"] for c in self.llm_calls),
+            sum(c["tokens_in"] or 0 for c in self.llm_calls),
+            sum(c["tokens_out"] or 0 for c in self.llm_calls),
+        )
         self.logger.info(
             "Run completed | output_copy=%r | artifacts_dir=%r | post_id=%r",
             str(output_path) if output_path else None,
             str(self.run_dir),
             post_id,
         )
-        return report
+
+class AsyncResearchAgent(ResearchAgent):
+    """
+    asyncio variant of ResearchAgent: same stages, artifacts, checkpoints and outputs.
+
+    Provider calls go through the async HTTP client and async Gemini calls; gap questions
+    fan out in an asyncio.TaskGroup (the first failure cancels the rest), each Perplexity
+    call can be bounded by PERPLEXITY_CALL_TIMEOUT_S and the whole run by a deadline.
+    A run cut off by its deadline keeps its checkpoint, so --resume picks it up.
+    Notion export, Supabase publishing and cache seeding run in worker threads; run
+    artifacts are small local writes and stay synchronous.
+    """
+
+    def run(self, topic=None, *, publish: bool = False, deadline_s: float | None = RESEARCH_DEADLINE_S):
+        """Blocking entry point with ResearchAgent.run()'s signature: runs arun() on a fresh event loop."""
+
+        async def main():
+            try:
+                return await self.arun(topic, publish=publish, deadline_s=deadline_s)
+            finally:
+                await aclose_async_http_client()
+
+        return asyncio.run(main())
+
+    async def arun(self, topic=None, *, publish: bool = False, deadline_s: float | None = RESEARCH_DEADLINE_S):
+        """Run the pipeline; raises TimeoutError if it is still running after deadline_s (None/0 = no deadline)."""
+        deadline = asyncio.timeout(deadline_s or None)
+        try:
+            with self.tracer.span("run", run_id=self.run_id, resumed=bool(self.checkpoint), mode="async"):
+                async with deadline:
+                    return await self._arun_stages(topic, publish=publish)
+        except TimeoutError as e:
+            if not deadline.expired():
+                raise
+            self.logger.error(
+                f"[Deadline] Run cancelled | deadline_s={deadline_s} | stage={self.checkpoint.get('stage')} | "
+                f"resume with --resume {self.run_id}"
+            )
+            raise TimeoutError(f"Research run {self.run_id} exceeded its {deadline_s}s deadline") from e
+        finally:
+            self._write_run_metrics()
+
+    # -----------------------
+    # Providers
+    # -----------------------
+    async def asearch_perplexity(self, query, *, idx: int | None = None):
+        """Async search_perplexity()."""
+        if idx is None:
+            idx = len(self.context) + 1
+        with self.tracer.span("perplexity.search", idx=idx):
+            try:
+                async with asyncio.timeout(PERPLEXITY_CALL_TIMEOUT_S or None):
+                    return await self._asearch_perplexity(query, idx=idx)
+            except TimeoutError:
+                self.logger.error(f"[Hunter] Timed out | idx={idx:02d} | timeout_s={PERPLEXITY_CALL_TIMEOUT_S}")
+                raise
+
+    async def _asearch_perplexity(self, query, *, idx: int):
+        # Cache lookups may embed the query (a blocking Gemini call); keep them off the loop.
+        key, query_embedding, content = await asyncio.to_thread(self._perplexity_cache_lookup, query, idx=idx)
+        if content is not None:
+            return content
+
+        attempts = {"last": 0}
+        t0 = time.time()
+        try:
+            response = await get_async_http_client().post(
+                perplexity_chat_url(), **self._perplexity_request(query), on_attempt=self._perplexity_attempt_logger(idx, attempts)
+            )
+        except TRANSPORT_ERRORS as e:
+            self.logger.exception(f"[Hunter] Request failed after retries | idx={idx:02d} | {e}")
+            raise RuntimeError(f"Perplexity failed after retries. Last error: {e!r}")
+        return self._handle_perplexity_response(
+            query, response, idx=idx, key=key, query_embedding=query_embedding, attempt=attempts["last"], t0=t0
+        )
+
+    async def aresearch_gap_questions(self, questions: list[str]) -> list[str]:
+        """Async research_gap_questions(): one task per question, same artifact indices and result order."""
+        questions = [q for q in questions or [] if isinstance(q, str) and q.strip()]
+        if not questions:
+            return []
+        base_idx = len(self.context) + 1
+        # No worker cap: tasks queue on the Perplexity limiter.
+        self.logger.info(f"[Sniper] Dispatching gap research | questions={len(questions)} | tasks={len(questions)}")
+        t0 = time.time()
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(self.asearch_perplexity(q, idx=base_idx + i)) for i, q in enumerate(questions)]
+        except ExceptionGroup as eg:
+            # The first failure cancelled the other questions; surface it like the sync version does.
+            raise eg.exceptions[0] from None
+        answers = [t.result() for t in tasks]
+        self.logger.info(f"[Sniper] Gap research done | questions={len(questions)} | ms={int((time.time() - t0) * 1000)}")
+        for i, (q, a) in enumerate(zip(questions, answers)):
+            self._remember(a, idx=base_idx + i, question=q)
+        return [f"Q: {q}\nA: {a}" for q, a in zip(questions, answers)]
+
+    async def acritique_research(self, topic, current_data):
+        """Async critique_research()."""
+        prompt = self._critic_prompt(topic, current_data)
+        response_text = await _agemini_generate(
+            prompt, temperature=0.2, response_mime_type="application/json",
+            label="critic", logger=self.logger, calls=self.llm_calls,
+        )
+        return self._parse_critique(response_text)
+
+    async def asynthesize_report(self, topic, full_data, critic_notes, *, speculative: bool = False):
+        """Async synthesize_report(); a speculative draft is stopped by cancelling its task."""
+        artifact = "writer_speculative" if speculative else "writer"
+        prompt = self._writer_prompt(topic, full_data, critic_notes, artifact=artifact)
+        if WRITER_STREAM:
+            return await self._astream_to_artifact(f"{artifact}_draft.md", prompt, temperature=0.7, label="writer")
+        response_text = await _agemini_generate(prompt, temperature=0.7, label="writer", logger=self.logger, calls=self.llm_calls)
+        self._save_text(f"{artifact}_draft.md", response_text)
+        return response_text
+
+    async def _astream_to_artifact(
+        self,
+        filename: str,
+        prompt: str,
+        *,
+        temperature: float,
+        label: str,
+        stop_after_words: int | None = None,
+    ) -> str:
+        """Async _stream_to_artifact(); cancelling the calling task stops generation at once."""
+        stream = _agemini_generate_stream(
+            prompt, temperature=temperature, label=label, logger=self.logger, calls=self.llm_calls
+        )
+        with open(self.run_dir / filename, "w", encoding="utf-8") as f:
+            out = _ArtifactStream(f, filename, self.logger, stop_after_words=stop_after_words)
+            try:
+                async for chunk in stream:
+                    if not out.feed(chunk):
+                        break
+            except asyncio.CancelledError:
+                self.logger.info(f"[Writer] Stream cancelled | artifact={filename} | partial_words={out.wc}")
+                raise
+            except Exception as e:
+                self.logger.exception(f"[Writer] Stream failed | artifact={filename} | partial_words={out.wc} | {e}")
+                raise
+            finally:
+                await stream.aclose()  # cancels generation if we stopped early
+        return out.finish()
+
+    async def _arevise_report_to_length(self, topic: str, report_markdown: str) -> str:
+        """Async _revise_report_to_length()."""
+        prompt = self._revision_prompt(topic, report_markdown)
+        if WRITER_STREAM:
+            response_text = await self._astream_to_artifact(
+                "writer_revised.md", prompt, temperature=0.4, label="revision",
+                stop_after_words=self._length_band()[1],
+            )
+            return self._with_sources_section(response_text, report_markdown)
+        response_text = await _agemini_generate(prompt, temperature=0.4, label="revision", logger=self.logger, calls=self.llm_calls)
+        self._save_text("writer_revised.md", response_text)
+        return response_text
+
+    def _start_speculative_draft(self, topic, critic_notes) -> asyncio.Task:
+        """Start the writer as a task alongside the critic (see SPECULATIVE_DRAFT)."""
+        full_context = self._writer_context()
+
+        async def draft() -> str | None:
+            with self.tracer.span("stage.writer", speculative=True) as span:
+                discarded = False
+                try:
+                    return await self.asynthesize_report(topic, full_context, critic_notes, speculative=True)
+                except asyncio.CancelledError:
+                    discarded = True  # a discarded draft is not a failed stage
+                    return None
+                finally:
+                    span.set(discarded=discarded)
+
+        # Tasks copy the current context, so the draft's spans nest under the run.
+        task = asyncio.create_task(draft(), name=f"speculative-writer-{self.run_id}")
+        self.logger.info("[Writer] Speculative draft started alongside the critic")
+        return task
+
+    def _discard_speculative_draft(self, task: asyncio.Task, reason: str) -> None:
+        finished = task.done()
+        task.cancel()
+        self.logger.info(f"[Writer] Speculative draft discarded | reason={reason} | finished={finished}")
+
+    async def _aspeculative_result(self, task: asyncio.Task) -> str | None:
+        return await task
+
+    # -----------------------
+    # Stages
+    # -----------------------
+    # Async versions of _stage_flow() steps; other steps are blocking SDK/HTTP calls
+    # (cache seeding, Notion export, Supabase publish) and run in a worker thread.
+    _ASYNC_STEPS = {
+        "search_perplexity": "asearch_perplexity",
+        "critique_research": "acritique_research",
+        "research_gap_questions": "aresearch_gap_questions",
+        "synthesize_report": "asynthesize_report",
+        "_revise_report_to_length": "_arevise_report_to_length",
+        "_speculative_result": "_aspeculative_result",
+    }
+
+    async def _arun_stages(self, topic, *, publish: bool):
+        """Run _stage_flow(), awaiting each step's async version."""
+        flow = self._stage_flow(topic, publish=publish)
+        value, error = None, None
+        while True:
+            try:
+                name, args, kwargs = flow.throw(error) if error is not None else flow.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                if name in self._ASYNC_STEPS:
+                    value = await getattr(self, self._ASYNC_STEPS[name])(*args, **kwargs)
+                else:
+                    value = await asyncio.to_thread(getattr(self, name), *args, **kwargs)
+            except BaseException as e:  # incl. cancellation: the flow's cleanup runs, then it re-raises
+                error = e
 
 # --- EXECUTION ---
+def _read_topics_file(path: Path) -> list[str]:
+    """One topic per line; blank lines and '#' comments are ignored."""
+    topics = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            topics.append(line)
+    return topics
+
+
+def run_batch(
+    topics: list[str],
+    *,
+    publish: bool = False,
+    concurrency: int = BATCH_TOPIC_CONCURRENCY,
+    async_agent: bool = RESEARCH_ASYNC,
+    deadline_s: float | None = RESEARCH_DEADLINE_S,
+) -> dict:
+    """
+    Research many topics in one process. Topics run in parallel (up to `concurrency`);
+    the HTTP pool, Gemini client, research cache and the per-provider rate limiters
+    (shared/rate_limit.py) are process-wide, so they are shared by every topic. A failed topic is recorded and does not stop the batch.
+    With async_agent, each topic runs an AsyncResearchAgent (on its own event loop) bounded by deadline_s.
+
+    Writes runs/batch_<id>/manifest.json (rewritten as each topic finishes) and returns it.
+    """
+    batch_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
+    batch_dir = RUNS_DIR / f"batch_{batch_id}"
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "batch_id": batch_id,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "concurrency": concurrency,
+        "async": async_agent,
+        "limits": {p: get_limiter(p).max_concurrency for p in ("perplexity", "gemini")},
+        "topics": [None] * len(topics),
+    }
+    manifest_lock = threading.Lock()
+
+    def write_manifest() -> None:
+        (batch_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    def run_one(i: int, topic: str) -> None:
+        t0 = time.time()
+        agent = None
+        entry = {"topic": topic, "status": "ok", "error": None}
+        try:
+            if async_agent:
+                agent = AsyncResearchAgent()
+                agent.run(topic, publish=publish, deadline_s=deadline_s)
+            else:
+                agent = ResearchAgent()
+                agent.run(topic, publish=publish)
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = repr(e)
+            if agent is not None:
+                agent.logger.exception(f"[Batch] Topic failed | {e}")
+        entry["elapsed_s"] = round(time.time() - t0, 1)
+        if agent is not None:
+            entry["run_id"] = agent.run_id
+            entry.update(agent.usage_summary())
+        with manifest_lock:
+            manifest["topics"][i] = entry
+            write_manifest()
+        print(f"[Batch] {entry['status']:<6} | {entry['elapsed_s']:>7.1f}s | {topic}")
+
+    t0 = time.time()
+    write_manifest()
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(topics) or 1)), thread_name_prefix="topic") as pool:
+        list(pool.map(run_one, range(len(topics)), topics))
+
+    done = [t for t in manifest["topics"] if t]
+    costs = [t[k]["cost_usd"] for t in done for k in ("perplexity", "gemini") if k in t and t[k]["cost_usd"] is not None]
+    manifest["finished_at"] = datetime.now(timezone.utc).isoformat()
+    manifest["summary"] = {
+        "topics": len(topics),
+        "ok": sum(t["status"] == "ok" for t in done),
+        "failed": sum(t["status"] == "failed" for t in done),
+        "elapsed_s": round(time.time() - t0, 1),
+        "cost_usd": round(sum(costs), 4),
+        "http": get_http_client().timing_counters(),
+        "rate_limits": limiter_stats(),
+    }
+    write_manifest()
+    return manifest
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Market Research Agent - Deep research with Perplexity + Gemini synthesis",
@@ -862,6 +1745,9 @@ Examples:
   python MarketResearch.py "AI in Healthcare market analysis"
   python MarketResearch.py "SaaS pricing strategies for B2B" --publish
   python MarketResearch.py --topic-file topic.txt --publish
+  python MarketResearch.py --topics-file nightly_topics.txt --concurrency 8
+  python MarketResearch.py --resume 20250101_120000_abcd1234
+  python MarketResearch.py "Vertical SaaS for dentists" --async --deadline 1800
 """
     )
     parser.add_argument(
@@ -873,12 +1759,85 @@ Examples:
         "--topic-file",
         help="Read topic from a file instead of command line"
     )
+    parser.add_argument(
+        "--topics-file",
+        help="Batch mode: research every topic in this file (one per line) in one process"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BATCH_TOPIC_CONCURRENCY,
+        help=f"Batch mode: topics researched in parallel (default {BATCH_TOPIC_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Continue runs/<RUN_ID> from its last completed stage (uses checkpoint.json)"
+    )
     parser.add_argument(
         "--publish",
         action="store_true",
         help="Publish the report to Supabase forum (requires SUPABASE_* env vars)"
     )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        default=RESEARCH_ASYNC,
+        help="Use the asyncio agent (AsyncResearchAgent); also RESEARCH_ASYNC=1"
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="Cancel a run still going after this many seconds (implies --async; default RESEARCH_DEADLINE_S)"
+    )
     args = parser.parse_args()
+    use_async = args.use_async or args.deadline is not None
+    deadline_s = args.deadline if args.deadline is not None else RESEARCH_DEADLINE_S
+
+    def new_agent(run_id: str | None = None) -> ResearchAgent:
+        return AsyncResearchAgent(run_id=run_id) if use_async else ResearchAgent(run_id=run_id)
+
+    def run_agent(agent: ResearchAgent, topic):
+        if use_async:
+            return agent.run(topic, publish=args.publish, deadline_s=deadline_s)
+        return agent.run(topic, publish=args.publish)
+
+    # Fail before any run dir is created.
+    require_key("PERPLEXITY_API_KEY")
+    require_key("GEMINI_API_KEY")
+
+    if args.resume:
+        agent = new_agent(run_id=args.resume)
+        agent.load_checkpoint()
+        run_agent(agent, args.topic.strip() if args.topic else None)
+        print("\n" + "=" * 60)
+        print("RESEARCH COMPLETE (resumed)")
+        print("=" * 60)
+        print(f"Run ID: {agent.run_id}")
+        print(f"Output: {agent.run_dir / 'final_report.md'}")
+        return
+
+    if args.topics_file:
+        topics_path = Path(args.topics_file)
+        if not topics_path.exists():
+            print(f"Error: Topics file not found: {args.topics_file}")
+            return
+        topics = _read_topics_file(topics_path)
+        if not topics:
+            print(f"Error: No topics in {args.topics_file}")
+            return
+        manifest = run_batch(
+            topics, publish=args.publish, concurrency=args.concurrency, async_agent=use_async, deadline_s=deadline_s
+        )
+        summary = manifest["summary"]
+        print("\n" + "=" * 60)
+        print("BATCH COMPLETE")
+        print("=" * 60)
+        print(f"Topics: {summary['topics']} | ok={summary['ok']} | failed={summary['failed']} | {summary['elapsed_s']}s")
+        print(f"Manifest: {RUNS_DIR / ('batch_' + manifest['batch_id']) / 'manifest.json'}")
+        return
 
     # Determine topic
     topic = None
@@ -897,8 +1856,8 @@ Examples:
         return
 
     # Run the agent
-    agent = ResearchAgent()
-    report = agent.run(topic, publish=args.publish)
+    agent = new_agent()
+    report = run_agent(agent, topic)
     
     print("\n" + "=" * 60)
     print("RESEARCH COMPLETE")
@@ -0,0 +1,335 @@
+"""
+Markdown -> Notion block converter for report exports.
+
+Single pass over the report: each line is classified by one tokenizer regex and
+blocks are yielded as soon as they are complete, so the exporter can start
+uploading while the rest of the report is still being converted.
+
+- Blocks: headings (h4-h6 map to heading_3), paragraphs, bulleted/numbered
+  lists with nesting, quotes, dividers and fenced code.
+- Inline: **bold**, *italic*, ~~strike~~, `code`, [text](url), bare URLs, and
+  [n] citations (linked when a citation list is passed).
+- Limits: text is split into runs of at most 2000 characters (one slice per
+  run, O(n)); blocks with more than 100 rich_text runs continue in extra
+  blocks; lists nest at most 2 levels below the top item, which is all a single
+  Notion append accepts.
+
+Benchmark: python market_research/notion_blocks.py bench [words]
+"""
+
+from __future__ import annotations
+
+import re
+import statistics
+import sys
+import time
+from typing import Iterator, Sequence
+
+MAX_TEXT_CHARS = 2000  # Notion limit per rich_text item
+MAX_RICH_TEXT_ITEMS = 100  # Notion limit per rich_text array
+MAX_LIST_DEPTH = 3  # top-level item + 2 nested levels per append request
+
+_LINE_RE = re.compile(
+    r"""
+    ^(?P<indent>[ \t]*)
+    (?:
+        (?P<fence>`{3,}|~{3,})[ \t]*(?P<lang>[^\s`]*).*$
+      | (?P<hr>(?:-[ \t]*){3,}|(?:\*[ \t]*){3,}|(?:_[ \t]*){3,})$
+      | (?P<hashes>\#{1,6})[ \t]+(?P<heading>.*?)(?:[ \t]+\#+)?[ \t]*$
+      | (?P<bullet>[-*+])[ \t]+(?P<bullet_text>.*)$
+      | \d{1,9}[.)][ \t]+(?P<number_text>.*)$
+      | >[ \t]?(?P<quote>.*)$
+      | (?P<blank>)$
+      | (?P<text>.*)$
+    )
+    """,
+    re.VERBOSE,
+)
+
+_INLINE_RE = re.compile(
+    r"""
+      (?P<tick>`+)(?P<code>.+?)(?P=tick)
+    | \[(?P<link_text>[^\]\n]+)\]\((?P<link_url>[^)\s]+)(?:[ \t]+"[^"\n]*")?\)
+    | \[(?P<cite>\d{1,3}(?:[ \t]*,[ \t]*\d{1,3})*)\]
+    | (?P<url>https?://[^\s<>()\[\]]*[^\s<>()\[\].,;:!?'"])
+    | (?P<strong>\*\*|__)(?P<bold>.+?)(?P=strong)
+    | ~~(?P<strike>.+?)~~
+    | (?<![\w*])\*(?P<italic>[^\s*](?:[^*\n]*?[^\s*])?)\*(?![\w*])
+    | (?<![\w_])_(?P<italic_us>[^\s_](?:[^_\n]*?[^\s_])?)_(?![\w_])
+    """,
+    re.VERBOSE,
+)
+
+# Notion rejects code blocks whose language is not in its enum.
+_CODE_LANGUAGES = frozenset(
+    "bash c c# c++ css diff docker go graphql html java javascript json kotlin latex makefile markdown "
+    "mermaid php powershell python r ruby rust scala shell sql swift typescript xml yaml".split()
+) | {"plain text"}
+_CODE_LANGUAGE_ALIASES = {
+    "": "plain text", "plain": "plain text", "text": "plain text", "txt": "plain text",
+    "py": "python", "js": "javascript", "ts": "typescript", "sh": "shell", "zsh": "shell", "console": "shell",
+    "yml": "yaml", "md": "markdown", "cpp": "c++", "cs": "c#", "csharp": "c#", "dockerfile": "docker", "tex": "latex",
+}
+
+
+def chunk_text(text: str, max_chars: int = MAX_TEXT_CHARS) -> list[str]:
+    """Split text into pieces of at most max_chars (one slice per piece)."""
+    if not text:
+        return []
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def _run(content: str, annotations: dict, link: str | None) -> Iterator[dict]:
+    for piece in chunk_text(content):
+        item: dict = {"type": "text", "text": {"content": piece}}
+        if link:
+            item["text"]["link"] = {"url": link}
+        if annotations:
+            item["annotations"] = dict(annotations)
+        yield item
+
+
+def rich_text(
+    text: str,
+    *,
+    citations: Sequence[str] | None = None,
+    _annotations: dict | None = None,
+    _link: str | None = None,
+) -> list[dict]:
+    """Parse inline Markdown into a Notion rich_text array."""
+    annotations = _annotations or {}
+    out: list[dict] = []
+    pos = 0
+    for m in _INLINE_RE.finditer(text):
+        if m.start() > pos:
+            out.extend(_run(text[pos:m.start()], annotations, _link))
+        pos = m.end()
+        if m.group("code") is not None:
+            out.extend(_run(m.group("code"), {**annotations, "code": True}, _link))
+        elif m.group("link_text") is not None:
+            out.extend(rich_text(m.group("link_text"), citations=citations, _annotations=annotations, _link=m.group("link_url")))
+        elif m.group("cite") is not None:
+            out.extend(_run("[", annotations, _link))
+            numbers = [n.strip() for n in m.group("cite").split(",")]
+            for i, n in enumerate(numbers):
+                k = int(n)
+                url = citations[k - 1] if citations and 1 <= k <= len(citations) else _link
+                out.extend(_run(n + (", " if i < len(numbers) - 1 else ""), annotations, url))
+            out.extend(_run("]", annotations, _link))
+        elif m.group("url") is not None:
+            out.extend(_run(m.group("url"), annotations, m.group("url")))
+        elif m.group("bold") is not None:
+            out.extend(rich_text(m.group("bold"), citations=citations, _annotations={**annotations, "bold": True}, _link=_link))
+        elif m.group("strike") is not None:
+            out.extend(rich_text(m.group("strike"), citations=citations, _annotations={**annotations, "strikethrough": True}, _link=_link))
+        else:
+            inner = m.group("italic") if m.group("italic") is not None else m.group("italic_us")
+            out.extend(rich_text(inner, citations=citations, _annotations={**annotations, "italic": True}, _link=_link))
+    if pos < len(text):
+        out.extend(_run(text[pos:], annotations, _link))
+    return out
+
+
+def _block(block_type: str, rich: list[dict], **extra) -> dict:
+    return {"object": "block", "type": block_type, block_type: {"rich_text": rich, **extra}}
+
+
+def _text_blocks(block_type: str, rich: list[dict], **extra) -> Iterator[dict]:
+    """One block, plus continuation blocks if the text needs more than 100 rich_text items."""
+    yield _block(block_type, rich[:MAX_RICH_TEXT_ITEMS], **extra)
+    for i in range(MAX_RICH_TEXT_ITEMS, len(rich), MAX_RICH_TEXT_ITEMS):
+        yield _block("code" if block_type == "code" else "paragraph", rich[i:i + MAX_RICH_TEXT_ITEMS], **extra)
+
+
+def _code_language(lang: str) -> str:
+    lang = lang.strip().lower()
+    lang = _CODE_LANGUAGE_ALIASES.get(lang, lang)
+    return lang if lang in _CODE_LANGUAGES else "plain text"
+
+
+class _ListItem:
+    __slots__ = ("indent", "block_type", "lines", "children")
+
+    def __init__(self, indent: int, block_type: str, text: str):
+        self.indent = indent
+        self.block_type = block_type
+        self.lines = [text]
+        self.children: list[_ListItem] = []
+
+    def render(self, citations: Sequence[str] | None) -> list[dict]:
+        blocks = list(_text_blocks(self.block_type, rich_text("\n".join(self.lines), citations=citations)))
+        if self.children:
+            children = [b for child in self.children for b in child.render(citations)]
+            blocks[0][self.block_type]["children"] = children
+        return blocks
+
+
+def iter_blocks(markdown: str, *, citations: Sequence[str] | None = None) -> Iterator[dict]:
+    """Yield Notion blocks for the report, top-level blocks in document order."""
+    para: list[str] = []
+    quote: list[str] = []
+    stack: list[_ListItem] = []  # open list items, outermost first
+    fence: str | None = None
+    code_lang = ""
+    code: list[str] = []
+
+    def flush_text() -> Iterator[dict]:
+        if para:
+            text = "\n".join(para).strip()
+            para.clear()
+            if text:
+                yield from _text_blocks("paragraph", rich_text(text, citations=citations))
+        if quote:
+            text = "\n".join(quote).strip()
+            quote.clear()
+            yield from _text_blocks("quote", rich_text(text, citations=citations))
+
+    def flush_list() -> Iterator[dict]:
+        if stack:
+            root = stack[0]
+            stack.clear()
+            yield from root.render(citations)
+
+    for line in (markdown or "").splitlines():
+        if fence is not None:
+            if line.strip().startswith(fence):
+                text = "\n".join(code).rstrip()
+                yield from _text_blocks("code", list(_run(text, {}, None)), language=_code_language(code_lang))
+                fence = None
+                code = []
+            else:
+                code.append(line)
+            continue
+
+        m = _LINE_RE.match(line)
+        indent = len(m.group("indent").expandtabs(4))
+
+        if m.group("blank") is not None:
+            # Paragraphs end at a blank line; lists stay open (loose lists).
+            yield from flush_text()
+            continue
+
+        list_text = m.group("bullet_text") if m.group("bullet") else m.group("number_text")
+        if list_text is not None:
+            yield from flush_text()
+            item = _ListItem(indent, "bulleted_list_item" if m.group("bullet") else "numbered_list_item", list_text.strip())
+            if not stack or stack[0].indent >= indent:
+                # A new top-level item: the previous one (with its children) is complete.
+                yield from flush_list()
+                stack.append(item)
+                continue
+            while stack[-1].indent >= indent:
+                stack.pop()
+            while len(stack) >= MAX_LIST_DEPTH:
+                stack.pop()
+            stack[-1].children.append(item)
+            stack.append(item)
+            continue
+
+        if m.group("text") is not None and stack and indent > 0 and not para:
+            # Indented continuation of the innermost open item it is indented under.
+            owner = next((it for it in reversed(stack) if it.indent < indent), stack[0])
+            owner.lines.append(m.group("text").strip())
+            continue
+
+        yield from flush_list()
+        if m.group("fence"):
+            yield from flush_text()
+            fence = m.group("fence")
+            code_lang = m.group("lang")
+        elif m.group("hr") is not None:
+            yield from flush_text()
+            yield {"object": "block", "type": "divider", "divider": {}}
+        elif m.group("hashes"):
+            yield from flush_text()
+            level = min(len(m.group("hashes")), 3)
+            yield from _text_blocks(f"heading_{level}", rich_text(m.group("heading"), citations=citations))
+        elif m.group("quote") is not None:
+            if para:
+                yield from flush_text()
+            quote.append(m.group("quote"))
+        else:
+            if quote:
+                yield from flush_text()
+            para.append(line.rstrip())
+
+    if fence is not None:
+        # Unterminated fence: keep the content rather than dropping it.
+        yield from _text_blocks("code", list(_run("\n".join(code).rstrip(), {}, None)), language=_code_language(code_lang))
+    yield from flush_text()
+    yield from flush_list()
+
+
+# -----------------------
+# Micro-benchmark
+# -----------------------
+def _sample_report(words: int) -> str:
+    paragraph = (
+        "The **Indian quick-commerce market** reached *$3.3 billion* in FY24 [1], growing `~70%` year over year "
+        "according to [Redseer](https://redseer.com/reports/quick-commerce) and https://www.example.com/q-commerce-2024. "
+        "Dark-store density and ~~discount-led~~ basket growth explain most of the gain [2, 3]."
+    )
+    section = [
+        "## Market size and growth",
+        "",
+        paragraph,
+        "",
+        "- Top players by GMV [4]",
+        "  - Blinkit: **46%** share",
+        "    - Driven by *Zomato* cross-sell",
+        "  - Swiggy Instamart: 27%",
+        "1. Dark-store economics improve after month 9",
+        "",
+        "> Unit economics are positive in the top 8 cities.",
+        "",
+        "```python",
+        "cagr = (end / start) ** (1 / years) - 1",
+        "```",
+        "",
+        "---",
+    ]
+    per_section = len(" ".join(section).split())
+    sections = max(1, words // per_section)
+    sources = ["## Sources"] + [f"- https://source{i}.example.com/report" for i in range(50)]
+    return "\n".join(["# Quick commerce in India", ""] + section * sections + sources)
+
+
+def _legacy_chunk_text(text: str, max_chars: int = MAX_TEXT_CHARS) -> list[str]:
+    # The previous chunker: re-slices the remainder on every step (quadratic copying).
+    chunks = []
+    while text:
+        chunks.append(text[:max_chars])
+        text = text[max_chars:]
+    return chunks
+
+
+def _best_ms(fn, repeat: int) -> tuple[float, float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return min(times), statistics.median(times)
+
+
+def bench(words: int = 20000, repeat: int = 5) -> None:
+    report = _sample_report(words)
+    blocks = list(iter_blocks(report))
+    best, median = _best_ms(lambda: list(iter_blocks(report)), repeat)
+    print(
+        f"[Bench] iter_blocks | words={len(report.split())} | chars={len(report)} | blocks={len(blocks)} | "
+        f"best_ms={best:.1f} | median_ms={median:.1f} | MB_per_s={len(report) / 1e6 / (best / 1000):.1f}"
+    )
+    code = "x = 1\n" * (len(report) // 6 * 4)  # one long code block, ~4x the report size
+    new_best, _ = _best_ms(lambda: chunk_text(code), repeat)
+    old_best, _ = _best_ms(lambda: _legacy_chunk_text(code), repeat)
+    print(f"[Bench] chunk_text | chars={len(code)} | linear_ms={new_best:.2f} | legacy_ms={old_best:.2f}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "bench":
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+    else:
+        print("Usage: python market_research/notion_blocks.py bench [words]")
+        sys.exit(1)
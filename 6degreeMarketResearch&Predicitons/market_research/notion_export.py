@@ -0,0 +1,327 @@
+"""
+Notion page exporter with pipelined appends and block-level diffing.
+
+- Create: the first 100 blocks (Notion's limit) go with the page create, the
+  rest are appended in batches of up to 100. Appends to one parent must be
+  sequential to keep block order, so the pipeline overlaps the work instead: a
+  producer thread builds and serializes the next batch while the current one is
+  in flight. Request starts are spaced by the caller's limiter (Notion allows
+  ~3 req/s). POST /pages doesn't return the ids of the blocks sent with it;
+  they are looked up (by position) the first time the page is updated.
+- Update: each top-level block is hashed (sha256 of its canonical JSON). The
+  saved state from the last export (block ids + hashes) is diffed against the
+  new blocks (difflib over the hashes). Unchanged blocks are left alone. In each
+  changed range, blocks of the same type are updated in place, surplus old
+  blocks are deleted, and surplus new blocks are inserted with `after`. A
+  one-paragraph edit costs one API call.
+  If an update fails part-way (or a block was deleted by hand in Notion), the
+  state no longer matches the page: it is rebuilt from the page's live children
+  and the update is retried once. Only a page that itself is gone (404 /
+  archived) is replaced by a new page.
+
+State is a small JSON file: {"page_id": ..., "blocks": [{"id", "hash", "type", "has_children"}]},
+plus "interrupted": true while an update is being applied.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import itertools
+import json
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Iterable
+
+from shared.http_client import get_http_client
+
+NOTION_API = "https://api.notion.com/v1"
+MAX_BLOCKS_PER_APPEND = 100
+
+
+def block_hash(block: dict) -> str:
+    return hashlib.sha256(json.dumps(block, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _state_entry(created: dict | None, block: dict) -> dict:
+    return {
+        "id": created["id"] if created else None,
+        "hash": block_hash(block),
+        "type": block.get("type"),
+        "has_children": bool(block.get(block.get("type"), {}).get("children")),
+    }
+
+
+class NotionExporter:
+    def __init__(
+        self,
+        token: str,
+        *,
+        version: str = "2022-06-28",
+        limiter: Any = None,
+        logger: logging.Logger | None = None,
+    ):
+        self.token = token
+        self.version = version
+        self.limiter = limiter
+        self.logger = logger
+        self.calls = 0
+
+    def _log(self, msg: str) -> None:
+        if self.logger:
+            self.logger.info(msg)
+
+    def _request(self, method: str, path: str, payload: dict | None = None) -> dict:
+        # Retries for rate limits / transient server errors come from the shared HTTP client.
+        self.calls += 1
+        endpoint = "notion." + ("children" if "/children" in path else path.strip("/").split("/")[0])
+        resp = get_http_client().request(
+            method,
+            f"{NOTION_API}{path}",
+            endpoint=endpoint,
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Notion-Version": self.version,
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=(10, 60),
+            max_retries=3,
+            backoff_s=1.5,
+            limiter=self.limiter,
+            logger=self.logger,
+        )
+        if 200 <= resp.status_code < 300:
+            return resp.json()
+        raise RuntimeError(f"Notion API error (status {resp.status_code}): {resp.text}")
+
+    # -----------------------
+    # Create
+    # -----------------------
+    def _append_pipelined(self, parent_id: str, blocks: Iterable[dict], *, after: str | None = None) -> list[dict]:
+        """
+        Append blocks in order, 100 per request. A producer thread batches (and
+        serializes) upcoming blocks while the current request is in flight.
+        Returns state entries for the created blocks.
+        """
+        batches: queue.Queue = queue.Queue(maxsize=2)
+        producer_error: list[BaseException] = []
+
+        def produce() -> None:
+            try:
+                batch: list[dict] = []
+                for block in blocks:
+                    batch.append(block)
+                    if len(batch) == MAX_BLOCKS_PER_APPEND:
+                        batches.put(batch)
+                        batch = []
+                if batch:
+                    batches.put(batch)
+            except BaseException as e:  # surfaced in the consumer
+                producer_error.append(e)
+            finally:
+                batches.put(None)
+
+        threading.Thread(target=produce, name="notion-batcher", daemon=True).start()
+        entries: list[dict] = []
+        i = 0
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            i += 1
+            payload: dict[str, Any] = {"children": batch}
+            if after:
+                payload["after"] = after
+            result = self._request("PATCH", f"/blocks/{parent_id}/children", payload)
+            created = result.get("results", [])
+            entries.extend(_state_entry(c, b) for c, b in zip(created, batch))
+            if created:
+                after = created[-1]["id"]
+            self._log(f"[Notion] Appended batch | idx={i} | blocks={len(batch)}")
+        if producer_error:
+            raise producer_error[0]
+        return entries
+
+    def create_page(self, *, parent_page_id: str, title: str, blocks: Iterable[dict]) -> tuple[dict, dict]:
+        """Create a page with the first batch of blocks and append the rest. Returns (page, state)."""
+        blocks = iter(blocks)
+        first = list(itertools.islice(blocks, MAX_BLOCKS_PER_APPEND))
+        page = self._request("POST", "/pages", {
+            "parent": {"page_id": parent_page_id},
+            "properties": {"title": {"title": [{"type": "text", "text": {"content": title}}]}},
+            "children": first,
+        })
+        self._log(f"[Notion] Page created | page_id={page.get('id')} | blocks={len(first)}")
+        entries = [_state_entry(None, b) for b in first]  # ids filled in by _resolve_ids()
+        entries.extend(self._append_pipelined(page["id"], blocks))
+        return page, {"page_id": page["id"], "blocks": entries}
+
+    # -----------------------
+    # Update (block-level diff)
+    # -----------------------
+    def update_page(self, state: dict, blocks: list[dict]) -> dict:
+        """Bring the page described by `state` in line with `blocks`. Returns the new state."""
+        page_id = state["page_id"]
+        old = state["blocks"]
+        matcher = difflib.SequenceMatcher(None, [o["hash"] for o in old], [block_hash(b) for b in blocks], autojunk=False)
+        opcodes = matcher.get_opcodes()
+        if all(tag == "equal" for tag, *_ in opcodes):
+            self._log(f"[Notion] Page unchanged | page_id={page_id}")
+            return state
+
+        calls_before = self.calls
+        new_entries: list[dict] = []
+        last_kept: str | None = None
+        unchanged = updated = deleted = inserted = 0
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                new_entries.extend(old[i1:i2])
+                last_kept = old[i2 - 1]["id"]
+                unchanged += i2 - i1
+                continue
+
+            # 1) Same-type, childless pairs are updated in place (block children can't be PATCHed).
+            olds, news = old[i1:i2], blocks[j1:j2]
+            pairs = 0
+            for o, n in zip(olds, news):
+                if o["type"] != n.get("type") or o["has_children"] or n.get(n.get("type"), {}).get("children"):
+                    break
+                self._request("PATCH", f"/blocks/{o['id']}", {n["type"]: n[n["type"]]})
+                new_entries.append(_state_entry(o, n))
+                last_kept = o["id"]
+                pairs += 1
+            updated += pairs
+
+            # 2) Remaining old blocks in the range are deleted.
+            for o in olds[pairs:]:
+                self._request("DELETE", f"/blocks/{o['id']}")
+                deleted += 1
+
+            # 3) Remaining new blocks are inserted after the last kept block.
+            to_insert = news[pairs:]
+            if not to_insert:
+                continue
+            if last_kept is None:
+                # Notion can only insert *after* a block; a change at the very top with nothing
+                # kept before it means re-uploading everything from here down.
+                for o in old[i2:]:
+                    self._request("DELETE", f"/blocks/{o['id']}")
+                    deleted += 1
+                entries = self._append_pipelined(page_id, blocks[j1 + pairs:])
+                self._log(f"[Notion] Page rewritten from top | page_id={page_id} | blocks={len(entries)}")
+                return {"page_id": page_id, "blocks": new_entries + entries}
+            entries = self._append_pipelined(page_id, to_insert, after=last_kept)
+            new_entries.extend(entries)
+            if entries:
+                last_kept = entries[-1]["id"]
+            inserted += len(entries)
+
+        self._log(
+            f"[Notion] Page updated | page_id={page_id} | unchanged={unchanged} | updated={updated} | "
+            f"deleted={deleted} | inserted={inserted} | calls={self.calls - calls_before}"
+        )
+        return {"page_id": page_id, "blocks": new_entries}
+
+    def _page_available(self, page_id: str) -> bool:
+        """False if the page itself is gone (404, archived or in trash)."""
+        try:
+            page = self._request("GET", f"/pages/{page_id}")
+        except RuntimeError as e:
+            if "status 404" in str(e):
+                return False
+            raise
+        return not page.get("archived") and not page.get("in_trash")
+
+    def _live_state(self, state: dict) -> dict:
+        """
+        Rebuild `state` from the page's current top-level blocks. Hashes carry over
+        by block id; blocks the state does not know get no hash, so the next diff
+        replaces them.
+        """
+        known = {b["id"]: b for b in state["blocks"] if b["id"]}
+        entries = [
+            known.get(b["id"]) or {"id": b["id"], "hash": None, "type": b.get("type"), "has_children": bool(b.get("has_children"))}
+            for b in self._children(state["page_id"])
+        ]
+        return {"page_id": state["page_id"], "blocks": entries}
+
+    def _resolve_ids(self, state: dict) -> dict:
+        """
+        Fill in the ids of blocks sent with the page create (POST /pages doesn't return
+        them) from the page's children, by position. If the page no longer lines up
+        with the state, fall back to _live_state().
+        """
+        if all(b["id"] for b in state["blocks"]):
+            return state
+        live = self._children(state["page_id"])
+        if len(live) != len(state["blocks"]) or any(
+            b["id"] and b["id"] != lb["id"] for b, lb in zip(state["blocks"], live)
+        ):
+            self._log(f"[Notion] Page out of sync with saved state, re-reading blocks | page_id={state['page_id']}")
+            return self._live_state(state)
+        entries = [b if b["id"] else {**b, "id": lb["id"]} for b, lb in zip(state["blocks"], live)]
+        return {"page_id": state["page_id"], "blocks": entries}
+
+    def _children(self, page_id: str) -> list[dict]:
+        """The page's current top-level blocks."""
+        children: list[dict] = []
+        cursor = None
+        while True:
+            path = f"/blocks/{page_id}/children?page_size=100" + (f"&start_cursor={cursor}" if cursor else "")
+            result = self._request("GET", path)
+            children.extend(result.get("results", []))
+            cursor = result.get("next_cursor")
+            if not result.get("has_more") or not cursor:
+                break
+        return children
+
+    # -----------------------
+    # Entry point
+    # -----------------------
+    @staticmethod
+    def _save_state(state_path: Path | None, state: dict) -> None:
+        if state_path is None:
+            return
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = state_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        tmp.replace(state_path)
+
+    def export(self, *, title: str, blocks: Iterable[dict], parent_page_id: str, state_path: Path | None = None) -> dict:
+        """
+        Update the page recorded in state_path if there is one, else create a new page.
+        Falls back to creating a page only if the recorded page was deleted or archived.
+        Returns the new state.
+        """
+        state = None
+        if state_path is not None and state_path.exists():
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+
+        if state and state.get("page_id"):
+            blocks = list(blocks)
+            try:
+                if state.get("interrupted"):
+                    # The last update stopped part-way: its saved blocks no longer match the page.
+                    self._log(f"[Notion] Previous update did not finish, re-reading blocks | page_id={state['page_id']}")
+                    state = self._live_state(state)
+                state = self._resolve_ids(state)
+                # Marked until the new state is saved, so a crash mid-update is detected next run.
+                self._save_state(state_path, {**state, "interrupted": True})
+                new_state = self.update_page(state, blocks)
+            except RuntimeError as e:
+                if not self._page_available(state["page_id"]):
+                    self._log(f"[Notion] Recorded page unavailable, creating a new page | page_id={state['page_id']} | {e}")
+                    _, new_state = self.create_page(parent_page_id=parent_page_id, title=title, blocks=blocks)
+                else:
+                    # Some blocks in the state are gone (a partial earlier update, or edits in
+                    # Notion): diff against what is on the page now. A second failure surfaces.
+                    self._log(f"[Notion] Page out of sync with saved state, re-reading blocks | page_id={state['page_id']} | {e}")
+                    new_state = self.update_page(self._live_state(state), blocks)
+        else:
+            _, new_state = self.create_page(parent_page_id=parent_page_id, title=title, blocks=blocks)
+
+        self._save_state(state_path, new_state)
+        return new_state
@@ -0,0 +1,228 @@
+"""
+Structured research memory for ResearchAgent.
+
+Each Perplexity answer is split into findings (claim, numbers, citation URLs).
+Facts repeated across answers are merged. The critic gets a token-budgeted
+digest instead of the raw, ever-growing concatenation of every answer. The
+writer still gets the full evidence when it fits its context window.
+
+Token counts are estimated (~4 characters per token); that is close enough to
+budget prompts without pulling in a tokenizer.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+CHARS_PER_TOKEN = 4
+
+_CITATION_RE = re.compile(r"\[(\d+)\]")
+_NUMBER_RE = re.compile(
+    r"(?:[$€£₹]\s?)?\d[\d,]*(?:\.\d+)?\s?(?:%|percent|x\b|trillion|billion|million|bn\b|mn\b|crore|lakh|[BMK]\b)?",
+    re.IGNORECASE,
+)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[$€£₹])")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+# Two claims sharing a number are the same fact when their wording overlaps this much;
+# claims without numbers need a near-identical wording.
+_DUP_JACCARD_WITH_NUMBER = 0.5
+_DUP_JACCARD_NO_NUMBER = 0.8
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class Finding:
+    claim: str
+    numbers: list[str]
+    citations: list[str]
+    source_idx: int
+    tokens: frozenset[str] = field(repr=False, default=frozenset())
+
+    def score(self) -> int:
+        # Hard numbers and cited claims are what the critic checks for first.
+        return 2 * min(len(self.numbers), 3) + (1 if self.citations else 0)
+
+    def render(self) -> str:
+        domains = sorted({urlparse(u).netloc.removeprefix("www.") for u in self.citations if u})
+        cite = f" [src: {', '.join(domains[:3])}]" if domains else ""
+        return f"- {self.claim}{cite}"
+
+
+@dataclass
+class _Answer:
+    idx: int
+    question: str | None
+    text: str
+    findings: list[Finding]
+
+
+def _normalize_number(raw: str) -> str:
+    return re.sub(r"[\s,]", "", raw.lower())
+
+
+def _split_claims(text: str) -> list[str]:
+    claims = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or set(line) <= set("-*_|: "):
+            continue
+        line = re.sub(r"^(?:[-*+]|\d+[.)])\s+", "", line)  # list markers
+        line = line.replace("**", "").replace("__", "")
+        for sentence in _SENTENCE_SPLIT_RE.split(line):
+            sentence = sentence.strip()
+            if len(sentence) >= 20:
+                claims.append(sentence)
+    return claims
+
+
+class ResearchContext:
+    def __init__(self):
+        self._answers: list[_Answer] = []
+        self._findings: list[Finding] = []
+        self._by_number: dict[str, list[Finding]] = {}
+        self._without_numbers: list[Finding] = []
+        self.duplicates_merged = 0
+
+    def __len__(self) -> int:
+        return len(self._findings)
+
+    def _find_duplicate(self, tokens: frozenset[str], numbers: list[str]) -> Finding | None:
+        if numbers:
+            candidates = {id(f): f for n in numbers for f in self._by_number.get(n, [])}.values()
+            threshold = _DUP_JACCARD_WITH_NUMBER
+        else:
+            candidates = self._without_numbers
+            threshold = _DUP_JACCARD_NO_NUMBER
+        for other in candidates:
+            union = tokens | other.tokens
+            if union and len(tokens & other.tokens) / len(union) >= threshold:
+                return other
+        return None
+
+    def add_answer(self, text: str, *, idx: int, question: str | None = None, citations: list[str] | None = None) -> int:
+        """Split one answer into findings. Returns how many new (non-duplicate) findings it added."""
+        citations = citations or []
+        new_findings = []
+        for sentence in _split_claims(text):
+            urls = []
+            for m in _CITATION_RE.finditer(sentence):
+                n = int(m.group(1))
+                if 1 <= n <= len(citations) and citations[n - 1] not in urls:
+                    urls.append(citations[n - 1])
+            claim = re.sub(r"\s+([.,;:])", r"\1", _CITATION_RE.sub("", sentence)).strip()
+            plain = _CITATION_RE.sub(" ", sentence)
+            numbers = [_normalize_number(m.group(0)) for m in _NUMBER_RE.finditer(plain)]
+            # Bare years and list ordinals are not the hard numbers we are tracking.
+            numbers = [n for n in numbers if not re.fullmatch(r"(19|20)\d\d|\d", n)]
+            tokens = frozenset(w for w in _WORD_RE.findall(claim.lower()) if w not in _STOPWORDS)
+            if not tokens:
+                continue
+
+            duplicate = self._find_duplicate(tokens, numbers)
+            if duplicate is not None:
+                self.duplicates_merged += 1
+                for u in urls:
+                    if u not in duplicate.citations:
+                        duplicate.citations.append(u)
+                continue
+
+            finding = Finding(claim=claim, numbers=numbers, citations=urls, source_idx=idx, tokens=tokens)
+            self._findings.append(finding)
+            new_findings.append(finding)
+            if numbers:
+                for n in numbers:
+                    self._by_number.setdefault(n, []).append(finding)
+            else:
+                self._without_numbers.append(finding)
+
+        self._answers.append(_Answer(idx=idx, question=question, text=text, findings=new_findings))
+        return len(new_findings)
+
+    def answers(self) -> list[dict]:
+        """Raw answers in insertion order (for checkpoints; replay them with add_answer)."""
+        return [{"idx": a.idx, "question": a.question, "text": a.text} for a in self._answers]
+
+    def full_text(self) -> str:
+        """Every answer verbatim, in research order (what the agent used to send everywhere)."""
+        parts = []
+        for a in sorted(self._answers, key=lambda a: a.idx):
+            parts.append(f"Q: {a.question}\nA: {a.text}" if a.question else a.text)
+        return "\n---\n".join(parts)
+
+    def digest(self, token_budget: int) -> str:
+        """
+        Deduplicated findings grouped by research question, trimmed to token_budget.
+        The highest-value findings (numbers, citations) are kept first; output order
+        follows the research order.
+        """
+        answers = sorted(self._answers, key=lambda a: a.idx)
+        headers = {a.idx: self._header(a) for a in answers}
+        keep = self._select(token_budget, sum(estimate_tokens(h) + 1 for h in headers.values()))
+
+        lines = []
+        for a in answers:
+            kept = [f.render() for f in a.findings if id(f) in keep]
+            if not a.findings:
+                kept = ["- (no new facts beyond earlier answers)"]
+            if kept:
+                lines.append(headers[a.idx])
+                lines.extend(kept)
+                lines.append("")
+        omitted = len(self._findings) - len(keep)
+        if omitted:
+            lines.append(f"({omitted} lower-priority findings omitted to fit the {token_budget}-token budget)")
+        return "\n".join(lines).strip()
+
+    @staticmethod
+    def _header(a: _Answer) -> str:
+        return f"### [{a.idx:02d}] {a.question or 'Initial deep dive'}"
+
+    def _select(self, token_budget: int, used: int) -> set[int]:
+        """ids of the findings that fit the budget, highest-value first."""
+        ranked = sorted(
+            ((f.score(), -f.source_idx, -i, f) for i, f in enumerate(self._findings)),
+            key=lambda t: t[:3],
+            reverse=True,
+        )
+        keep: set[int] = set()
+        for _, _, _, f in ranked:
+            cost = estimate_tokens(f.render()) + 1
+            if used + cost > token_budget:
+                continue
+            keep.add(id(f))
+            used += cost
+        return keep
+
+    def findings_for(self, idx: int) -> list[Finding]:
+        """The new (non-duplicate) findings answer `idx` contributed."""
+        return [f for a in self._answers if a.idx == idx for f in a.findings]
+
+    def cited_urls(self, token_budget: int | None = None) -> list[str]:
+        """
+        Citation URLs of the findings, in research order: all of them, or only those
+        of the findings digest(token_budget) keeps.
+        """
+        findings = self._findings
+        if token_budget is not None:
+            keep = self._select(token_budget, sum(estimate_tokens(self._header(a)) + 1 for a in self._answers))
+            findings = [f for f in findings if id(f) in keep]
+        urls: dict[str, None] = {}
+        for f in sorted(findings, key=lambda f: f.source_idx):
+            urls.update(dict.fromkeys(f.citations))
+        return list(urls)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "answers": len(self._answers),
+            "findings": len(self._findings),
+            "duplicates_merged": self.duplicates_merged,
+            "full_text_tokens": estimate_tokens(self.full_text()),
+        }
@@ -1,16 +1,17 @@
 import os
+import sys
 import json
 import re
 import time
 import uuid
+import hashlib
 import logging
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
-import xml.etree.ElementTree as ET
-
-import requests
+from xml.etree import ElementTree as ET
 
 # Supabase client (optional - only needed for --publish)
 try:
@@ -20,23 +21,18 @@ except ImportError:
     _SUPABASE_AVAILABLE = False
     SupabaseClient = None  # type: ignore
 
-# Gemini client compatibility:
-# - Preferred: google-genai (import path: from google import genai)
-# - Fallback: google-generativeai (import path: import google.generativeai as genai)
-try:
-    from google import genai as _genai  # type: ignore
-    from google.genai import types as _genai_types  # type: ignore
-    _GEMINI_BACKEND = "google-genai"
-except Exception:
-    _genai = None
-    _genai_types = None
-    _GEMINI_BACKEND = "google-generativeai"
-    import google.generativeai as _genai_fallback  # type: ignore
+# Shared infrastructure (pooled HTTP client, Gemini client, ...) lives in ../shared
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from shared.feeds import fetch_feeds, iter_entries
+from shared.http_client import get_http_client
+from shared.llm_client import get_llm_client, GEMINI_BACKEND as _GEMINI_BACKEND
+from shared.providers import perplexity_chat_url, provider_mode, require_key
+from shared.rate_limit import get_limiter, limiter_stats
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]  # for shared .env
 PREDICTION_QUESTIONS_DIR = Path(__file__).resolve().parent
-RUNS_DIR = PREDICTION_QUESTIONS_DIR / "runs"
+RUNS_DIR = Path(os.getenv("PREDICTION_RUNS_DIR") or PREDICTION_QUESTIONS_DIR / "runs")
 
 def _load_env_file(path: str = ".env") -> None:
     """
@@ -66,8 +62,7 @@ def _load_env_file(path: str = ".env") -> None:
 
 _load_env_file(str(REPO_ROOT / ".env"))
 
-PERPLEXITY_API_KEY = (os.getenv("PERPLEXITY_API_KEY") or "").strip()
-GEMINI_API_KEY = (os.getenv("GEMINI_API_KEY") or "").strip()
+# PERPLEXITY_API_KEY / GEMINI_API_KEY are read on use via require_key() (shared/providers.py).
 
 # Supabase config (optional - only needed for --publish)
 # Uses same env vars as the backend
@@ -75,83 +70,177 @@ SUPABASE_URL = (os.getenv("SUPABASE_URL") or "").strip()
 SUPABASE_SERVICE_ROLE_KEY = (os.getenv("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
 SYSTEM_USER_ID = (os.getenv("SYSTEM_USER_ID") or "").strip()
 
-if not PERPLEXITY_API_KEY:
-    raise RuntimeError("Missing PERPLEXITY_API_KEY. Add it to your .env or environment variables.")
-if not GEMINI_API_KEY:
-    raise RuntimeError("Missing GEMINI_API_KEY. Add it to your .env or environment variables.")
+
+# Predictions are published as multi-row upserts of PUBLISH_BATCH_SIZE rows. Each row carries
+# external_source/external_id (unique per post; supabase/migrations/20251224190000_reddit_external_columns.sql),
+# so republishing skips questions that are already posted instead of duplicating them.
+PUBLISH_BATCH_SIZE = max(1, int(os.getenv("PUBLISH_BATCH_SIZE", "50")))
+PREDICTION_EXTERNAL_SOURCE = "prediction_pipeline"
+PREDICTION_CATEGORIES = {"funding", "expansion", "regulatory", "competition", "leadership", "ipo", "acquisition", "other"}
+
+_SUPABASE_CLIENT: "SupabaseClient | None" = None
+_COMMUNITY_IDS: dict[str, str] = {}
+_SUPABASE_LOCK = threading.Lock()
 
 
 def _get_supabase_client() -> "SupabaseClient":
-    """Get Supabase client for publishing. Raises if not configured."""
+    """Process-wide Supabase client for publishing (created on first use). Raises if not configured."""
+    global _SUPABASE_CLIENT
     if not _SUPABASE_AVAILABLE:
         raise RuntimeError("Supabase not installed. Run: pip install supabase")
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY in environment")
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    with _SUPABASE_LOCK:
+        if _SUPABASE_CLIENT is None:
+            _SUPABASE_CLIENT = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        return _SUPABASE_CLIENT
 
 
 def _get_predictions_community_id(supabase: "SupabaseClient") -> str:
-    """Get the 'predictions' community ID from forum_communities."""
-    result = supabase.table("forum_communities").select("id").eq("slug", "predictions").single().execute()
+    """Get the 'predictions' community ID from forum_communities (looked up once per process)."""
+    with _SUPABASE_LOCK:
+        if "predictions" in _COMMUNITY_IDS:
+            return _COMMUNITY_IDS["predictions"]
+    with get_limiter("supabase").permit():
+        result = supabase.table("forum_communities").select("id").eq("slug", "predictions").single().execute()
     if not result.data:
         raise RuntimeError("Predictions community not found. Run migration 113 first.")
+    with _SUPABASE_LOCK:
+        _COMMUNITY_IDS["predictions"] = result.data["id"]
     return result.data["id"]
 
 
+def prediction_key(q: dict[str, Any]) -> str:
+    """Idempotency key of a prediction: the same company + question + resolution date is the same post."""
+    parts = [q.get("company", ""), q.get("question_text", ""), q.get("resolution_date", "")]
+    normalized = "|".join(re.sub(r"\s+", " ", str(p or "")).strip().lower() for p in parts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+def _prediction_row(q: dict[str, Any], *, community_id: str) -> dict[str, Any]:
+    """forum_posts row for one question. Raises ValueError for a question that cannot be posted."""
+    question_text = (q.get("question_text") or "").strip()
+    if not question_text:
+        raise ValueError("empty question_text")
+
+    # Map category to allowed values
+    category = (q.get("category", "") or "").strip().lower()
+    if category not in PREDICTION_CATEGORIES:
+        category = "other"
+
+    probability = float(q.get("initial_probability", 0.5))
+    if not 0.0 <= probability <= 1.0:
+        raise ValueError(f"initial_probability out of range: {probability}")
+
+    return {
+        "community_id": community_id,
+        "user_id": SYSTEM_USER_ID,
+        "content": question_text,
+        "body": f"**Headline:** {q.get('headline', 'N/A')}\n\n**Resolution Source:** {q.get('resolution_source', 'N/A')}",
+        "post_type": "prediction",
+        "headline": q.get("headline", ""),
+        "company": q.get("company", ""),
+        "resolution_date": (q.get("resolution_date", "") or "").strip() or None,
+        "resolution_source": q.get("resolution_source", ""),
+        "prediction_category": category,
+        "initial_probability": probability,
+        "external_source": PREDICTION_EXTERNAL_SOURCE,
+        "external_id": prediction_key(q),
+    }
+
+
+@dataclass
+class PublishReport:
+    """Outcome of publish_predictions_to_forum(), one entry per question in `rows`."""
+
+    inserted: int = 0
+    skipped: int = 0  # already published by an earlier run (same idempotency key)
+    failed: int = 0
+    batches: int = 0
+    rows: list[dict[str, Any]] = field(default_factory=list)
+
+    def record(self, key: str | None, q: dict[str, Any], status: str, error: str | None = None) -> None:
+        if status == "inserted":
+            self.inserted += 1
+        elif status == "skipped":
+            self.skipped += 1
+        else:
+            self.failed += 1
+        self.rows.append({"key": key, "company": q.get("company", ""), "status": status, "error": error})
+
+
+def _upsert_predictions(supabase: "SupabaseClient", rows: list[dict[str, Any]]) -> set[str]:
+    """One multi-row upsert; returns the external_ids actually inserted (existing keys are ignored)."""
+    with get_limiter("supabase").permit():
+        result = (
+            supabase.table("forum_posts")
+            .upsert(rows, on_conflict="external_source,external_id", ignore_duplicates=True)
+            .execute()
+        )
+    return {r.get("external_id") for r in result.data or []}
+
+
 def publish_predictions_to_forum(
     questions: list[dict[str, Any]],
     *,
     logger: logging.Logger | None = None,
-) -> int:
+    batch_size: int = PUBLISH_BATCH_SIZE,
+) -> PublishReport:
     """
-    Publish prediction questions to Supabase forum_posts table.
-    Returns count of successfully inserted predictions.
+    Publish prediction questions to Supabase forum_posts table, batch_size rows per request.
+    Questions published before (same prediction_key) are skipped, so reruns are safe.
+    A batch the database rejects is retried row by row to pin the error on the row(s) that caused it.
+    Returns a per-question PublishReport.
     """
     if not SYSTEM_USER_ID:
         raise RuntimeError("Missing SYSTEM_USER_ID in .env. Set to an admin user UUID.")
     
     supabase = _get_supabase_client()
     community_id = _get_predictions_community_id(supabase)
-    
-    inserted = 0
+    report = PublishReport()
+
+    pending: list[tuple[dict[str, Any], dict[str, Any]]] = []
+    seen: set[str] = set()
     for q in questions:
-        question_text = q.get("question_text", "").strip()
-        if not question_text:
+        try:
+            row = _prediction_row(q, community_id=community_id)
+        except (TypeError, ValueError) as e:
+            report.record(None, q, "failed", f"invalid: {e}")
             continue
-        
-        # Parse resolution_date
-        resolution_date = q.get("resolution_date", "").strip() or None
-        
-        # Map category to allowed values
-        category = (q.get("category", "") or "").strip().lower()
-        allowed_categories = {"funding", "expansion", "regulatory", "competition", "leadership", "ipo", "acquisition", "other"}
-        if category not in allowed_categories:
-            category = "other"
-        
-        post_data = {
-            "community_id": community_id,
-            "user_id": SYSTEM_USER_ID,
-            "content": question_text,
-            "body": f"**Headline:** {q.get('headline', 'N/A')}\n\n**Resolution Source:** {q.get('resolution_source', 'N/A')}",
-            "post_type": "prediction",
-            "headline": q.get("headline", ""),
-            "company": q.get("company", ""),
-            "resolution_date": resolution_date,
-            "resolution_source": q.get("resolution_source", ""),
-            "prediction_category": category,
-            "initial_probability": float(q.get("initial_probability", 0.5)),
-        }
-        
+        if row["external_id"] in seen:
+            report.record(row["external_id"], q, "skipped", "duplicate in this run")
+            continue
+        seen.add(row["external_id"])
+        pending.append((q, row))
+
+    for start in range(0, len(pending), max(1, batch_size)):
+        batch = pending[start:start + batch_size]
+        report.batches += 1
         try:
-            supabase.table("forum_posts").insert(post_data).execute()
-            inserted += 1
-            if logger:
-                logger.info(f"[Publish] Inserted prediction | company={q.get('company', 'N/A')}")
+            inserted = _upsert_predictions(supabase, [row for _, row in batch])
         except Exception as e:
+            # PostgREST applies a batch atomically: find the offending row(s) one at a time.
             if logger:
-                logger.error(f"[Publish] Failed to insert | error={e}")
-    
-    return inserted
+                logger.error(f"[Publish] Batch failed; retrying row by row | rows={len(batch)} | error={e}")
+            for q, row in batch:
+                try:
+                    status = "inserted" if _upsert_predictions(supabase, [row]) else "skipped"
+                    report.record(row["external_id"], q, status)
+                except Exception as row_error:
+                    report.record(row["external_id"], q, "failed", str(row_error))
+                    if logger:
+                        logger.error(f"[Publish] Failed to insert | key={row['external_id']} | company={q.get('company', 'N/A')} | error={row_error}")
+            continue
+        for q, row in batch:
+            report.record(row["external_id"], q, "inserted" if row["external_id"] in inserted else "skipped")
+        if logger:
+            logger.info(f"[Publish] Batch upserted | rows={len(batch)} | inserted={len(inserted)} | skipped={len(batch) - len(inserted)}")
+
+    if logger:
+        logger.info(
+            f"[Publish] Done | inserted={report.inserted} | skipped={report.skipped} | failed={report.failed} | batches={report.batches}"
+        )
+    return report
 
 
 def _normalize_gemini_model(model: str) -> str:
@@ -177,45 +266,26 @@ def _setup_logger(log_path: Path) -> logging.Logger:
     return logger
 
 
-def _gemini_generate(prompt: str, *, temperature: float, response_mime_type: str | None = None) -> str:
+def _gemini_generate(
+    prompt: str,
+    *,
+    temperature: float,
+    response_mime_type: str | None = None,
+    label: str = "gemini",
+    logger: logging.Logger | None = None,
+) -> str:
     """
-    Generate content using Gemini, supporting both google-genai and google-generativeai.
+    Generate content using the process-wide Gemini client (see shared/llm_client.py).
     Returns plain text.
     """
-    if _GEMINI_BACKEND == "google-genai":
-        client = _genai.Client(api_key=GEMINI_API_KEY)  # type: ignore[union-attr]
-        config_kwargs: dict[str, Any] = {"temperature": temperature}
-        if response_mime_type:
-            config_kwargs["response_mime_type"] = response_mime_type
-        config = _genai_types.GenerateContentConfig(**config_kwargs)  # type: ignore[union-attr]
-        resp = client.models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config)
-        return resp.text
-
-    _genai_fallback.configure(api_key=GEMINI_API_KEY)
-    model = _genai_fallback.GenerativeModel(GEMINI_MODEL)
-    resp = model.generate_content(prompt, generation_config={"temperature": temperature})
-    return getattr(resp, "text", str(resp))
-
-
-def _strip_xml_ns(tag: str) -> str:
-    # "{namespace}tag" -> "tag"
-    return tag.split("}", 1)[-1] if "}" in tag else tag
-
-
-def _first_text(el: ET.Element | None) -> str:
-    if el is None:
-        return ""
-    return (el.text or "").strip()
-
-
-def _find_child_text(parent: ET.Element, tag_name: str) -> str:
-    """
-    Find first child whose local tag matches tag_name, ignoring namespaces.
-    """
-    for child in list(parent):
-        if _strip_xml_ns(child.tag) == tag_name:
-            return _first_text(child)
-    return ""
+    return get_llm_client(require_key("GEMINI_API_KEY")).generate(
+        prompt,
+        model=GEMINI_MODEL,
+        temperature=temperature,
+        response_mime_type=response_mime_type,
+        label=label,
+        logger=logger,
+    )
 
 
 @dataclass
@@ -226,77 +296,18 @@ class FeedItem:
     source: str
 
 
-def fetch_rss(url: str, *, timeout_s: float = 20.0, source_name: str = "") -> list[FeedItem]:
+RSS_USER_AGENT = "prediction-market-pipeline/1.0"
+
+
+def parse_feed(xml_text: str, *, source_name: str, max_items: int | None = None) -> list[FeedItem]:
     """
-    Minimal RSS/Atom parser with stdlib XML.
-    Works for typical RSS2 (<channel><item>...) and Atom (<feed><entry>...).
+    RSS2 / RDF / Atom items, parsed incrementally (shared/feeds.py iter_entries):
+    stops after max_items without building the rest of the document.
     """
-    r = requests.get(url, timeout=timeout_s, headers={"User-Agent": "prediction-market-pipeline/1.0"})
-    r.raise_for_status()
-    xml_text = r.text
-
-    try:
-        root = ET.fromstring(xml_text)
-    except ET.ParseError:
-        # Some feeds are malformed; fallback: try to strip leading junk.
-        start = xml_text.find("<")
-        if start >= 0:
-            root = ET.fromstring(xml_text[start:])
-        else:
-            raise
-
-    items: list[FeedItem] = []
-
-    root_tag = _strip_xml_ns(root.tag).lower()
-    # RSS2
-    if root_tag == "rss" or root_tag == "rdf":
-        channel = None
-        for child in list(root):
-            if _strip_xml_ns(child.tag).lower() == "channel":
-                channel = child
-                break
-        if channel is None:
-            channel = root
-        for item in channel.iter():
-            if _strip_xml_ns(item.tag).lower() != "item":
-                continue
-            title = _find_child_text(item, "title")
-            link = _find_child_text(item, "link")
-            desc = _find_child_text(item, "description") or _find_child_text(item, "content") or ""
-            if title and link:
-                items.append(FeedItem(title=title, link=link, description=desc, source=source_name or url))
-        return items
-
-    # Atom
-    if root_tag == "feed":
-        for entry in root.iter():
-            if _strip_xml_ns(entry.tag).lower() != "entry":
-                continue
-            title = _find_child_text(entry, "title")
-            link = ""
-            summary = _find_child_text(entry, "summary") or _find_child_text(entry, "content") or ""
-            # Atom link is often an attribute: <link href="..."/>
-            for child in list(entry):
-                if _strip_xml_ns(child.tag).lower() == "link":
-                    href = (child.attrib.get("href") or "").strip()
-                    rel = (child.attrib.get("rel") or "").strip()
-                    if href and (not rel or rel == "alternate"):
-                        link = href
-                        break
-            if title and link:
-                items.append(FeedItem(title=title, link=link, description=summary, source=source_name or url))
-        return items
-
-    # Unknown root: try generic scan for <item>
-    for item in root.iter():
-        if _strip_xml_ns(item.tag).lower() != "item":
-            continue
-        title = _find_child_text(item, "title")
-        link = _find_child_text(item, "link")
-        desc = _find_child_text(item, "description") or ""
-        if title and link:
-            items.append(FeedItem(title=title, link=link, description=desc, source=source_name or url))
-    return items
+    return [
+        FeedItem(title=e.title, link=e.link, description=e.description or e.content, source=source_name)
+        for e in iter_entries(xml_text, max_items=max_items)
+    ]
 
 
 def _dedupe_items(items: list[FeedItem]) -> list[FeedItem]:
@@ -339,7 +350,7 @@ def _parse_json_array_of_ints(text: str) -> list[int]:
     return [int(n) for n in nums[:5]]
 
 
-def select_headlines_with_gemini(headlines: str, *, temperature: float = 0.2) -> list[int]:
+def select_headlines_with_gemini(headlines: str, *, temperature: float = 0.2, logger: logging.Logger | None = None) -> list[int]:
     system_prompt = """You are an expert Prediction Market Analyst.
 Your job is to scan news headlines and identify "High-Stakes" opportunities for betting markets.
 
@@ -367,7 +378,7 @@ Example: [1, 5, 8]"""
 
     user_prompt = f"Here are today's headlines:\n\n{headlines}\n\nSelect the best 3-5 headlines. Return JSON array only."
     prompt = system_prompt + "\n\n" + user_prompt
-    text = _gemini_generate(prompt, temperature=temperature)
+    text = _gemini_generate(prompt, temperature=temperature, label="agent0.select", logger=logger)
     return _parse_json_array_of_ints(text)
 
 
@@ -390,7 +401,7 @@ def perplexity_research_batch(selected_items: list[FeedItem], *, temperature: fl
         "Provide a separate report for EACH headline using the format above."
     )
 
-    url = "https://api.perplexity.ai/chat/completions"
+    url = perplexity_chat_url()
     payload = {
         "model": "sonar",
         "messages": [
@@ -400,9 +411,18 @@ def perplexity_research_batch(selected_items: list[FeedItem], *, temperature: fl
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
-    headers = {"Authorization": f"Bearer {PERPLEXITY_API_KEY}", "Content-Type": "application/json"}
-
-    resp = requests.post(url, headers=headers, json=payload, timeout=(10, 180))
+    headers = {"Authorization": f"Bearer {require_key('PERPLEXITY_API_KEY')}", "Content-Type": "application/json"}
+
+    resp = get_http_client().post(
+        url,
+        endpoint="perplexity.chat_completions",
+        headers=headers,
+        json=payload,
+        timeout=(10, 180),
+        max_retries=2,
+        backoff_s=2.0,
+        limiter=get_limiter("perplexity"),
+    )
     if resp.status_code != 200:
         raise RuntimeError(f"Perplexity API error (status {resp.status_code}): {resp.text}")
 
@@ -438,7 +458,9 @@ def _extract_json_array(text: str) -> list[dict[str, Any]]:
     return []
 
 
-def generate_questions_with_gemini(selected_items: list[FeedItem], research: str, *, temperature: float = 0.7) -> list[dict[str, Any]]:
+def generate_questions_with_gemini(
+    selected_items: list[FeedItem], research: str, *, temperature: float = 0.7, logger: logging.Logger | None = None
+) -> list[dict[str, Any]]:
     headlines_with_research = "\n\n".join([f"HEADLINE {i + 1}: {it.title}\nURL: {it.link}" for i, it in enumerate(selected_items)])
 
     system_prompt = (
@@ -476,7 +498,9 @@ def generate_questions_with_gemini(selected_items: list[FeedItem], research: str
 
     prompt = system_prompt + "\n\n" + user_prompt
     # Ask for JSON if supported; still parse defensively.
-    text = _gemini_generate(prompt, temperature=temperature, response_mime_type="application/json")
+    text = _gemini_generate(
+        prompt, temperature=temperature, response_mime_type="application/json", label="agent2.questions", logger=logger
+    )
     return _extract_json_array(text)
 
 
@@ -494,14 +518,31 @@ def run_pipeline(
     run_dir = RUNS_DIR / f"prediction_market_{run_id}"
     run_dir.mkdir(parents=True, exist_ok=True)
     logger = _setup_logger(run_dir / "run.log")
-    logger.info(f"Run started | backend={_GEMINI_BACKEND} | gemini_model={GEMINI_MODEL}")
+    logger.info(f"Run started | providers={provider_mode()} | backend={_GEMINI_BACKEND} | gemini_model={GEMINI_MODEL}")
 
     def save(name: str, content: str) -> None:
         (run_dir / name).write_text(content or "", encoding="utf-8")
 
-    # 1) RSS feeds
-    inc42_items = fetch_rss(inc42_url, source_name="inc42")[:max_items_per_feed]
-    entrackr_items = fetch_rss(entrackr_url, source_name="entrackr")[:max_items_per_feed]
+    # 1) RSS feeds (fetched concurrently; unchanged feeds come from the shared feed cache)
+    feeds = fetch_feeds({"inc42": inc42_url, "entrackr": entrackr_url}, user_agent=RSS_USER_AGENT)
+    feed_items: dict[str, list[FeedItem]] = {}
+    feed_errors: dict[str, str] = {}
+    for name, feed in feeds.items():
+        logger.info(f"Feed {name} | status={feed.status}" + (f" | error={feed.error}" if feed.error else ""))
+        feed_items[name] = []
+        if not feed.ok:
+            feed_errors[name] = feed.error or feed.status
+            continue
+        try:
+            feed_items[name] = parse_feed(feed.text, source_name=name, max_items=max_items_per_feed)
+        except ET.ParseError as e:
+            # Treated like a failed fetch: this feed contributes nothing, the other one still runs.
+            logger.warning(f"Feed {name} | unparsable | error={e}")
+            feed_errors[name] = f"unparsable feed: {e}"
+    if len(feed_errors) == len(feeds):
+        # One feed down still makes a (smaller) run; none up is an outage, not an empty news day.
+        raise RuntimeError("Failed to fetch every RSS feed: " + "; ".join(f"{name}: {err}" for name, err in feed_errors.items()))
+    inc42_items, entrackr_items = feed_items["inc42"], feed_items["entrackr"]
     all_items = _dedupe_items(inc42_items + entrackr_items)
     logger.info(f"Fetched items | inc42={len(inc42_items)} | entrackr={len(entrackr_items)} | merged_deduped={len(all_items)}")
 
@@ -513,7 +554,7 @@ def run_pipeline(
     save("headlines.txt", headlines)
 
     # 3) Agent 0: select indices
-    idxs = select_headlines_with_gemini(headlines, temperature=0.2)
+    idxs = select_headlines_with_gemini(headlines, temperature=0.2, logger=logger)
     logger.info(f"Agent0 indices(raw)={idxs}")
 
     # normalize indices
@@ -541,7 +582,7 @@ def run_pipeline(
     save("perplexity_research.md", research)
 
     # 5) Agent 2: create questions (Gemini)
-    questions_raw = generate_questions_with_gemini(selected_items, research, temperature=0.7)
+    questions_raw = generate_questions_with_gemini(selected_items, research, temperature=0.7, logger=logger)
     save("questions_raw.json", json.dumps(questions_raw, indent=2))
 
     # 6) Normalize final output like n8n "Parse Output"
@@ -590,13 +631,18 @@ def run_pipeline(
     # Publish to Supabase forum if requested
     if publish:
         try:
-            inserted_count = publish_predictions_to_forum(out_items, logger=logger)
-            logger.info(f"[Publish] Published {inserted_count} predictions to forum")
-            result["published_count"] = inserted_count
+            report = publish_predictions_to_forum(out_items, logger=logger)
+            save("publish_report.json", json.dumps(report.__dict__, indent=2))
+            logger.info(f"[Publish] Published {report.inserted} predictions to forum")
+            result["published_count"] = report.inserted
+            result["publish_skipped"] = report.skipped
+            result["publish_failed"] = report.failed
         except Exception as e:
             logger.error(f"[Publish] Failed | error={e}")
             result["publish_error"] = str(e)
 
+    logger.info(f"HTTP timings | {json.dumps(get_http_client().timing_counters())}")
+    logger.info(f"Rate limits | {json.dumps(limiter_stats())}")
     logger.info("Run completed")
     return result
 
@@ -613,6 +659,8 @@ def main() -> None:
     parser.add_argument("--out", default="", help="Optional path to write final JSON output")
     parser.add_argument("--publish", action="store_true", help="Publish predictions to Supabase forum")
     args = parser.parse_args()
+    require_key("PERPLEXITY_API_KEY")
+    require_key("GEMINI_API_KEY")
 
     out_path = args.out.strip() or None
     result = run_pipeline(
@@ -0,0 +1 @@
+"""Shared infrastructure for the research tools (HTTP pool, ...)."""
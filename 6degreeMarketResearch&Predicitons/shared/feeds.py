@@ -0,0 +1,402 @@
+"""
+Shared RSS/Atom feed fetcher with a local feed cache, used by the prediction
+pipeline and tools/idea_agent.py.
+
+Every fetched feed body is stored with its ETag / Last-Modified validators:
+- within FEED_MAX_AGE_MIN of the last download (or 304), the cached body is served
+  without touching the network, so one daily job downloads each feed at most once
+  per period however many tools read it;
+- after that, a conditional GET (If-None-Match / If-Modified-Since) is sent and a
+  304 Not Modified serves the cached body;
+- if the feed is unreachable, or answers 200 with something that is not a feed
+  (e.g. an HTML error page, which is never cached), a cached body of any age is
+  served (status "stale").
+
+fetch_feeds() pulls several feeds concurrently. Concurrent requests for the
+same URL within a process share one download.
+
+iter_entries() parses RSS 2.0 / RDF / Atom incrementally (XMLPullParser fed in
+chunks): entries are yielded as their closing tag arrives, dropped from the tree
+once yielded, and parsing stops after `max_items`, so a large feed is never held
+as a whole element tree.
+
+Usage:
+  python shared/feeds.py stats
+  python shared/feeds.py fetch <url> [<url> ...]   # fetch (or revalidate) and print status per feed
+
+Env:
+  FEED_CACHE_PATH     sqlite file (default: cache/feed_cache.sqlite3)
+  FEED_MAX_AGE_MIN    serve cached bodies without revalidating for this long (default 60; 0 = always revalidate)
+  FEED_FETCH_WORKERS  concurrent feed downloads (default 8)
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+from xml.etree import ElementTree as ET
+
+TOOLS_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_FEED_CACHE_PATH = TOOLS_ROOT / "cache" / "feed_cache.sqlite3"
+
+FEED_CACHE_PATH = Path(os.getenv("FEED_CACHE_PATH", str(DEFAULT_FEED_CACHE_PATH)))
+FEED_MAX_AGE_MIN = float(os.getenv("FEED_MAX_AGE_MIN", "60"))
+FEED_FETCH_WORKERS = int(os.getenv("FEED_FETCH_WORKERS", "8"))
+
+DEFAULT_USER_AGENT = "6DegreesFeedFetcher/1.0"
+PARSE_CHUNK_SIZE = 64 * 1024
+
+# Control characters XML 1.0 forbids; some feeds contain them anyway. Never part of a
+# multi-byte UTF-8 sequence, so they can be stripped chunk by chunk, bytes or text.
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_CONTROL_BYTES_RE = re.compile(rb"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ENTRY_TAGS = frozenset({"item", "entry"})  # RSS 2.0 / RDF, Atom
+_ROOT_TAGS = frozenset({"rss", "RDF", "feed"})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    url            TEXT PRIMARY KEY,
+    etag           TEXT,
+    last_modified  TEXT,
+    body           TEXT NOT NULL,
+    fetched_at     REAL NOT NULL,
+    validated_at   REAL NOT NULL,
+    downloads      INTEGER NOT NULL DEFAULT 0,
+    not_modified   INTEGER NOT NULL DEFAULT 0,
+    served         INTEGER NOT NULL DEFAULT 0,
+    size           INTEGER NOT NULL
+);
+"""
+
+
+@dataclass
+class CachedFeed:
+    url: str
+    etag: str | None
+    last_modified: str | None
+    body: str
+    fetched_at: float  # last full download
+    validated_at: float  # last download or 304
+
+
+@dataclass
+class FeedResult:
+    name: str
+    url: str
+    text: str
+    status: str  # "fetched" (200), "not_modified" (304), "cached" (fresh, no request), "stale" (fetch failed), "error"
+    fetched_at: float | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "error"
+
+
+@dataclass
+class FeedEntry:
+    title: str
+    link: str
+    description: str  # <description> (RSS) or <summary> (Atom)
+    content: str  # <content:encoded> (RSS) or <content> (Atom)
+    published: str  # <pubDate>, <dc:date>, <published> or <updated>
+
+
+class FeedCache:
+    def __init__(self, path: Path | str = FEED_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # One connection shared by the fetch threads; access is serialized by _lock.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get(self, url: str) -> CachedFeed | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, body, fetched_at, validated_at FROM feeds WHERE url = ?", (url,)
+            ).fetchone()
+        return CachedFeed(**dict(row)) if row is not None else None
+
+    def put(self, url: str, body: str, *, etag: str | None, last_modified: str | None) -> None:
+        """Store a full download (200)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO feeds (url, etag, last_modified, body, fetched_at, validated_at, downloads, size)
+                VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = excluded.etag, last_modified = excluded.last_modified, body = excluded.body,
+                    fetched_at = excluded.fetched_at, validated_at = excluded.validated_at,
+                    downloads = downloads + 1, size = excluded.size
+                """,
+                (url, etag, last_modified, body, now, now, len(body.encode("utf-8"))),
+            )
+            self._conn.commit()
+
+    def mark_validated(self, url: str, *, etag: str | None = None, last_modified: str | None = None) -> None:
+        """Record a 304: the cached body is current as of now (servers may send refreshed validators)."""
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE feeds SET validated_at = ?, not_modified = not_modified + 1,
+                    etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE url = ?
+                """,
+                (time.time(), etag, last_modified, url),
+            )
+            self._conn.commit()
+
+    def mark_served(self, url: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE feeds SET served = served + 1 WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, downloads, not_modified, served, size, fetched_at, validated_at FROM feeds ORDER BY url"
+            ).fetchall()
+        now = time.time()
+        return {
+            "path": str(self.path),
+            "feeds": [
+                {
+                    "url": r["url"],
+                    "downloads": r["downloads"],
+                    "not_modified": r["not_modified"],
+                    "served_from_cache": r["served"],
+                    "size": r["size"],
+                    "age_min": round((now - r["validated_at"]) / 60, 1),
+                }
+                for r in rows
+            ],
+        }
+
+
+_CACHE: FeedCache | None = None
+_CACHE_LOCK = threading.Lock()
+_URL_LOCKS: dict[str, threading.Lock] = {}
+
+
+def get_feed_cache() -> FeedCache:
+    """Process-wide feed cache shared by every tool and thread."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = FeedCache()
+        return _CACHE
+
+
+def _url_lock(url: str) -> threading.Lock:
+    with _CACHE_LOCK:
+        return _URL_LOCKS.setdefault(url, threading.Lock())
+
+
+def fetch_feed(
+    url: str,
+    *,
+    name: str = "",
+    user_agent: str = DEFAULT_USER_AGENT,
+    timeout_s: float = 25.0,
+    max_age_s: float | None = FEED_MAX_AGE_MIN * 60,
+    cache: FeedCache | None = None,
+) -> FeedResult:
+    """
+    Return the feed body at `url`, from the feed cache when it is fresh (or the
+    server answers 304). Raises if the feed cannot be fetched and nothing is cached.
+    """
+    # Imported here so `python shared/feeds.py stats` works without the HTTP stack.
+    from shared.http_client import get_http_client
+
+    cache = cache or get_feed_cache()
+    name = name or url
+    with _url_lock(url):
+        cached = cache.get(url)
+        if cached is not None and max_age_s and time.time() - cached.validated_at < max_age_s:
+            cache.mark_served(url)
+            return FeedResult(name, url, cached.body, "cached", cached.fetched_at)
+
+        headers = {"User-Agent": user_agent}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        try:
+            r = get_http_client().get(url, endpoint=f"rss.{name}", timeout=(10, timeout_s), headers=headers)
+            if r.status_code == 304 and cached is not None:
+                cache.mark_validated(url, etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"))
+                cache.mark_served(url)
+                return FeedResult(name, url, cached.body, "not_modified", cached.fetched_at)
+            r.raise_for_status()
+            _check_feed_body(r.text)
+        except Exception as e:  # unreachable, an error status or not a feed: fall back to the cached body
+            if cached is None:
+                raise
+            cache.mark_served(url)
+            return FeedResult(name, url, cached.body, "stale", cached.fetched_at, error=str(e))
+
+        cache.put(url, r.text, etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"))
+        return FeedResult(name, url, r.text, "fetched", time.time())
+
+
+def fetch_feeds(
+    feeds: dict[str, str] | Iterable[tuple[str, str]],
+    *,
+    max_workers: int = FEED_FETCH_WORKERS,
+    **kwargs: Any,
+) -> dict[str, FeedResult]:
+    """
+    Fetch {name: url} feeds concurrently (see fetch_feed for kwargs). Returns
+    {name: FeedResult} in input order; a feed that failed with nothing cached
+    comes back with status "error" and empty text instead of raising.
+    """
+    pairs = list(feeds.items() if isinstance(feeds, dict) else feeds)
+
+    def one(pair: tuple[str, str]) -> FeedResult:
+        name, url = pair
+        try:
+            return fetch_feed(url, name=name, **kwargs)
+        except Exception as e:
+            return FeedResult(name, url, "", "error", error=str(e))
+
+    if len(pairs) <= 1:
+        return {name: one((name, url)) for name, url in pairs}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pairs))), thread_name_prefix="feed") as pool:
+        return {r.name: r for r in pool.map(one, pairs)}
+
+
+def _check_feed_body(body: str) -> None:
+    """Raise ValueError unless `body` opens as an RSS/RDF/Atom document (reads up to its root element)."""
+    body = _CONTROL_CHARS_RE.sub("", body or "")
+    parser = ET.XMLPullParser(events=("start",))
+    try:
+        for chunk in _chunks(body[body.find("<"):] if "<" in body else ""):
+            parser.feed(chunk)
+            for _, el in parser.read_events():
+                if _local(el.tag) not in _ROOT_TAGS:
+                    raise ValueError(f"Not an RSS/Atom feed (root element <{_local(el.tag)}>)")
+                return
+    except ET.ParseError as e:
+        raise ValueError(f"Not an RSS/Atom feed ({e})") from None
+    raise ValueError("Not an RSS/Atom feed (no root element)")
+
+
+def _local(tag: Any) -> str:
+    # "{namespace}tag" -> "tag"
+    return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+
+def _entry(el: ET.Element) -> FeedEntry:
+    fields: dict[str, str] = {}
+    link = ""
+    for child in el:
+        name = _local(child.tag)
+        text = (child.text or "").strip()
+        if name == "link":
+            # Atom: <link rel="alternate" href="..."/>; RSS: <link>...</link>
+            href = (child.attrib.get("href") or "").strip()
+            rel = (child.attrib.get("rel") or "").strip()
+            if not link and (text or (href and rel in ("", "alternate"))):
+                link = text or href
+        elif text and name not in fields:
+            fields[name] = text
+    return FeedEntry(
+        title=fields.get("title", ""),
+        link=link,
+        description=fields.get("description") or fields.get("summary", ""),
+        content=fields.get("encoded") or fields.get("content", ""),
+        published=fields.get("pubdate") or fields.get("date") or fields.get("published") or fields.get("updated", ""),
+    )
+
+
+def _chunks(source: str | bytes | Iterable[str | bytes]) -> Iterator[str | bytes]:
+    if isinstance(source, (str, bytes)):
+        for i in range(0, len(source), PARSE_CHUNK_SIZE):
+            yield source[i:i + PARSE_CHUNK_SIZE]
+    else:
+        yield from source
+
+
+def iter_entries(source: str | bytes | Iterable[str | bytes], *, max_items: int | None = None) -> Iterator[FeedEntry]:
+    """
+    Yield the entries (with a title and link) of an RSS/RDF/Atom document, given
+    as text/bytes or an iterable of chunks (e.g. a response's iter_content()).
+    Leading junk before the first "<" and XML-illegal control characters are
+    dropped as the chunks stream in. A parse error raises ET.ParseError only if
+    no entry was yielded yet; otherwise the entries before it are kept.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    path: list[ET.Element] = []  # open elements, to detach each entry from its parent once yielded
+    entry: ET.Element | None = None
+    started = False
+    count = 0
+
+    def events() -> Iterator[FeedEntry]:
+        nonlocal entry, count
+        for event, el in parser.read_events():
+            if event == "start":
+                path.append(el)
+                if entry is None and _local(el.tag) in _ENTRY_TAGS:
+                    entry = el
+                continue
+            path.pop()
+            if el is not entry:
+                continue
+            entry = None
+            item = _entry(el)
+            if path:
+                path[-1].remove(el)
+            if item.title and item.link:
+                count += 1
+                yield item
+
+    try:
+        for chunk in itertools.chain(_chunks(source), [None]):
+            if chunk is None:
+                parser.close()  # end of document: flushes the last events
+            elif isinstance(chunk, bytes):
+                chunk = _CONTROL_BYTES_RE.sub(b"", chunk)
+                if not started:
+                    chunk = chunk[chunk.find(b"<"):] if b"<" in chunk else b""
+            else:
+                chunk = _CONTROL_CHARS_RE.sub("", chunk)
+                if not started:
+                    chunk = chunk[chunk.find("<"):] if "<" in chunk else ""
+            if chunk:
+                started = True
+                parser.feed(chunk)
+            for item in events():
+                yield item
+                if max_items is not None and count >= max_items:
+                    return
+    except ET.ParseError:
+        if not count:
+            raise
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(TOOLS_ROOT))
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "stats":
+        print(json.dumps(get_feed_cache().stats(), indent=2))
+    elif command == "fetch" and len(sys.argv) > 2:
+        for result in fetch_feeds({url: url for url in sys.argv[2:]}).values():
+            print(f"{result.status:>12}  {len(result.text):>8}  {result.url}" + (f"  ({result.error})" if result.error else ""))
+    else:
+        print("Usage: python shared/feeds.py [stats|fetch <url> [<url> ...]]")
+        sys.exit(1)
@@ -0,0 +1,393 @@
+"""
+Shared HTTP client for the research tools (MarketResearch, prediction pipeline, idea agent).
+
+- One pooled, keep-alive session per process (requests.Session, or httpx with
+  HTTP/2 when HTTP_CLIENT_HTTP2=1 and httpx[http2] is installed), so repeated
+  calls to Perplexity/Notion/RSS hosts reuse TCP+TLS connections.
+- Central retry policy: exponential backoff with jitter on 408/429/5xx and
+  transport errors, honouring Retry-After when the server sends it.
+- AsyncHttpClient (get_async_http_client) for asyncio callers: the same policy
+  over httpx.AsyncClient, or over the sync pool in worker threads without httpx.
+- Optional per-provider RateLimiter (shared/rate_limit.py): each attempt holds
+  a permit and reports its status back, so 429/5xx feedback adapts the
+  provider's concurrency and Retry-After pauses every caller of that provider.
+- Per-endpoint timing counters (calls, retries, errors, latency, bytes), and
+  one telemetry span per request (shared/telemetry.py) when a run is tracing.
+
+Env:
+  HTTP_CLIENT_HTTP2=1     use httpx with HTTP/2 (falls back to requests if unavailable)
+  HTTP_POOL_MAXSIZE=20    max pooled connections per host
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import functools
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared.rate_limit import RateLimiter
+from shared.telemetry import record_span
+
+try:
+    import httpx  # type: ignore
+    _HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None  # type: ignore
+    _HTTPX_AVAILABLE = False
+
+HTTP_CLIENT_HTTP2 = (os.getenv("HTTP_CLIENT_HTTP2") or "").strip() in ("1", "true", "True", "yes", "YES")
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Exceptions callers should treat as "request failed after retries".
+TRANSPORT_ERRORS: tuple[type[BaseException], ...] = (requests.exceptions.RequestException,)
+if _HTTPX_AVAILABLE:
+    TRANSPORT_ERRORS = TRANSPORT_ERRORS + (httpx.TransportError,)  # type: ignore[union-attr]
+
+
+def _retry_after_s(resp: Any) -> float | None:
+    """Parse Retry-After (delta-seconds or HTTP-date)."""
+    raw = (resp.headers.get("Retry-After") or "").strip() if resp is not None else ""
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(raw)
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay_s(attempt: int, base_s: float, max_s: float) -> float:
+    """Exponential backoff with equal jitter: half fixed, half random."""
+    ceiling = min(max_s, base_s * (2 ** (attempt - 1)))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class _Attempts:
+    """
+    Per-request bookkeeping shared by the sync and async retry loops: timing
+    counters, on_attempt, limiter feedback, the request's telemetry span, and
+    the backoff before the next attempt.
+    """
+
+    def __init__(self, client: "HttpClient", method: str, endpoint: str, *, max_retries: int, backoff_s: float,
+                 max_backoff_s: float, retry_statuses: tuple[int, ...], limiter: RateLimiter | None,
+                 on_attempt: Callable[[int, Any, BaseException | None], None] | None, logger: Any):
+        self.client = client
+        self.method = method
+        self.endpoint = endpoint
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.retry_statuses = retry_statuses
+        self.limiter = limiter
+        self.on_attempt = on_attempt
+        self.logger = logger
+        self.attempt = 0
+        self.started = time.perf_counter()
+        self.queue_ms = 0.0
+
+    def admitted(self, permit: Any) -> None:
+        if permit is not None:
+            self.queue_ms += permit.wait_ms
+
+    @staticmethod
+    def observe(permit: Any, resp: Any) -> None:
+        """Report the attempt's status (and Retry-After) to the provider's limiter."""
+        if permit is not None:
+            permit.observe(status_code=resp.status_code, retry_after_s=_retry_after_s(resp))
+
+    def _span(self, **attrs: Any) -> None:
+        # One span per request; its duration includes retries, backoff and limiter waits.
+        record_span(
+            f"http.{self.endpoint}", duration_ms=(time.perf_counter() - self.started) * 1000, method=self.method,
+            attempts=self.attempt, retries=self.attempt - 1, queue_ms=round(self.queue_ms, 1) if self.limiter else None, **attrs,
+        )
+
+    def transport_error(self, e: BaseException, *, ms: float) -> float | None:
+        """Backoff before the next attempt, or None if retries are exhausted (re-raise)."""
+        retry = self.attempt <= self.max_retries
+        self.client._record(self.endpoint, ms=ms, retry=retry, error=True)
+        if self.on_attempt:
+            self.on_attempt(self.attempt, None, e)
+        if not retry:
+            self._span(error=repr(e))
+            return None
+        delay = backoff_delay_s(self.attempt, self.backoff_s, self.max_backoff_s)
+        if self.logger:
+            self.logger.info(f"[HTTP] Retry | endpoint={self.endpoint} | attempt={self.attempt} | error={e!r} | backoff_s={delay:.2f}")
+        return delay
+
+    def response(self, resp: Any, *, ms: float) -> float | None:
+        """Backoff before the next attempt, or None if `resp` is final."""
+        retry = resp.status_code in self.retry_statuses and self.attempt <= self.max_retries
+        nbytes = len(resp.content or b"")
+        self.client._record(self.endpoint, ms=ms, nbytes=nbytes, retry=retry, error=resp.status_code >= 400)
+        if self.on_attempt:
+            self.on_attempt(self.attempt, resp, None)
+        if not retry:
+            self._span(error=f"HTTP {resp.status_code}" if resp.status_code >= 400 else None, status_code=resp.status_code, bytes=nbytes)
+            return None
+        delay = _retry_after_s(resp)
+        if delay is None:
+            delay = backoff_delay_s(self.attempt, self.backoff_s, self.max_backoff_s)
+        delay = min(delay, self.max_backoff_s)
+        if self.logger:
+            self.logger.info(
+                f"[HTTP] Retry | endpoint={self.endpoint} | attempt={self.attempt} | status={resp.status_code} | backoff_s={delay:.2f}"
+            )
+        return delay
+
+
+class HttpClient:
+    def __init__(self, *, http2: bool = HTTP_CLIENT_HTTP2, pool_maxsize: int = HTTP_POOL_MAXSIZE):
+        self.http2 = bool(http2 and _HTTPX_AVAILABLE)
+        if self.http2:
+            try:
+                self._client = httpx.Client(  # type: ignore[union-attr]
+                    http2=True,
+                    limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),  # type: ignore[union-attr]
+                )
+            except ImportError:
+                # httpx installed without the h2 extra
+                self.http2 = False
+        if not self.http2:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._client = session
+        self._timings: dict[str, dict[str, float]] = {}
+        self._timings_lock = threading.Lock()
+
+    def _send(self, method: str, url: str, *, timeout: tuple[float, float], **kwargs: Any) -> Any:
+        if self.http2:
+            connect_s, read_s = timeout
+            return self._client.request(method, url, timeout=httpx.Timeout(read_s, connect=connect_s), **kwargs)  # type: ignore[union-attr]
+        return self._client.request(method, url, timeout=timeout, **kwargs)
+
+    def _record(self, endpoint: str, *, ms: float, nbytes: int = 0, retry: bool = False, error: bool = False) -> None:
+        with self._timings_lock:
+            t = self._timings.setdefault(
+                endpoint, {"calls": 0, "retries": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "bytes": 0}
+            )
+            t["calls"] += 1
+            t["retries"] += int(retry)
+            t["errors"] += int(error)
+            t["total_ms"] += ms
+            t["max_ms"] = max(t["max_ms"], ms)
+            t["bytes"] += nbytes
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        endpoint: str,
+        timeout: tuple[float, float] = (10, 60),
+        max_retries: int = 3,
+        backoff_s: float = 1.0,
+        max_backoff_s: float = 60.0,
+        retry_statuses: tuple[int, ...] = RETRY_STATUSES,
+        limiter: RateLimiter | None = None,
+        on_attempt: Callable[[int, Any, BaseException | None], None] | None = None,
+        logger: Any = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Send a request with pooled connections and the shared retry policy.
+
+        Returns the final response (which may still carry a retryable status once
+        retries are exhausted). Raises one of TRANSPORT_ERRORS if the last attempt
+        failed at the transport level. Each attempt (not the backoff between attempts)
+        holds a permit from `limiter`, the provider's RateLimiter, and reports its
+        status and Retry-After back to it. `on_attempt(attempt, resp, err)` is called
+        after every attempt, e.g. to save per-attempt artifacts.
+        """
+        state = _Attempts(
+            self, method, endpoint, max_retries=max_retries, backoff_s=backoff_s, max_backoff_s=max_backoff_s,
+            retry_statuses=retry_statuses, limiter=limiter, on_attempt=on_attempt, logger=logger,
+        )
+        while True:
+            state.attempt += 1
+            t0 = time.perf_counter()
+            try:
+                with limiter.permit() if limiter is not None else nullcontext() as permit:
+                    t0 = time.perf_counter()  # exclude time spent waiting on the limiter
+                    state.admitted(permit)
+                    resp = self._send(method, url, timeout=timeout, **kwargs)
+                    state.observe(permit, resp)
+            except TRANSPORT_ERRORS as e:
+                delay = state.transport_error(e, ms=(time.perf_counter() - t0) * 1000)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            delay = state.response(resp, ms=(time.perf_counter() - t0) * 1000)
+            if delay is None:
+                return resp
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs: Any) -> Any:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> Any:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs: Any) -> Any:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> Any:
+        return self.request("DELETE", url, **kwargs)
+
+    def timing_counters(self) -> dict[str, dict[str, float]]:
+        """Snapshot of per-endpoint counters, with avg_ms added."""
+        with self._timings_lock:
+            out = {}
+            for endpoint, t in self._timings.items():
+                row = dict(t)
+                row["avg_ms"] = round(t["total_ms"] / t["calls"], 1) if t["calls"] else 0.0
+                row["total_ms"] = round(t["total_ms"], 1)
+                row["max_ms"] = round(t["max_ms"], 1)
+                out[endpoint] = row
+            return out
+
+
+_CLIENT: HttpClient | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Process-wide client shared by every tool and thread."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HttpClient()
+        return _CLIENT
+
+
+class AsyncHttpClient:
+    """
+    asyncio counterpart of HttpClient: same retry policy, limiter feedback,
+    telemetry spans and (shared) per-endpoint timing counters.
+
+    Uses httpx.AsyncClient (pooled, HTTP/2 with HTTP_CLIENT_HTTP2=1) when httpx is
+    installed. Without httpx each attempt runs on the pooled sync client in one of
+    `pool_maxsize` worker threads: requests still overlap, but a cancelled attempt
+    finishes in the background (its result is dropped).
+    """
+
+    def __init__(self, *, http2: bool = HTTP_CLIENT_HTTP2, pool_maxsize: int = HTTP_POOL_MAXSIZE):
+        self._sync = get_http_client()  # fallback transport + shared timing counters
+        self._client = None
+        self._executor: ThreadPoolExecutor | None = None
+        if _HTTPX_AVAILABLE:
+            limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)  # type: ignore[union-attr]
+            try:
+                self._client = httpx.AsyncClient(http2=http2, limits=limits)  # type: ignore[union-attr]
+            except ImportError:
+                # httpx installed without the h2 extra
+                self._client = httpx.AsyncClient(limits=limits)  # type: ignore[union-attr]
+        else:
+            # Not the loop's default executor: that one is sized by CPU count, not by connections.
+            self._executor = ThreadPoolExecutor(max_workers=pool_maxsize, thread_name_prefix="async-http")
+
+    async def _send(self, method: str, url: str, *, timeout: tuple[float, float], **kwargs: Any) -> Any:
+        if self._client is not None:
+            connect_s, read_s = timeout
+            return await self._client.request(method, url, timeout=httpx.Timeout(read_s, connect=connect_s), **kwargs)  # type: ignore[union-attr]
+        send = functools.partial(self._sync._send, method, url, timeout=timeout, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, send)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        endpoint: str,
+        timeout: tuple[float, float] = (10, 60),
+        max_retries: int = 3,
+        backoff_s: float = 1.0,
+        max_backoff_s: float = 60.0,
+        retry_statuses: tuple[int, ...] = RETRY_STATUSES,
+        limiter: RateLimiter | None = None,
+        on_attempt: Callable[[int, Any, BaseException | None], None] | None = None,
+        logger: Any = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Async HttpClient.request(): same arguments, retries and return value."""
+        state = _Attempts(
+            self._sync, method, endpoint, max_retries=max_retries, backoff_s=backoff_s, max_backoff_s=max_backoff_s,
+            retry_statuses=retry_statuses, limiter=limiter, on_attempt=on_attempt, logger=logger,
+        )
+        while True:
+            state.attempt += 1
+            t0 = time.perf_counter()
+            try:
+                async with limiter.permit() if limiter is not None else nullcontext() as permit:
+                    t0 = time.perf_counter()  # exclude time spent waiting on the limiter
+                    state.admitted(permit)
+                    resp = await self._send(method, url, timeout=timeout, **kwargs)
+                    state.observe(permit, resp)
+            except TRANSPORT_ERRORS as e:
+                delay = state.transport_error(e, ms=(time.perf_counter() - t0) * 1000)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            delay = state.response(resp, ms=(time.perf_counter() - t0) * 1000)
+            if delay is None:
+                return resp
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs: Any) -> Any:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> Any:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+# httpx's AsyncClient is bound to the event loop it first runs on, so there is one client per loop.
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHttpClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    """The running event loop's AsyncHttpClient (call from a coroutine)."""
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = AsyncHttpClient()
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+
+async def aclose_async_http_client() -> None:
+    """Close the running loop's client (before the loop closes, e.g. at the end of asyncio.run)."""
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
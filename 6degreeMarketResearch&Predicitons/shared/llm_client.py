@@ -0,0 +1,493 @@
+"""
+Process-wide Gemini client registry shared by the research tools.
+
+Each tool used to build a fresh google-genai Client (or re-run
+google.generativeai.configure) on every call, paying client setup and a cold
+connection per critic/writer/revision call. get_llm_client() returns one lazily
+created client per API key for the whole process.
+
+Supports sync, async and streaming generation, and logs per-call latency,
+token usage and (with GEMINI_USD_PER_1M_* set) cost to the caller's run log.
+Every call holds a permit from the process-wide "gemini" RateLimiter
+(shared/rate_limit.py) and is recorded as a telemetry span (shared/telemetry.py). Callers
+may pass a ResearchCache (shared/research_cache.py) to reuse responses for
+identical prompts.
+
+Gemini client compatibility:
+- Preferred: google-genai (import path: from google import genai)
+- Fallback: google-generativeai (import path: import google.generativeai as genai)
+- RESEARCH_PROVIDERS=replay: ReplayLLMClient answers offline from recorded runs
+  (shared/providers.py); no SDK or API key needed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator
+
+from shared.providers import FaultInjector, get_fixtures, replay_mode
+from shared.rate_limit import get_limiter
+from shared.research_cache import ResearchCache, cache_key
+from shared.telemetry import record_span
+
+try:
+    from google import genai as _genai  # type: ignore
+    from google.genai import types as _genai_types  # type: ignore
+    GEMINI_BACKEND = "google-genai"
+except Exception:
+    _genai = None
+    _genai_types = None
+    try:
+        import google.generativeai as _genai_fallback  # type: ignore
+        GEMINI_BACKEND = "google-generativeai"
+    except ImportError:
+        # Only replay mode works without an SDK (LLMClient raises on first use).
+        _genai_fallback = None
+        GEMINI_BACKEND = None
+
+
+GEMINI_NAMESPACE = "gemini"
+EMBED_MODEL = (os.getenv("GEMINI_EMBED_MODEL") or "text-embedding-004").strip()
+
+
+def estimate_cost_usd(tokens_in: int | None, tokens_out: int | None) -> float | None:
+    """
+    Cost from GEMINI_USD_PER_1M_INPUT / GEMINI_USD_PER_1M_OUTPUT (None when no pricing is set).
+    Read per call: the tools load their .env after importing this module.
+    """
+    usd_in = float(os.getenv("GEMINI_USD_PER_1M_INPUT") or 0)
+    usd_out = float(os.getenv("GEMINI_USD_PER_1M_OUTPUT") or 0)
+    if not (usd_in or usd_out):
+        return None
+    return ((tokens_in or 0) * usd_in + (tokens_out or 0) * usd_out) / 1_000_000
+
+
+def _usage(resp: Any) -> tuple[int | None, int | None]:
+    meta = getattr(resp, "usage_metadata", None)
+    if meta is None:
+        return None, None
+    return getattr(meta, "prompt_token_count", None), getattr(meta, "candidates_token_count", None)
+
+
+class LLMClient:
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._models: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        if GEMINI_BACKEND is None:
+            raise RuntimeError("No Gemini SDK installed. Run: pip install google-genai (or set RESEARCH_PROVIDERS=replay)")
+        if GEMINI_BACKEND == "google-genai":
+            self._client = _genai.Client(api_key=api_key)  # type: ignore[union-attr]
+        else:
+            _genai_fallback.configure(api_key=api_key)
+            self._client = None
+
+    # -----------------------
+    # Helpers
+    # -----------------------
+    def _config(self, temperature: float, response_mime_type: str | None) -> Any:
+        config_kwargs: dict[str, Any] = {"temperature": temperature}
+        if response_mime_type:
+            config_kwargs["response_mime_type"] = response_mime_type
+        return _genai_types.GenerateContentConfig(**config_kwargs)  # type: ignore[union-attr]
+
+    def _fallback_model(self, model: str) -> Any:
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = _genai_fallback.GenerativeModel(model)
+            return self._models[model]
+
+    @staticmethod
+    def _cache_model(model: str, temperature: float, response_mime_type: str | None) -> str:
+        # Generation settings are part of the cache key.
+        return f"{model}|t={temperature}|mime={response_mime_type or ''}"
+
+    def _cache_get(self, cache: ResearchCache | None, prompt: str, model: str, temperature: float, response_mime_type: str | None,
+                   label: str, logger: logging.Logger | None) -> str | None:
+        if cache is None:
+            return None
+        entry = cache.get(cache_key(model=self._cache_model(model, temperature, response_mime_type), query=prompt))
+        if entry is None:
+            return None
+        if logger:
+            logger.info(f"[LLM] {label} | cache hit | key={entry.key[:12]} | hits={entry.hits}")
+        record_span(f"llm.{label}", duration_ms=0, model=model, cache="hit")
+        return entry.content
+
+    def _cache_put(self, cache: ResearchCache | None, prompt: str, model: str, temperature: float, response_mime_type: str | None,
+                   text: str) -> None:
+        if cache is not None and text:
+            cache.put(
+                namespace=GEMINI_NAMESPACE,
+                model=self._cache_model(model, temperature, response_mime_type),
+                query=prompt,
+                content=text,
+            )
+
+    @staticmethod
+    def _account(
+        *,
+        label: str,
+        model: str,
+        t0: float,
+        resp: Any,
+        chars_out: int,
+        logger: logging.Logger | None,
+        calls: list[dict] | None,
+        mode: str,
+        cached: bool = False,
+        error: BaseException | None = None,
+        queue_ms: float | None = None,
+    ) -> dict:
+        tokens_in, tokens_out = _usage(resp)
+        record = {
+            "label": label,
+            "model": model,
+            "mode": mode,
+            "ms": int((time.perf_counter() - t0) * 1000),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "chars_out": chars_out,
+            "cost_usd": estimate_cost_usd(tokens_in, tokens_out),
+            "queue_ms": round(queue_ms, 1) if queue_ms is not None else None,
+        }
+        if logger:
+            logger.info(
+                f"[LLM] {label} | model={model} | mode={mode} | ms={record['ms']} | "
+                f"tokens_in={tokens_in} | tokens_out={tokens_out} | chars_out={chars_out}"
+            )
+        if calls is not None:
+            calls.append(record)
+        record_span(
+            f"llm.{label}",
+            duration_ms=record["ms"],
+            error=repr(error) if error is not None else None,
+            model=model,
+            mode=mode,
+            tokens_in=tokens_in,
+            tokens_out=tokens_out,
+            chars_out=chars_out,
+            cost_usd=record["cost_usd"],
+            cache="miss" if cached else None,
+            queue_ms=record["queue_ms"],
+        )
+        return record
+
+    # -----------------------
+    # Generation
+    # -----------------------
+    def generate(
+        self,
+        prompt: str,
+        *,
+        model: str,
+        temperature: float,
+        response_mime_type: str | None = None,
+        label: str = "gemini",
+        logger: logging.Logger | None = None,
+        calls: list[dict] | None = None,
+        cache: ResearchCache | None = None,
+    ) -> str:
+        """Generate content and return plain text."""
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            return cached
+        with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            if self._client is not None:
+                resp = self._client.models.generate_content(
+                    model=model, contents=prompt, config=self._config(temperature, response_mime_type)
+                )
+                text = resp.text or ""
+            else:
+                # Keep it dependency-light: generation_config as dict is supported across versions.
+                resp = self._fallback_model(model).generate_content(prompt, generation_config={"temperature": temperature})
+                text = getattr(resp, "text", str(resp)) or ""
+        self._account(label=label, model=model, t0=t0, resp=resp, chars_out=len(text), logger=logger, calls=calls, mode="sync",
+                      cached=cache is not None, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, text)
+        return text
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        model: str,
+        temperature: float,
+        response_mime_type: str | None = None,
+        label: str = "gemini",
+        logger: logging.Logger | None = None,
+        calls: list[dict] | None = None,
+        cache: ResearchCache | None = None,
+    ) -> str:
+        """Async variant of generate()."""
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            return cached
+        async with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            if self._client is not None:
+                resp = await self._client.aio.models.generate_content(
+                    model=model, contents=prompt, config=self._config(temperature, response_mime_type)
+                )
+                text = resp.text or ""
+            else:
+                resp = await self._fallback_model(model).generate_content_async(
+                    prompt, generation_config={"temperature": temperature}
+                )
+                text = getattr(resp, "text", str(resp)) or ""
+        self._account(label=label, model=model, t0=t0, resp=resp, chars_out=len(text), logger=logger, calls=calls, mode="async",
+                      cached=cache is not None, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, text)
+        return text
+
+    def generate_stream(
+        self,
+        prompt: str,
+        *,
+        model: str,
+        temperature: float,
+        response_mime_type: str | None = None,
+        label: str = "gemini",
+        logger: logging.Logger | None = None,
+        calls: list[dict] | None = None,
+        cache: ResearchCache | None = None,
+    ) -> Iterator[str]:
+        """
+        Yield text chunks as Gemini streams them. Usage is accounted when the
+        stream ends (or is closed early by the consumer). Only streams that run
+        to completion are written to the cache. The rate-limit permit is held
+        until the stream ends.
+        """
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            yield cached
+            return
+        with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            last = None
+            chars_out = 0
+            parts: list[str] = []
+            error = None
+            try:
+                if self._client is not None:
+                    stream = self._client.models.generate_content_stream(
+                        model=model, contents=prompt, config=self._config(temperature, response_mime_type)
+                    )
+                else:
+                    stream = self._fallback_model(model).generate_content(
+                        prompt, generation_config={"temperature": temperature}, stream=True
+                    )
+                for chunk in stream:
+                    last = chunk
+                    text = getattr(chunk, "text", "") or ""
+                    if text:
+                        chars_out += len(text)
+                        if cache is not None:
+                            parts.append(text)
+                        yield text
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._account(label=label, model=model, t0=t0, resp=last, chars_out=chars_out, logger=logger, calls=calls, mode="stream",
+                              cached=cache is not None, error=error, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, "".join(parts))
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        *,
+        model: str,
+        temperature: float,
+        response_mime_type: str | None = None,
+        label: str = "gemini",
+        logger: logging.Logger | None = None,
+        calls: list[dict] | None = None,
+        cache: ResearchCache | None = None,
+    ) -> AsyncIterator[str]:
+        """Async variant of generate_stream()."""
+        if self._client is None:
+            # google-generativeai has no async streaming; drain the sync stream in a thread.
+            chunks = await asyncio.to_thread(
+                lambda: list(self.generate_stream(
+                    prompt, model=model, temperature=temperature, response_mime_type=response_mime_type,
+                    label=label, logger=logger, calls=calls, cache=cache,
+                ))
+            )
+            for text in chunks:
+                yield text
+            return
+
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            yield cached
+            return
+        async with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            last = None
+            chars_out = 0
+            parts: list[str] = []
+            error = None
+            try:
+                stream = await self._client.aio.models.generate_content_stream(
+                    model=model, contents=prompt, config=self._config(temperature, response_mime_type)
+                )
+                async for chunk in stream:
+                    last = chunk
+                    text = getattr(chunk, "text", "") or ""
+                    if text:
+                        chars_out += len(text)
+                        if cache is not None:
+                            parts.append(text)
+                        yield text
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._account(label=label, model=model, t0=t0, resp=last, chars_out=chars_out, logger=logger, calls=calls,
+                              mode="async_stream", cached=cache is not None, error=error, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, "".join(parts))
+
+    # -----------------------
+    # Embeddings
+    # -----------------------
+    def embed(self, text: str, *, model: str = EMBED_MODEL) -> list[float]:
+        """Embed one text (used for semantic cache lookups)."""
+        with get_limiter("gemini").permit():
+            if self._client is not None:
+                resp = self._client.models.embed_content(model=model, contents=text)
+                return list(resp.embeddings[0].values)
+            name = model if model.startswith("models/") else f"models/{model}"
+            return list(_genai_fallback.embed_content(model=name, content=text)["embedding"])
+
+
+class ReplayLLMClient(LLMClient):
+    """
+    Offline stand-in with LLMClient's interface (RESEARCH_PROVIDERS=replay).
+    Answers by label from recorded runs (or synthetic text) after the latency and
+    errors injected by REPLAY_LATENCY_MS / REPLAY_ERROR_RATE; logging, `calls`
+    accounting, telemetry and the response cache behave as for live calls.
+    """
+
+    STREAM_CHUNK_CHARS = 200
+
+    def __init__(self, faults: FaultInjector | None = None):
+        self.api_key = "replay"
+        self._models = {}
+        self._lock = threading.Lock()
+        self._client = None
+        self.faults = faults or FaultInjector.from_env()
+
+    @staticmethod
+    def _resp(prompt: str, text: str) -> Any:
+        # Token counts estimated at ~4 characters per token.
+        return SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4))
+
+    def _reply(self, prompt: str, label: str) -> tuple[float, str]:
+        delay, fail = self.faults.next()
+        if fail:
+            time.sleep(delay)
+            raise RuntimeError(f"replay: injected Gemini error ({label})")
+        return delay, get_fixtures().llm_response(label, prompt)
+
+    def generate(self, prompt, *, model, temperature, response_mime_type=None, label="gemini", logger=None, calls=None, cache=None) -> str:
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            return cached
+        with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            delay, text = self._reply(prompt, label)
+            time.sleep(delay)
+        self._account(label=label, model=model, t0=t0, resp=self._resp(prompt, text), chars_out=len(text), logger=logger, calls=calls,
+                      mode="sync", cached=cache is not None, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, text)
+        return text
+
+    async def agenerate(self, prompt, *, model, temperature, response_mime_type=None, label="gemini", logger=None, calls=None,
+                        cache=None) -> str:
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            return cached
+        async with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            delay, text = self._reply(prompt, label)
+            await asyncio.sleep(delay)
+        self._account(label=label, model=model, t0=t0, resp=self._resp(prompt, text), chars_out=len(text), logger=logger, calls=calls,
+                      mode="async", cached=cache is not None, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, text)
+        return text
+
+    def generate_stream(self, prompt, *, model, temperature, response_mime_type=None, label="gemini", logger=None, calls=None,
+                        cache=None) -> Iterator[str]:
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            yield cached
+            return
+        with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            delay, text = self._reply(prompt, label)
+            chunks = [text[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(text), self.STREAM_CHUNK_CHARS)]
+            sent = 0
+            try:
+                # The injected latency is spread across the chunks (the first chunk waits longest).
+                for i, chunk in enumerate(chunks):
+                    time.sleep(delay / 2 if i == 0 else delay / 2 / max(1, len(chunks) - 1))
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                self._account(label=label, model=model, t0=t0, resp=self._resp(prompt, text[:sent]), chars_out=sent, logger=logger,
+                              calls=calls, mode="stream", cached=cache is not None, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, text)
+
+    async def agenerate_stream(self, prompt, *, model, temperature, response_mime_type=None, label="gemini", logger=None,
+                               calls=None, cache=None) -> AsyncIterator[str]:
+        cached = self._cache_get(cache, prompt, model, temperature, response_mime_type, label, logger)
+        if cached is not None:
+            yield cached
+            return
+        async with get_limiter("gemini").permit() as permit:
+            t0 = time.perf_counter()
+            delay, text = self._reply(prompt, label)
+            chunks = [text[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(text), self.STREAM_CHUNK_CHARS)]
+            sent = 0
+            try:
+                for i, chunk in enumerate(chunks):
+                    await asyncio.sleep(delay / 2 if i == 0 else delay / 2 / max(1, len(chunks) - 1))
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                self._account(label=label, model=model, t0=t0, resp=self._resp(prompt, text[:sent]), chars_out=sent, logger=logger,
+                              calls=calls, mode="async_stream", cached=cache is not None, queue_ms=permit.wait_ms)
+        self._cache_put(cache, prompt, model, temperature, response_mime_type, text)
+
+    def embed(self, text: str, *, model: str = EMBED_MODEL) -> list[float]:
+        # Deterministic bag-of-words vector: identical queries match, rephrasings mostly don't.
+        vector = [0.0] * 64
+        for word in text.lower().split():
+            vector[int(cache_key(model="replay", query=word)[:4], 16) % 64] += 1.0
+        return vector
+
+
+_CLIENTS: dict[str, LLMClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_llm_client(api_key: str) -> LLMClient:
+    """
+    Lazily create (once per API key) and return the process-wide Gemini client.
+    In replay mode (RESEARCH_PROVIDERS=replay) this is the shared ReplayLLMClient.
+    """
+    if replay_mode():
+        api_key = "replay"
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            client = ReplayLLMClient() if api_key == "replay" and replay_mode() else LLMClient(api_key)
+            _CLIENTS[api_key] = client
+        return client
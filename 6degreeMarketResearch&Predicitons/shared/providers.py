@@ -0,0 +1,257 @@
+"""
+Provider selection for the research tools: live APIs or offline replay.
+
+RESEARCH_PROVIDERS=replay runs every tool without network access or API keys:
+- Gemini calls are answered by ReplayLLMClient (shared/llm_client.py) from
+  recorded run artifacts, or from deterministic synthetic text, after an
+  injected latency.
+- Perplexity calls go to PERPLEXITY_BASE_URL. Point it at the local stand-in
+  (shared/stub_server.py). The stand-in replays recorded answers over real
+  HTTP, so the shared client's pooling, retries and backoff are exercised.
+
+API keys are checked when first needed (require_key), not at import time, so
+the pipelines import (and can be benchmarked) without credentials.
+
+Env (read at call time: the tools load their .env after importing this module):
+  RESEARCH_PROVIDERS=live|replay
+  PERPLEXITY_BASE_URL        default https://api.perplexity.ai
+  REPLAY_RUNS_DIRS           run dirs to replay, os.pathsep-separated
+                             (default: market_research/runs and prediction_questions/runs)
+  REPLAY_LATENCY_MS / REPLAY_JITTER_MS / REPLAY_ERROR_RATE / REPLAY_SEED
+                             latency and error injection for replayed Gemini calls
+  REPLAY_CRITIC_REJECTIONS   reject the first N critic calls (synthetic) ...
+  REPLAY_GAP_QUESTIONS       ... asking this many gap questions each (default 3)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from pathlib import Path
+
+TOOLS_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+DEFAULT_REPLAY_RUNS_DIRS = (TOOLS_ROOT / "market_research" / "runs", TOOLS_ROOT / "prediction_questions" / "runs")
+
+# Recorded Gemini outputs, by the label the tools pass to the LLM client.
+_LLM_ARTIFACTS = {
+    "critic_response.json": "critic",
+    "writer_draft.md": "writer",
+    "writer_revised.md": "revision",
+    "questions_raw.json": "agent2.questions",
+}
+
+
+def provider_mode() -> str:
+    return (os.getenv("RESEARCH_PROVIDERS") or "live").strip().lower()
+
+
+def replay_mode() -> bool:
+    return provider_mode() == "replay"
+
+
+def require_key(name: str) -> str:
+    """Return the API key `name`, raising if it is missing (a placeholder in replay mode)."""
+    value = (os.getenv(name) or "").strip()
+    if value:
+        return value
+    if replay_mode():
+        return "replay"
+    raise RuntimeError(f"Missing {name}. Add it to your .env or environment variables.")
+
+
+def perplexity_chat_url() -> str:
+    base = (os.getenv("PERPLEXITY_BASE_URL") or DEFAULT_PERPLEXITY_BASE_URL).strip().rstrip("/")
+    return f"{base}/chat/completions"
+
+
+def _stable_index(text: str, n: int) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) % n
+
+
+class FaultInjector:
+    """Deterministic (seeded) latency and error injection shared by the replay providers."""
+
+    def __init__(self, *, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix: str = "REPLAY") -> "FaultInjector":
+        return cls(
+            latency_ms=float(os.getenv(f"{prefix}_LATENCY_MS") or 0),
+            jitter_ms=float(os.getenv(f"{prefix}_JITTER_MS") or 0),
+            error_rate=float(os.getenv(f"{prefix}_ERROR_RATE") or 0),
+            seed=int(os.getenv(f"{prefix}_SEED") or 0),
+        )
+
+    def next(self) -> tuple[float, bool]:
+        """(delay in seconds, whether this call fails) for the next call."""
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+        return max(0.0, self.latency_ms + jitter) / 1000, fail
+
+
+class FixtureStore:
+    """
+    Recorded provider outputs from earlier runs/* directories:
+    - Perplexity: perplexity_NN_query.txt + perplexity_NN_raw.json (or _content.md)
+      from market research runs; perplexity_research.md from prediction runs.
+    - Gemini: critic/writer/revision outputs and prediction questions, by label.
+    Lookups fall back to a stable pick among recordings, then to synthetic text,
+    so replays are deterministic for any input.
+    """
+
+    def __init__(self, runs_dirs: list[Path] | tuple[Path, ...] = ()):
+        self.perplexity: dict[str, dict] = {}
+        self.perplexity_answers: list[dict] = []
+        self.llm: dict[str, list[str]] = {}
+        self.headlines: list[str] = []
+        self._critic_calls = 0
+        self._lock = threading.Lock()
+        for d in runs_dirs:
+            if Path(d).is_dir():
+                for run_dir in sorted(p for p in Path(d).iterdir() if p.is_dir()):
+                    self._load_run(run_dir)
+
+    @classmethod
+    def from_env(cls) -> "FixtureStore":
+        raw = (os.getenv("REPLAY_RUNS_DIRS") or "").strip()
+        dirs = [Path(p) for p in raw.split(os.pathsep) if p.strip()] if raw else list(DEFAULT_REPLAY_RUNS_DIRS)
+        return cls(dirs)
+
+    def _load_run(self, run_dir: Path) -> None:
+        for query_path in sorted(run_dir.glob("perplexity_*_query.txt")):
+            stem = query_path.name[: -len("_query.txt")]
+            data = None
+            # Cache hits save <stem>_raw.json; live calls save one raw body per attempt (last = success).
+            for raw_path in [run_dir / f"{stem}_raw.json", *sorted(run_dir.glob(f"{stem}_attempt_*_raw.json"), reverse=True)]:
+                try:
+                    candidate = json.loads(raw_path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    continue
+                if isinstance(candidate, dict) and candidate.get("choices"):
+                    data = candidate
+                    break
+            content_path = run_dir / f"{stem}_content.md"
+            if data is None and content_path.exists():
+                data = _chat_completion(content_path.read_text(encoding="utf-8"))
+            if data is None:
+                continue
+            self.perplexity[query_path.read_text(encoding="utf-8").strip()] = data
+            self.perplexity_answers.append(data)
+        research = run_dir / "perplexity_research.md"
+        if research.exists():
+            self.perplexity_answers.append(_chat_completion(research.read_text(encoding="utf-8")))
+        for filename, label in _LLM_ARTIFACTS.items():
+            path = run_dir / filename
+            if path.exists():
+                self.llm.setdefault(label, []).append(path.read_text(encoding="utf-8"))
+        headlines = run_dir / "headlines.txt"
+        if headlines.exists():
+            self.headlines.extend(re.sub(r"^\d+\.\s*", "", l).strip() for l in headlines.read_text(encoding="utf-8").splitlines() if l.strip())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "perplexity_queries": len(self.perplexity),
+            "perplexity_answers": len(self.perplexity_answers),
+            **{f"llm.{k}": len(v) for k, v in self.llm.items()},
+            "headlines": len(self.headlines),
+        }
+
+    # -----------------------
+    # Lookups
+    # -----------------------
+    def perplexity_answer(self, query: str) -> dict:
+        """A chat-completions response body for `query`."""
+        if query in self.perplexity:
+            return self.perplexity[query]
+        if self.perplexity_answers:
+            return self.perplexity_answers[_stable_index(query, len(self.perplexity_answers))]
+        n = _stable_index(query, 90) + 10
+        return _chat_completion(
+            f"Synthetic answer for: {query[:200]}\n\n"
+            f"- The market was worth ${n} billion in 2024, growing {n % 30 + 5}% a year [1].\n"
+            f"- The top three players hold {n % 50 + 30}% share [2].\n"
+            f"- Regulation is the main risk named by analysts [1].",
+            citations=[f"https://example.com/replay/{n}", f"https://example.org/replay/{n}"],
+        )
+
+    def llm_response(self, label: str, prompt: str) -> str:
+        rejections = os.getenv("REPLAY_CRITIC_REJECTIONS")
+        if label == "critic" and rejections is not None:
+            with self._lock:
+                self._critic_calls += 1
+                call = self._critic_calls
+            if call <= int(rejections or 0):
+                n = int(os.getenv("REPLAY_GAP_QUESTIONS") or 3)
+                questions = [f"Replay gap question {i + 1} for call {call}" for i in range(n)]
+                return json.dumps({"status": "REJECTED", "reasoning": "replay: more data needed", "missing_information": questions})
+            return json.dumps({"status": "APPROVED", "reasoning": "replay: sufficient", "missing_information": []})
+        recorded = self.llm.get(label)
+        if recorded:
+            return recorded[_stable_index(prompt, len(recorded))]
+        return _synthetic_llm_response(label, prompt)
+
+    def rss(self, name: str, *, items: int = 30) -> str:
+        titles = self.headlines or [f"Startup {i} raises ${i * 10}M as regulators open probe" for i in range(1, items + 1)]
+        entries = "".join(
+            f"<item><title>{_xml_escape(t)}</title><link>https://example.com/{name}/{i}</link>"
+            f"<description>Replay item {i} from {name}</description></item>"
+            for i, t in enumerate(titles[:items], start=1)
+        )
+        return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>{name}</title>{entries}</channel></rss>'
+
+
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _chat_completion(content: str, *, citations: list[str] | None = None) -> dict:
+    return {
+        "id": "replay",
+        "model": "replay",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "citations": citations or [],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "cost": {"total_cost": 0.0}},
+    }
+
+
+def _synthetic_llm_response(label: str, prompt: str) -> str:
+    if label == "critic":
+        return json.dumps({"status": "APPROVED", "reasoning": "replay: sufficient", "missing_information": []})
+    if label == "agent0.select":
+        return "[1, 2, 3]"
+    if label == "agent2.questions":
+        return json.dumps([
+            {"headline": f"Replay headline {i}", "company": f"Company {i}", "question": f"Will Company {i} close its round by 2026-12-31?",
+             "resolution_date": "2026-12-31", "resolution_source": "press release", "category": "funding", "initial_probability": 0.5}
+            for i in range(1, 4)
+        ])
+    if label in ("writer", "revision"):
+        sections = ["TL;DR", "The big shift", "Market size & growth", "Who's winning", "Buyer behavior & budgets",
+                    "What's actually working", "Risks & counter-arguments", "12-24 month outlook"]
+        body = "\n\n".join(f"## {s}\n\n" + "Replay paragraph with a **number** of $10 billion [1]. " * 12 for s in sections)
+        return f"# Replay report\n\n{body}\n\n## Sources\n- https://example.com/replay/1\n"
+    return "OK"
+
+
+_FIXTURES: FixtureStore | None = None
+_FIXTURES_LOCK = threading.Lock()
+
+
+def get_fixtures() -> FixtureStore:
+    """Process-wide fixture store (loaded once from REPLAY_RUNS_DIRS)."""
+    global _FIXTURES
+    with _FIXTURES_LOCK:
+        if _FIXTURES is None:
+            _FIXTURES = FixtureStore.from_env()
+        return _FIXTURES
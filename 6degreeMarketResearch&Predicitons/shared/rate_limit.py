@@ -0,0 +1,318 @@
+"""
+Process-wide rate limiting per provider (Perplexity, Gemini, Notion, Supabase).
+
+Every outbound call to a provider holds a permit from that provider's
+RateLimiter, so parallel sniper workers, batch topics and their retries all
+draw from one budget instead of backing off independently:
+- Token bucket: request starts average at most `rate_per_s`, with bursts of up
+  to `burst` requests (rate 1/MIN_INTERVAL_S with burst 1 = evenly spaced starts).
+- AIMD concurrency: the in-flight cap starts at max_concurrency. A 429, 5xx
+  or transport error multiplies it by `decrease` (at most once per cooldown,
+  so one burst of failures counts once). Each success adds 1/cap, i.e. about
+  +1 per window of successful calls, back up to max_concurrency.
+- Throttle pause: a 429 (or any response with Retry-After) pauses new starts
+  for every caller of that provider until it expires, so parallel retries
+  don't all hit the provider again at the same moment.
+- Queue metrics: waits, queue depth, throttles and limit changes (stats()).
+
+Usage (`async with` works the same way, without blocking the event loop):
+    with get_limiter("perplexity").permit() as permit:
+        resp = send()
+        permit.observe(status_code=resp.status_code, retry_after_s=...)
+
+An exception raised inside the block counts as a failure; 429/quota and
+5xx/unavailable-looking errors (e.g. from the Gemini SDK) shrink the cap.
+
+Env (read when a provider's limiter is first used, after the tools load .env):
+  <PROVIDER>_MAX_CONCURRENCY   cap on in-flight calls
+  <PROVIDER>_MIN_INTERVAL_S    average spacing of request starts (0 = no rate limit)
+  <PROVIDER>_BURST             token bucket size (default 1)
+  RATE_LIMIT_ADAPTIVE=0        fixed concurrency (no AIMD)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import threading
+import time
+from typing import Any
+
+# Defaults match the limits the tools used before (Notion allows ~3 requests/s).
+PROVIDER_DEFAULTS: dict[str, dict[str, float]] = {
+    "perplexity": {"max_concurrency": 5, "min_interval_s": 1.0},
+    "gemini": {"max_concurrency": 4, "min_interval_s": 0.0},
+    # One in-flight Notion request at a time: appends must stay ordered.
+    "notion": {"max_concurrency": 1, "min_interval_s": 0.34},
+    "supabase": {"max_concurrency": 4, "min_interval_s": 0.0},
+}
+
+OVERLOAD_STATUSES = (500, 502, 503, 504)
+_THROTTLE_ERROR_RE = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|rate.?limit|quota", re.IGNORECASE)
+_OVERLOAD_ERROR_RE = re.compile(r"\b50[0234]\b|UNAVAILABLE|overloaded|timed? ?out|connect", re.IGNORECASE)
+
+
+def classify(*, status_code: int | None = None, error: BaseException | None = None) -> str:
+    """'throttled' (429), 'overloaded' (5xx / transport), 'error' (other failures) or 'ok'."""
+    if status_code is not None:
+        if status_code == 429:
+            return "throttled"
+        if status_code in OVERLOAD_STATUSES:
+            return "overloaded"
+        return "ok"
+    if error is None:
+        return "ok"
+    text = f"{type(error).__name__}: {error}"
+    if _THROTTLE_ERROR_RE.search(text):
+        return "throttled"
+    if isinstance(error, (OSError, TimeoutError)) or _OVERLOAD_ERROR_RE.search(text):
+        return "overloaded"
+    return "error"
+
+
+class Permit:
+    """One admitted call. Report its outcome with observe(); exceptions are classified on exit."""
+
+    def __init__(self, limiter: "RateLimiter"):
+        self.limiter = limiter
+        self.wait_ms = 0.0
+        self.outcome: str | None = None
+        self.retry_after_s: float | None = None
+
+    def observe(self, *, status_code: int | None = None, error: BaseException | None = None,
+                retry_after_s: float | None = None) -> None:
+        self.outcome = classify(status_code=status_code, error=error)
+        self.retry_after_s = retry_after_s
+
+    def __enter__(self) -> "Permit":
+        self.wait_ms = self.limiter._acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.outcome is None:
+            if exc is None:
+                self.outcome = "ok"
+            elif not isinstance(exc, Exception):
+                # GeneratorExit (stream closed early), cancellation, Ctrl+C: no signal about the provider.
+                self.outcome = "cancelled"
+            else:
+                self.outcome = classify(error=exc)
+        self.limiter._release(self.outcome, self.retry_after_s)
+        return False
+
+    async def __aenter__(self) -> "Permit":
+        self.wait_ms = await self.limiter._aacquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_concurrency: int,
+        rate_per_s: float = 0.0,
+        burst: int = 1,
+        min_concurrency: int = 1,
+        adaptive: bool = True,
+        decrease: float = 0.5,
+        cooldown_s: float = 2.0,
+        throttle_pause_s: float = 1.0,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.rate_per_s = rate_per_s
+        self.burst = max(1, burst)
+        self.adaptive = adaptive
+        self.decrease = decrease
+        self.cooldown_s = cooldown_s
+        self.throttle_pause_s = throttle_pause_s
+
+        self._cond = threading.Condition()
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._cooldown_until = 0.0
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._stats = {
+            "calls": 0, "throttled": 0, "overloaded": 0, "errors": 0, "decreases": 0, "pauses": 0,
+            "wait_ms_total": 0.0, "wait_ms_max": 0.0, "max_queued": 0, "min_limit": float(self.max_concurrency),
+        }
+
+    @classmethod
+    def from_env(cls, name: str) -> "RateLimiter":
+        defaults = PROVIDER_DEFAULTS.get(name, {"max_concurrency": 4, "min_interval_s": 0.0})
+        prefix = name.upper()
+        interval = float(os.getenv(f"{prefix}_MIN_INTERVAL_S") or defaults["min_interval_s"])
+        return cls(
+            name,
+            max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY") or defaults["max_concurrency"]),
+            rate_per_s=1.0 / interval if interval > 0 else 0.0,
+            burst=int(os.getenv(f"{prefix}_BURST") or 1),
+            adaptive=(os.getenv("RATE_LIMIT_ADAPTIVE") or "1").strip() not in ("0", "false", "False", "no", "NO"),
+        )
+
+    @property
+    def limit(self) -> int:
+        """Current in-flight cap."""
+        return max(1, int(self._limit))
+
+    def permit(self) -> Permit:
+        return Permit(self)
+
+    # -----------------------
+    # Admission
+    # -----------------------
+    def _take_token(self, now: float) -> float:
+        """Reserve a start slot; returns how long to wait for it (caller holds the lock)."""
+        wait = max(0.0, self._paused_until - now)
+        if self.rate_per_s > 0:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate_per_s)
+            self._refilled_at = now
+            self._tokens -= 1.0
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate_per_s)
+        return wait
+
+    def _enqueue(self) -> None:
+        self._waiting += 1
+        self._stats["max_queued"] = max(self._stats["max_queued"], self._waiting)
+
+    def _admit(self) -> float:
+        """Take a concurrency slot and a start token (caller holds the lock); returns the token wait."""
+        self._waiting -= 1
+        self._in_flight += 1
+        return self._take_token(time.monotonic())
+
+    def _acquire(self) -> float:
+        """Block until a concurrency slot and a start token are available; returns ms waited."""
+        t0 = time.monotonic()
+        with self._cond:
+            self._enqueue()
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            wait = self._admit()
+        while wait > 0:
+            time.sleep(wait)
+            # A throttle seen while we slept pauses us too.
+            with self._cond:
+                wait = self._paused_until - time.monotonic()
+        return self._record_wait(t0)
+
+    async def _aacquire(self) -> float:
+        """asyncio variant of _acquire: waits without blocking the event loop or a worker thread."""
+        t0 = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            self._enqueue()
+        try:
+            while True:
+                with self._cond:
+                    if self._in_flight < self.limit:
+                        wait = self._admit()
+                        break
+                    waiter = loop.create_future()
+                    self._async_waiters.append((loop, waiter))
+                await waiter
+        except BaseException:
+            with self._cond:
+                self._waiting -= 1
+            raise
+        try:
+            while wait > 0:
+                await asyncio.sleep(wait)
+                with self._cond:
+                    wait = self._paused_until - time.monotonic()
+        except BaseException:
+            self._release("cancelled")  # cancelled after admission: give the slot back
+            raise
+        return self._record_wait(t0)
+
+    def _record_wait(self, t0: float) -> float:
+        waited_ms = (time.monotonic() - t0) * 1000
+        with self._cond:
+            self._stats["calls"] += 1
+            self._stats["wait_ms_total"] += waited_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], waited_ms)
+        return waited_ms
+
+    def _release(self, outcome: str, retry_after_s: float | None = None) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if outcome in ("throttled", "overloaded", "error"):
+                self._stats[outcome if outcome != "error" else "errors"] += 1
+            if retry_after_s is not None or outcome == "throttled":
+                pause = retry_after_s if retry_after_s is not None else self.throttle_pause_s
+                if now + pause > self._paused_until:
+                    self._paused_until = now + pause
+                    self._stats["pauses"] += 1
+            if self.adaptive and outcome in ("throttled", "overloaded"):
+                if now >= self._cooldown_until:
+                    self._limit = max(float(self.min_concurrency), self._limit * self.decrease)
+                    self._cooldown_until = now + self.cooldown_s
+                    self._stats["decreases"] += 1
+                    self._stats["min_limit"] = min(self._stats["min_limit"], self._limit)
+            elif self.adaptive and outcome == "ok" and self._limit < self.max_concurrency:
+                self._limit = min(float(self.max_concurrency), self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        # Async waiters re-check admission on their own loop.
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:  # loop already closed
+                pass
+
+    # -----------------------
+    # Metrics
+    # -----------------------
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            s = dict(self._stats)
+            s.update(
+                limit=round(self._limit, 2),
+                max_concurrency=self.max_concurrency,
+                rate_per_s=round(self.rate_per_s, 3),
+                in_flight=self._in_flight,
+                queued=self._waiting,
+            )
+        s["wait_ms_avg"] = round(s["wait_ms_total"] / s["calls"], 1) if s["calls"] else 0.0
+        s["wait_ms_total"] = round(s["wait_ms_total"], 1)
+        s["wait_ms_max"] = round(s["wait_ms_max"], 1)
+        s["min_limit"] = round(s["min_limit"], 2)
+        return s
+
+
+_LIMITERS: dict[str, RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    """The process-wide limiter for `provider` (created from env on first use)."""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(provider)
+        if limiter is None:
+            limiter = RateLimiter.from_env(provider)
+            _LIMITERS[provider] = limiter
+        return limiter
+
+
+def limiter_stats() -> dict[str, dict[str, Any]]:
+    """Queue metrics for every provider used so far in this process."""
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {l.name: l.stats() for l in limiters}
@@ -0,0 +1,445 @@
+"""
+Size-bounded research cache shared by the research tools (Perplexity + Gemini).
+
+One SQLite file replaces the loose <sha256>.content.md/.raw.json/.query.txt
+files under market_research/cache/perplexity/. Entries are keyed by the same
+sha256(model + "\\n" + query) the old cache used, and store content, raw JSON,
+citations, created_at, last_access, hit count and size.
+
+- TTL: entries older than RESEARCH_CACHE_TTL_DAYS are treated as misses and pruned.
+- LRU: when the total size exceeds RESEARCH_CACHE_MAX_MB, least recently used
+  entries are evicted.
+Imported entries keep the age of the file they came from (its mtime), so
+importing an old run does not make its research look fresh.
+
+Optional semantic tier: entries can carry an embedding of their query, and
+nearest() serves the closest live entry above a cosine threshold, so rephrased
+questions ("CAGR of X?" vs "X market CAGR 2025") reuse research we already paid for.
+
+Usage:
+  python shared/research_cache.py import-runs         # every runs/*/perplexity_* artifact + legacy cache files
+  python shared/research_cache.py stats
+  python shared/research_cache.py prune
+  python shared/research_cache.py embed-missing       # add query embeddings to entries that lack one (needs GEMINI_API_KEY)
+
+Env:
+  RESEARCH_CACHE_PATH        sqlite file (default: market_research/cache/research_cache.sqlite3)
+  RESEARCH_CACHE_TTL_DAYS    default 30 (0 = never expire)
+  RESEARCH_CACHE_MAX_MB      default 512 (0 = unbounded)
+"""
+
+from __future__ import annotations
+
+import array
+import ast
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+TOOLS_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_PATH = TOOLS_ROOT / "market_research" / "cache" / "research_cache.sqlite3"
+DEFAULT_RUNS_DIR = TOOLS_ROOT / "market_research" / "runs"
+DEFAULT_LEGACY_DIR = Path(os.getenv("PERPLEXITY_CACHE_DIR", str(TOOLS_ROOT / "market_research" / "cache" / "perplexity")))
+
+RESEARCH_CACHE_PATH = Path(os.getenv("RESEARCH_CACHE_PATH", str(DEFAULT_CACHE_PATH)))
+RESEARCH_CACHE_TTL_DAYS = float(os.getenv("RESEARCH_CACHE_TTL_DAYS", "30"))
+RESEARCH_CACHE_MAX_MB = float(os.getenv("RESEARCH_CACHE_MAX_MB", "512"))
+
+PERPLEXITY_NAMESPACE = "perplexity"
+PERPLEXITY_MODEL = "sonar-deep-research"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key          TEXT PRIMARY KEY,
+    namespace    TEXT NOT NULL,
+    model        TEXT NOT NULL,
+    query        TEXT NOT NULL,
+    content      TEXT NOT NULL,
+    raw_json     TEXT,
+    citations    TEXT NOT NULL DEFAULT '[]',
+    created_at   REAL NOT NULL,
+    last_access  REAL NOT NULL,
+    hits         INTEGER NOT NULL DEFAULT 0,
+    size         INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS idx_entries_namespace ON entries (namespace, created_at);
+CREATE TABLE IF NOT EXISTS query_embeddings (
+    key          TEXT PRIMARY KEY REFERENCES entries (key) ON DELETE CASCADE,
+    model        TEXT NOT NULL,
+    vector       BLOB NOT NULL
+);
+"""
+
+
+def cache_key(*, model: str, query: str) -> str:
+    """Same key the loose-file Perplexity cache used, so legacy entries import 1:1."""
+    return hashlib.sha256(f"{model}\n{query}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    namespace: str
+    model: str
+    query: str
+    content: str
+    raw_json: str | None
+    citations: list[str]
+    created_at: float
+    hits: int
+
+
+class ResearchCache:
+    def __init__(
+        self,
+        path: Path | str = RESEARCH_CACHE_PATH,
+        *,
+        ttl_s: float | None = RESEARCH_CACHE_TTL_DAYS * 86400,
+        max_bytes: int | None = int(RESEARCH_CACHE_MAX_MB * 1024 * 1024),
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s or None
+        self.max_bytes = max_bytes or None
+        self._lock = threading.Lock()
+        # One connection shared by the worker threads; access is serialized by _lock.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")  # evicting an entry drops its embedding
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_s is not None and now - created_at > self.ttl_s
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Return a live entry (bumping its LRU position and hit count) or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self._expired(row["created_at"], now):
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._conn.commit()
+        return CacheEntry(
+            key=row["key"],
+            namespace=row["namespace"],
+            model=row["model"],
+            query=row["query"],
+            content=row["content"],
+            raw_json=row["raw_json"],
+            citations=json.loads(row["citations"] or "[]"),
+            created_at=row["created_at"],
+            hits=row["hits"] + 1,
+        )
+
+    def put(
+        self,
+        *,
+        namespace: str,
+        model: str,
+        query: str,
+        content: str,
+        raw_json: str | None = None,
+        citations: list[str] | None = None,
+        created_at: float | None = None,
+        key: str | None = None,
+    ) -> str:
+        """
+        Insert or replace an entry, then enforce the size limit. Returns the key.
+        Re-putting unchanged content never moves created_at forward (no TTL refresh).
+        """
+        key = key or cache_key(model=model, query=query)
+        now = time.time()
+        created_at = created_at or now
+        size = len(content.encode("utf-8")) + len((raw_json or "").encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO entries (key, namespace, model, query, content, raw_json, citations, created_at, last_access, hits, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    content = excluded.content,
+                    raw_json = excluded.raw_json,
+                    citations = excluded.citations,
+                    created_at = CASE WHEN entries.content = excluded.content
+                        THEN MIN(entries.created_at, excluded.created_at) ELSE excluded.created_at END,
+                    last_access = excluded.last_access,
+                    size = excluded.size
+                """,
+                (key, namespace, model, query, content, raw_json, json.dumps(citations or []), created_at, now, size),
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+        return key
+
+    def _evict_locked(self, now: float) -> int:
+        evicted = 0
+        if self.ttl_s is not None:
+            evicted += self._conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_s,)).rowcount
+        if self.max_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for row in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC"):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((row["key"],))
+                    total -= row["size"]
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+                evicted += len(doomed)
+        return evicted
+
+    def prune(self) -> int:
+        """Apply TTL and size limits now. Returns the number of evicted entries."""
+        with self._lock:
+            evicted = self._evict_locked(time.time())
+            self._conn.commit()
+        return evicted
+
+    # -----------------------
+    # Semantic tier
+    # -----------------------
+    def put_embedding(self, key: str, vector: list[float], *, model: str) -> None:
+        """Attach a query embedding (L2-normalized here) to an existing entry."""
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        blob = array.array("f", (x / norm for x in vector)).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, model, vector) "
+                "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM entries WHERE key = ?)",
+                (key, model, blob, key),
+            )
+            self._conn.commit()
+
+    def nearest(
+        self, vector: list[float], *, namespace: str, model: str, threshold: float
+    ) -> tuple[CacheEntry, float] | None:
+        """
+        Closest live entry (same namespace and embedding model) whose query embedding has
+        cosine similarity >= threshold. Returns (entry, similarity) or None.
+        """
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        query_vec = [x / norm for x in vector]
+        min_created = time.time() - self.ttl_s if self.ttl_s is not None else 0.0
+        best_key, best_sim = None, threshold
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.key, q.vector FROM query_embeddings q JOIN entries e ON e.key = q.key "
+                "WHERE e.namespace = ? AND q.model = ? AND e.created_at >= ?",
+                (namespace, model, min_created),
+            ).fetchall()
+        for row in rows:
+            stored = array.array("f")
+            stored.frombytes(row["vector"])
+            if len(stored) != len(query_vec):
+                continue
+            sim = sum(a * b for a, b in zip(query_vec, stored))
+            if sim >= best_sim:
+                best_key, best_sim = row["key"], sim
+        if best_key is None:
+            return None
+        entry = self.get(best_key)
+        return (entry, best_sim) if entry is not None else None
+
+    def missing_embeddings(self, *, namespace: str, model: str) -> list[tuple[str, str]]:
+        """(key, query) for entries with no embedding from `model`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.key, e.query FROM entries e LEFT JOIN query_embeddings q ON q.key = e.key AND q.model = ? "
+                "WHERE e.namespace = ? AND q.key IS NULL AND e.query != ''",
+                (model, namespace),
+            ).fetchall()
+        return [(r["key"], r["query"]) for r in rows]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT namespace, COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes, COALESCE(SUM(hits), 0) AS hits "
+                "FROM entries GROUP BY namespace"
+            ).fetchall()
+        return {
+            "path": str(self.path),
+            "ttl_days": (self.ttl_s / 86400) if self.ttl_s else None,
+            "max_mb": (self.max_bytes / 1024 / 1024) if self.max_bytes else None,
+            "namespaces": {r["namespace"]: {"entries": r["entries"], "bytes": r["bytes"], "hits": r["hits"]} for r in rows},
+        }
+
+    # -----------------------
+    # Bulk import
+    # -----------------------
+    def import_legacy_dir(self, cache_dir: Path | str = DEFAULT_LEGACY_DIR, *, keys: list[str] | None = None) -> int:
+        """Import <key>.content.md/.raw.json/.query.txt files from the old loose-file cache."""
+        cache_dir = Path(cache_dir)
+        imported = 0
+        if keys is None:
+            keys = [p.name[: -len(".content.md")] for p in sorted(cache_dir.glob("*.content.md"))]
+        for key in keys:
+            content_path = cache_dir / f"{key}.content.md"
+            if not content_path.exists():
+                continue
+            query_path = cache_dir / f"{key}.query.txt"
+            raw_path = cache_dir / f"{key}.raw.json"
+            raw_text = raw_path.read_text(encoding="utf-8") if raw_path.exists() else None
+            self.put(
+                key=key,
+                namespace=PERPLEXITY_NAMESPACE,
+                model=PERPLEXITY_MODEL,
+                query=query_path.read_text(encoding="utf-8") if query_path.exists() else "",
+                content=content_path.read_text(encoding="utf-8"),
+                raw_json=raw_text,
+                citations=_citations(raw_text),
+                created_at=content_path.stat().st_mtime,
+            )
+            imported += 1
+        return imported
+
+    def import_runs(self, runs_dir: Path | str = DEFAULT_RUNS_DIR) -> int:
+        """Import the Perplexity artifacts of every run folder under runs_dir."""
+        return sum(self.import_run(p) for p in sorted(Path(runs_dir).iterdir()) if p.is_dir())
+
+    def import_run(self, run_dir: Path | str) -> int:
+        """
+        Import every perplexity_NN_content.md in one run folder.
+
+        The query for slot NN comes from perplexity_NN_query.txt when present,
+        otherwise from the "[Hunter] Searching" lines in run.log (older runs),
+        and for slot 01 finally from topic.txt (the fixed initial query).
+        """
+        run_dir = Path(run_dir)
+        logged_queries = _queries_from_run_log(run_dir / "run.log")
+        imported = 0
+        for content_path in sorted(run_dir.glob("perplexity_*_content.md")):
+            m = re.match(r"perplexity_(\d+)_content\.md$", content_path.name)
+            if not m:
+                continue
+            idx = int(m.group(1))
+            query = _query_for_slot(run_dir, idx, logged_queries)
+            if not query:
+                continue
+            raw_text = _last_good_raw(run_dir, idx)
+            self.put(
+                namespace=PERPLEXITY_NAMESPACE,
+                model=PERPLEXITY_MODEL,
+                query=query,
+                content=content_path.read_text(encoding="utf-8"),
+                raw_json=raw_text,
+                citations=_citations(raw_text),
+                created_at=content_path.stat().st_mtime,
+            )
+            imported += 1
+        return imported
+
+
+def _citations(raw_text: str | None) -> list[str]:
+    if not raw_text:
+        return []
+    try:
+        return [u for u in json.loads(raw_text).get("citations", []) if isinstance(u, str)]
+    except (ValueError, AttributeError):
+        return []
+
+
+_SEARCH_LINE_RE = re.compile(r"\[Hunter\] Searching \|(?: idx=(\d+) \|)? query=(.*)$")
+
+
+def _queries_from_run_log(log_path: Path) -> dict[int, str]:
+    """Map slot -> query from run.log. Older logs have no idx; those runs searched sequentially."""
+    queries: dict[int, str] = {}
+    if not log_path.exists():
+        return queries
+    seq = 0
+    for line in log_path.read_text(encoding="utf-8", errors="replace").splitlines():
+        m = _SEARCH_LINE_RE.search(line)
+        if not m:
+            continue
+        seq += 1
+        try:
+            query = ast.literal_eval(m.group(2).strip())
+        except (ValueError, SyntaxError):
+            continue
+        queries[int(m.group(1)) if m.group(1) else seq] = query
+    return queries
+
+
+def _query_for_slot(run_dir: Path, idx: int, logged_queries: dict[int, str]) -> str:
+    query_path = run_dir / f"perplexity_{idx:02d}_query.txt"
+    if query_path.exists():
+        return query_path.read_text(encoding="utf-8")
+    if idx in logged_queries:
+        return logged_queries[idx]
+    topic_path = run_dir / "topic.txt"
+    if idx == 1 and topic_path.exists():
+        topic = topic_path.read_text(encoding="utf-8")
+        return f"Comprehensive deep dive data on {topic}. Market size, players, risks."
+    return ""
+
+
+def _last_good_raw(run_dir: Path, idx: int) -> str | None:
+    # Cache hits mirror perplexity_NN_raw.json; live calls keep one raw file per attempt.
+    for path in [run_dir / f"perplexity_{idx:02d}_raw.json"] + sorted(
+        run_dir.glob(f"perplexity_{idx:02d}_attempt_*_raw.json"), reverse=True
+    ):
+        if not path.exists():
+            continue
+        text = path.read_text(encoding="utf-8")
+        try:
+            if json.loads(text).get("choices"):
+                return text
+        except (ValueError, AttributeError):
+            continue
+    return None
+
+
+_CACHE: ResearchCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_research_cache() -> ResearchCache:
+    """Process-wide cache shared by every tool and thread."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResearchCache()
+        return _CACHE
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    cache = get_research_cache()
+    if command == "import-runs":
+        runs_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RUNS_DIR
+        legacy = cache.import_legacy_dir() if DEFAULT_LEGACY_DIR.exists() else 0
+        runs = cache.import_runs(runs_dir) if runs_dir.exists() else 0
+        print(f"[OK] Imported {legacy} legacy cache entries and {runs} run artifacts into {cache.path}")
+    elif command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif command == "prune":
+        print(f"[OK] Evicted {cache.prune()} entries")
+    elif command == "embed-missing":
+        sys.path.insert(0, str(TOOLS_ROOT))
+        from shared.llm_client import get_llm_client, EMBED_MODEL
+
+        llm = get_llm_client((os.getenv("GEMINI_API_KEY") or "").strip())
+        missing = cache.missing_embeddings(namespace=PERPLEXITY_NAMESPACE, model=EMBED_MODEL)
+        for key, query in missing:
+            cache.put_embedding(key, llm.embed(query, model=EMBED_MODEL), model=EMBED_MODEL)
+        print(f"[OK] Embedded {len(missing)} queries with {EMBED_MODEL}")
+    else:
+        print("Usage: python shared/research_cache.py [import-runs [runs_dir]|stats|prune|embed-missing]")
+        sys.exit(1)
@@ -0,0 +1,347 @@
+"""
+Persistent index of the sources the research tools have cited, across runs.
+
+Each run only knows its own `citations`; the same reports, filings and press
+releases get researched again and again. This index keeps, per source:
+- the normalized URL (https, lowercased host, sorted query; no "www.", fragment,
+  default port, trailing slash or tracking parameters such as utm_*, gclid, fbclid, ref)
+- its domain, when it was first/last cited and how often
+- the topics it was cited for
+- the fact snippets (claim + numbers) that cited it, with run/question provenance
+
+answer() assembles an answer to a research question from indexed facts when
+they cover it well enough, so a run can skip a search it has effectively done
+before (opt-in, see SOURCE_INDEX_ANSWERS in market_research/MarketResearch.py).
+
+Usage:
+  python shared/source_index.py stats
+  python shared/source_index.py sources [domain]     # most-cited sources (optionally one domain)
+  python shared/source_index.py facts "<question>"   # indexed facts matching a question
+
+Env:
+  SOURCE_INDEX_PATH   sqlite file (default: market_research/cache/source_index.sqlite3)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TOOLS_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_INDEX_PATH = TOOLS_ROOT / "market_research" / "cache" / "source_index.sqlite3"
+
+SOURCE_INDEX_PATH = Path(os.getenv("SOURCE_INDEX_PATH", str(DEFAULT_INDEX_PATH)))
+
+_TRACKING_PARAMS = frozenset({
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_hsenc", "_hsmi",
+    "mkt_tok", "ref", "ref_src", "ref_url", "referrer", "spm", "srsltid", "cmpid", "guccounter",
+})
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were what when "
+    "where which who why will with".split()
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    url          TEXT PRIMARY KEY,
+    domain       TEXT NOT NULL,
+    first_seen   REAL NOT NULL,
+    last_seen    REAL NOT NULL,
+    citations    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sources_domain ON sources (domain);
+CREATE TABLE IF NOT EXISTS source_topics (
+    url          TEXT NOT NULL REFERENCES sources (url) ON DELETE CASCADE,
+    topic        TEXT NOT NULL,
+    first_seen   REAL NOT NULL,
+    PRIMARY KEY (url, topic)
+);
+CREATE TABLE IF NOT EXISTS facts (
+    id           INTEGER PRIMARY KEY,
+    url          TEXT NOT NULL REFERENCES sources (url) ON DELETE CASCADE,
+    claim        TEXT NOT NULL,
+    numbers      TEXT NOT NULL DEFAULT '[]',
+    tokens       TEXT NOT NULL,
+    topic        TEXT,
+    question     TEXT,
+    run_id       TEXT,
+    first_seen   REAL NOT NULL,
+    last_seen    REAL NOT NULL,
+    UNIQUE (url, claim)
+);
+CREATE INDEX IF NOT EXISTS idx_facts_last_seen ON facts (last_seen);
+"""
+
+
+def normalize_url(url: str) -> str | None:
+    """Canonical form used as the index key; None for anything that is not an http(s) URL."""
+    try:
+        parts = urlsplit((url or "").strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower().removeprefix("www.")
+    if port and port != _DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    path = re.sub(r"/{2,}", "/", parts.path)
+    if path.endswith("/"):
+        path = path.rstrip("/")
+    # http:// and https:// copies of a page are one source.
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def url_domain(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower().removeprefix("www.")
+
+
+def _tokens(text: str) -> set[str]:
+    # Plurals folded so "risks" matches "risk"; good enough for matching questions to claims.
+    words = (w for w in _WORD_RE.findall((text or "").lower()) if w not in _STOPWORDS and len(w) > 1)
+    return {w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words}
+
+
+@dataclass
+class IndexedFact:
+    claim: str
+    numbers: list[str]
+    urls: list[str]
+    last_seen: float
+    overlap: int  # question terms the claim shares
+
+
+@dataclass
+class IndexAnswer:
+    content: str  # Perplexity-style text with [n] markers into `citations`
+    citations: list[str]
+    facts: list[IndexedFact]
+    coverage: float  # share of the question's terms covered by the facts
+
+
+class SourceIndex:
+    def __init__(self, path: Path | str = SOURCE_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # One connection shared by the worker threads; access is serialized by _lock.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _upsert_source_locked(self, url: str, topic: str | None, now: float, *, cited: int = 1) -> None:
+        # Recording an older answer (seen_at in the past) never moves last_seen back.
+        self._conn.execute(
+            "INSERT INTO sources (url, domain, first_seen, last_seen, citations) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET first_seen = MIN(first_seen, excluded.first_seen), "
+            "last_seen = MAX(last_seen, excluded.last_seen), citations = citations + excluded.citations",
+            (url, url_domain(url), now, now, cited),
+        )
+        if topic:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO source_topics (url, topic, first_seen) VALUES (?, ?, ?)", (url, topic, now)
+            )
+
+    def add_sources(
+        self, urls: Iterable[str], *, topic: str | None = None, seen_at: float | None = None, reused: bool = False
+    ) -> list[str]:
+        """
+        Record cited URLs (one citation each) as of seen_at (default: now). A reused
+        answer (e.g. from a cache) adds no citation to sources already indexed.
+        Returns their normalized, de-duplicated forms.
+        """
+        normalized = list(dict.fromkeys(n for n in map(normalize_url, urls or []) if n))
+        if not normalized:
+            return []
+        now = seen_at or time.time()
+        with self._lock:
+            for url in normalized:
+                known = reused and self._conn.execute("SELECT 1 FROM sources WHERE url = ?", (url,)).fetchone()
+                self._upsert_source_locked(url, topic, now, cited=0 if known else 1)
+            self._conn.commit()
+        return normalized
+
+    def add_facts(
+        self,
+        facts: Iterable[tuple[str, list[str], list[str]]],
+        *,
+        topic: str | None = None,
+        question: str | None = None,
+        run_id: str | None = None,
+        seen_at: float | None = None,
+    ) -> int:
+        """
+        Record (claim, numbers, citation URLs) snippets as of seen_at (default: now);
+        claims without a source are skipped. A fact already indexed for a source is
+        refreshed (last_seen) rather than duplicated.
+        Returns the number of (fact, source) pairs written.
+        """
+        now = seen_at or time.time()
+        written = 0
+        with self._lock:
+            for claim, numbers, urls in facts:
+                tokens = " ".join(sorted(_tokens(claim)))
+                for url in dict.fromkeys(n for n in map(normalize_url, urls or []) if n):
+                    self._upsert_source_locked(url, topic, now, cited=0)  # counted by add_sources()
+                    self._conn.execute(
+                        """
+                        INSERT INTO facts (url, claim, numbers, tokens, topic, question, run_id, first_seen, last_seen)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(url, claim) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)
+                        """,
+                        (url, claim, json.dumps(numbers or []), tokens, topic, question, run_id, now, now),
+                    )
+                    written += 1
+            self._conn.commit()
+        return written
+
+    def lookup(self, url: str) -> dict[str, Any] | None:
+        """Everything known about one source (matched by normalized URL)."""
+        key = normalize_url(url)
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sources WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            topics = [r["topic"] for r in self._conn.execute(
+                "SELECT topic FROM source_topics WHERE url = ? ORDER BY first_seen", (key,)
+            )]
+            facts = [r["claim"] for r in self._conn.execute(
+                "SELECT claim FROM facts WHERE url = ? ORDER BY last_seen DESC", (key,)
+            )]
+        return {**dict(row), "topics": topics, "facts": facts}
+
+    def known_facts(self, question: str, *, limit: int = 12, max_age_s: float | None = None) -> list[IndexedFact]:
+        """
+        Indexed facts sharing at least two terms with `question`, best match first
+        (more shared terms, then more numbers, then most recent). Facts not cited
+        again within max_age_s are ignored.
+        """
+        wanted = _tokens(question)
+        if len(wanted) < 2:
+            return []
+        min_seen = time.time() - max_age_s if max_age_s else 0.0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT claim, url, numbers, tokens, last_seen FROM facts WHERE last_seen >= ?", (min_seen,)
+            ).fetchall()
+        by_claim: dict[str, IndexedFact] = {}
+        for row in rows:
+            overlap = len(wanted & set(row["tokens"].split()))
+            if overlap < 2:
+                continue
+            fact = by_claim.get(row["claim"])
+            if fact is None:
+                fact = by_claim[row["claim"]] = IndexedFact(
+                    claim=row["claim"], numbers=json.loads(row["numbers"]), urls=[], last_seen=row["last_seen"], overlap=overlap
+                )
+            fact.urls.append(row["url"])
+            fact.last_seen = max(fact.last_seen, row["last_seen"])
+        ranked = sorted(by_claim.values(), key=lambda f: (f.overlap, min(len(f.numbers), 3), f.last_seen), reverse=True)
+        return ranked[:limit]
+
+    def answer(
+        self,
+        question: str,
+        *,
+        min_facts: int = 5,
+        min_coverage: float = 0.8,
+        limit: int = 12,
+        max_age_s: float | None = None,
+    ) -> IndexAnswer | None:
+        """
+        An answer to `question` built from indexed facts, or None unless at least
+        `min_facts` facts match and together cover `min_coverage` of its terms.
+        """
+        facts = self.known_facts(question, limit=limit, max_age_s=max_age_s)
+        if len(facts) < min_facts:
+            return None
+        wanted = _tokens(question)
+        covered = set()
+        for f in facts:
+            covered |= wanted & _tokens(f.claim)
+        coverage = len(covered) / len(wanted)
+        if coverage < min_coverage:
+            return None
+        citations: list[str] = []
+        lines = []
+        for f in facts:
+            markers = ""
+            for url in f.urls:
+                if url not in citations:
+                    citations.append(url)
+                markers += f"[{citations.index(url) + 1}]"
+            # Markers go before the final punctuation, as Perplexity writes them: a claim
+            # splitter would read "claim. [1]" as a separate, marker-only sentence.
+            claim = f.claim.rstrip()
+            end = claim[-1] if claim[-1:] in (".", "!", "?") else ""
+            lines.append(f"- {claim[:len(claim) - len(end)]}{markers}{end}")
+        # A heading, so it is not read as a finding itself.
+        content = "## Known facts from earlier research (source index)\n\n" + "\n".join(lines)
+        return IndexAnswer(content=content, citations=citations, facts=facts, coverage=coverage)
+
+    def top_sources(self, *, domain: str | None = None, limit: int = 20) -> list[dict[str, Any]]:
+        sql = "SELECT s.*, (SELECT COUNT(*) FROM facts f WHERE f.url = s.url) AS facts FROM sources s"
+        params: tuple = ()
+        if domain:
+            sql += " WHERE s.domain = ?"
+            params = (domain.lower().removeprefix("www."),)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY s.citations DESC, s.last_seen DESC LIMIT ?", (*params, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            sources, domains = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT domain) FROM sources").fetchone()
+            facts = self._conn.execute("SELECT COUNT(DISTINCT claim) FROM facts").fetchone()[0]
+            topics = self._conn.execute("SELECT COUNT(DISTINCT topic) FROM source_topics").fetchone()[0]
+        return {"path": str(self.path), "sources": sources, "domains": domains, "facts": facts, "topics": topics}
+
+
+_INDEX: SourceIndex | None = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_source_index() -> SourceIndex:
+    """Process-wide index shared by every tool and thread."""
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = SourceIndex()
+        return _INDEX
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    index = get_source_index()
+    if command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+    elif command == "sources":
+        for s in index.top_sources(domain=sys.argv[2] if len(sys.argv) > 2 else None):
+            print(f"{s['citations']:>5} cites | {s['facts']:>4} facts | {s['url']}")
+    elif command == "facts" and len(sys.argv) > 2:
+        for f in index.known_facts(sys.argv[2]):
+            print(f"- {f.claim}\n    {', '.join(f.urls)}")
+    else:
+        print('Usage: python shared/source_index.py [stats|sources [domain]|facts "<question>"]')
+        sys.exit(1)
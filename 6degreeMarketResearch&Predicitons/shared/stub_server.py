@@ -0,0 +1,160 @@
+"""
+Local stand-in for the Perplexity API (and RSS feeds) for offline runs and benchmarks.
+
+Replays recorded answers (shared/providers.py FixtureStore) over real HTTP, so
+a pipeline pointed at it with PERPLEXITY_BASE_URL goes through the shared HTTP
+client's connection pooling, retries, Retry-After handling and rate limiting
+exactly as it would against the real API.
+
+Endpoints:
+  POST /chat/completions   Perplexity chat-completions body, answered from fixtures
+  GET  /rss/<name>         an RSS 2.0 feed built from recorded headlines (with an ETag;
+                           304 Not Modified for a matching If-None-Match)
+
+Faults (latency, jitter, error rate) are injected per request. Failed requests
+get `error_status` (default 503), with a Retry-After header if configured.
+
+CLI:
+  python shared/stub_server.py [port]
+  (faults from STUB_LATENCY_MS / STUB_JITTER_MS / STUB_ERROR_RATE / STUB_SEED)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from shared.providers import FaultInjector, FixtureStore, get_fixtures
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client-side pooling is exercised
+    server: "_Server"
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - BaseHTTPRequestHandler signature
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject(self) -> bool:
+        """Apply latency; answer with an error and return True if this request fails."""
+        stub = self.server.stub
+        delay, fail = stub.faults.next()
+        time.sleep(delay)
+        stub._count("requests")
+        if not fail:
+            return False
+        stub._count("errors")
+        headers = {"Retry-After": str(stub.retry_after_s)} if stub.retry_after_s is not None else None
+        self._send(stub.error_status, b'{"error": "injected"}', "application/json", headers)
+        return True
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.rstrip("/") != "/chat/completions":
+            self._send(404, b'{"error": "not found"}', "application/json")
+            return
+        if self._inject():
+            return
+        try:
+            messages = json.loads(body or b"{}").get("messages") or []
+        except ValueError:
+            self._send(400, b'{"error": "invalid json"}', "application/json")
+            return
+        query = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        answer = self.server.stub.fixtures.perplexity_answer(query)
+        self._send(200, json.dumps(answer).encode("utf-8"), "application/json")
+
+    def do_GET(self) -> None:
+        if not self.path.startswith("/rss/"):
+            self._send(404, b"not found", "text/plain")
+            return
+        if self._inject():
+            return
+        feed = self.server.stub.fixtures.rss(self.path[len("/rss/"):].strip("/") or "feed").encode("utf-8")
+        etag = '"' + hashlib.sha256(feed).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", "application/rss+xml; charset=utf-8", {"ETag": etag})
+            return
+        self._send(200, feed, "application/rss+xml; charset=utf-8", {"ETag": etag})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "StubServer"
+
+
+class StubServer:
+    def __init__(
+        self,
+        fixtures: FixtureStore | None = None,
+        faults: FaultInjector | None = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        error_status: int = 503,
+        retry_after_s: float | None = None,
+    ):
+        self.fixtures = fixtures or get_fixtures()
+        self.faults = faults or FaultInjector()
+        self.error_status = error_status
+        self.retry_after_s = retry_after_s
+        self.stats = {"requests": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.stub = self
+        self._thread: threading.Thread | None = None
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Serve in a background thread; returns the base URL (use it as PERPLEXITY_BASE_URL)."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    stub = StubServer(faults=FaultInjector.from_env("STUB"), port=port)
+    print(f"Fixtures: {json.dumps(stub.fixtures.stats())}")
+    print(f"Serving on {stub.base_url} (PERPLEXITY_BASE_URL={stub.base_url}); Ctrl+C to stop")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._httpd.server_close()
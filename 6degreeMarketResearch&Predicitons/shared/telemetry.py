@@ -0,0 +1,333 @@
+"""
+Run-level telemetry for the research tools: nested spans with timing, tokens,
+cost, cache hits, retries, bytes and rate-limiter queueing (queue_ms).
+
+- A Tracer belongs to one run. `with tracer.span("stage.writer"):` opens a span;
+  spans opened inside it (in the same thread, or in workers started with
+  contextvars.copy_context()) become its children.
+- The shared HTTP and LLM clients call record_span() after every request, so
+  HTTP calls and Gemini calls show up under whatever stage issued them. Outside
+  a span (e.g. tools that don't trace) record_span() does nothing.
+- tracer.write_metrics() writes metrics.json: per-span-name aggregates
+  (tokens, cost, retries... include children), totals, and the raw spans. A
+  resumed run reloads its earlier spans, so the file covers every session.
+- With a trace path, each finished span is also appended to a JSONL file in
+  OpenTelemetry's OTLP/JSON span shape (traceId, spanId, startTimeUnixNano...).
+
+Report across runs (slowest / most expensive stages):
+  python shared/telemetry.py report [runs_dir] [top_n]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+TOOLS_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_RUNS_DIR = TOOLS_ROOT / "market_research" / "runs"
+METRICS_FILENAME = "metrics.json"
+TRACE_FILENAME = "trace.jsonl"
+
+# Numeric attributes that are summed over a span and its descendants.
+ROLLUP_KEYS = ("tokens_in", "tokens_out", "cost_usd", "retries", "bytes", "queue_ms")
+
+_CURRENT: ContextVar["Span | None"] = ContextVar("telemetry_current_span", default=None)
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, parent: "Span | None", attrs: dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = {k: v for k, v in attrs.items() if v is not None}
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        self.duration_ns = 0
+        self.status = "ok"
+        self.error: str | None = None
+        self._token = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update({k: v for k, v in attrs.items() if v is not None})
+
+    def __enter__(self) -> "Span":
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.status = "error"
+            self.error = repr(exc)[:500]
+        _CURRENT.reset(self._token)
+        self.end()
+
+    def end(self) -> None:
+        self.duration_ns = time.perf_counter_ns() - self._t0
+        self.tracer._finish(self)
+
+    def to_dict(self) -> dict:
+        d = {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "ms": round(self.duration_ns / 1e6, 1),
+            "status": self.status,
+            "attrs": self.attrs,
+        }
+        if self.error:
+            d["error"] = self.error
+        return d
+
+    def to_otlp(self, trace_id: str, resource: dict[str, Any]) -> dict:
+        """One span in OTLP/JSON shape (what an OTel collector's file receiver expects per span)."""
+        def value(v: Any) -> dict:
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        d = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.start_ns + self.duration_ns),
+            "attributes": [{"key": k, "value": value(v)} for k, v in self.attrs.items()],
+            "status": {"code": "STATUS_CODE_ERROR", "message": self.error or ""} if self.status == "error" else {"code": "STATUS_CODE_OK"},
+            "resource": {"attributes": [{"key": k, "value": value(v)} for k, v in resource.items()]},
+        }
+        if self.parent_id:
+            d["parentSpanId"] = self.parent_id
+        return d
+
+
+class Tracer:
+    def __init__(self, run_id: str, *, metrics_path: Path, trace_path: Path | None = None, service: str = "research-agent"):
+        self.run_id = run_id
+        self.metrics_path = Path(metrics_path)
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.trace_id = secrets.token_hex(16)
+        self.resource = {"service.name": service, "run.id": run_id}
+        self._lock = threading.Lock()
+        self._spans: list[dict] = []
+        if self.metrics_path.exists():
+            # Resumed run: keep the earlier sessions' spans (and their trace id).
+            try:
+                previous = json.loads(self.metrics_path.read_text(encoding="utf-8"))
+                self._spans = list(previous.get("spans", []))
+                self.trace_id = previous.get("trace_id") or self.trace_id
+            except (OSError, ValueError):
+                pass
+
+    def span(self, name: str, **attrs: Any) -> Span:
+        """A child of the current span (or a root span). Use as a context manager."""
+        return Span(self, name, _CURRENT.get(), attrs)
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span.to_dict())
+            if self.trace_path is not None:
+                with open(self.trace_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.to_otlp(self.trace_id, self.resource), ensure_ascii=False) + "\n")
+
+    def spans(self) -> list[dict]:
+        with self._lock:
+            return list(self._spans)
+
+    def metrics(self) -> dict:
+        return summarize_spans(self.spans(), run_id=self.run_id, trace_id=self.trace_id)
+
+    def write_metrics(self) -> dict:
+        """Write metrics.json atomically and return it."""
+        metrics = self.metrics()
+        tmp = self.metrics_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(metrics, indent=2), encoding="utf-8")
+        os.replace(tmp, self.metrics_path)
+        return metrics
+
+
+def current_span() -> Span | None:
+    return _CURRENT.get()
+
+
+def record_span(name: str, *, duration_ms: float, error: str | None = None, **attrs: Any) -> None:
+    """Record an already-finished operation as a child of the current span (no-op without one)."""
+    parent = _CURRENT.get()
+    if parent is None:
+        return
+    span = Span(parent.tracer, name, parent, attrs)
+    span.duration_ns = int(duration_ms * 1e6)
+    span.start_ns = time.time_ns() - span.duration_ns
+    if error:
+        span.status, span.error = "error", error[:500]
+    parent.tracer._finish(span)
+
+
+# -----------------------
+# Aggregation
+# -----------------------
+def _is_cache_hit(attrs: dict) -> bool | None:
+    cache = attrs.get("cache")
+    if cache is None:
+        return None
+    return cache != "miss"
+
+
+def summarize_spans(spans: list[dict], *, run_id: str | None = None, trace_id: str | None = None) -> dict:
+    """Per-name aggregates with ROLLUP_KEYS and cache counts summed over each span's subtree."""
+    children: dict[str | None, list[dict]] = {}
+    for s in spans:
+        children.setdefault(s.get("parent"), []).append(s)
+
+    inclusive: dict[str, dict[str, float]] = {}
+
+    def rollup(s: dict) -> dict[str, float]:
+        # Recursive: span trees here are only a few levels deep.
+        if s["id"] in inclusive:
+            return inclusive[s["id"]]
+        attrs = s.get("attrs", {})
+        totals = {k: float(attrs.get(k) or 0) for k in ROLLUP_KEYS}
+        hit = _is_cache_hit(attrs)
+        totals["cache_hits"] = 1.0 if hit else 0.0
+        totals["cache_misses"] = 1.0 if hit is False else 0.0
+        totals["errors"] = 1.0 if s.get("status") == "error" else 0.0
+        for c in children.get(s["id"], []):
+            for k, v in rollup(c).items():
+                totals[k] += v
+        inclusive[s["id"]] = totals
+        return totals
+
+    by_name: dict[str, dict[str, Any]] = {}
+    durations: dict[str, list[float]] = {}
+    for s in spans:
+        agg = by_name.setdefault(s["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        agg["count"] += 1
+        agg["total_ms"] += s["ms"]
+        agg["max_ms"] = max(agg["max_ms"], s["ms"])
+        durations.setdefault(s["name"], []).append(s["ms"])
+        for k, v in rollup(s).items():
+            agg[k] = agg.get(k, 0.0) + v
+    for name, agg in by_name.items():
+        ms = sorted(durations[name])
+        agg["avg_ms"] = round(agg["total_ms"] / agg["count"], 1)
+        agg["p95_ms"] = round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 1)
+        agg["total_ms"] = round(agg["total_ms"], 1)
+        agg["cost_usd"] = round(agg["cost_usd"], 6)
+        for k in ("tokens_in", "tokens_out", "retries", "bytes", "queue_ms", "cache_hits", "cache_misses", "errors"):
+            agg[k] = int(agg[k])
+
+    roots = children.get(None, [])
+    totals = {k: 0.0 for k in (*ROLLUP_KEYS, "cache_hits", "cache_misses", "errors")}
+    for r in roots:
+        for k, v in rollup(r).items():
+            totals[k] += v
+    totals = {k: (round(v, 6) if k == "cost_usd" else int(v)) for k, v in totals.items()}
+    totals["wall_ms"] = round(sum(r["ms"] for r in roots), 1)
+
+    return {
+        "run_id": run_id,
+        "trace_id": trace_id,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "sessions": len(roots),
+        "totals": totals,
+        "by_name": dict(sorted(by_name.items(), key=lambda kv: -kv[1]["total_ms"])),
+        "spans": spans,
+    }
+
+
+# -----------------------
+# Cross-run report
+# -----------------------
+def _table(title: str, rows: list[list[Any]], header: list[str]) -> str:
+    cells = [header] + [[str(c) for c in r] for r in rows]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(header))]
+    lines = [title]
+    for i, r in enumerate(cells):
+        lines.append("  " + "  ".join(c.ljust(w) if j == 0 else c.rjust(w) for j, (c, w) in enumerate(zip(r, widths))))
+        if i == 0:
+            lines.append("  " + "  ".join("-" * w for w in widths))
+    return "\n".join(lines)
+
+
+def report(runs_dir: Path = DEFAULT_RUNS_DIR, top_n: int = 10) -> str:
+    """Aggregate runs/*/metrics.json: slowest and most expensive stages, operations and runs."""
+    runs = []
+    for path in sorted(Path(runs_dir).glob(f"*/{METRICS_FILENAME}")):
+        try:
+            runs.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    if not runs:
+        return f"No {METRICS_FILENAME} found under {runs_dir}"
+
+    names: dict[str, dict[str, Any]] = {}
+    for m in runs:
+        for name, agg in m.get("by_name", {}).items():
+            n = names.setdefault(name, {"runs": 0, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "cost_usd": 0.0,
+                                        "tokens_in": 0, "tokens_out": 0, "retries": 0, "per_run_ms": []})
+            n["runs"] += 1
+            n["count"] += agg["count"]
+            n["total_ms"] += agg["total_ms"]
+            n["max_ms"] = max(n["max_ms"], agg["max_ms"])
+            n["cost_usd"] += agg.get("cost_usd", 0.0)
+            n["tokens_in"] += agg.get("tokens_in", 0)
+            n["tokens_out"] += agg.get("tokens_out", 0)
+            n["retries"] += agg.get("retries", 0)
+            n["per_run_ms"].append(agg["total_ms"])
+
+    def rows(prefixes: tuple[str, ...], key: str) -> list[list[Any]]:
+        picked = [(k, v) for k, v in names.items() if k.startswith(prefixes)]
+        picked.sort(key=lambda kv: -kv[1][key])
+        return [
+            [k, v["runs"], v["count"], f"{v['total_ms'] / 1000:.1f}", f"{statistics.median(v['per_run_ms']) / 1000:.1f}",
+             f"{v['max_ms'] / 1000:.1f}", v["tokens_in"], v["tokens_out"], v["retries"], f"{v['cost_usd']:.4f}"]
+            for k, v in picked[:top_n]
+        ]
+
+    header = ["name", "runs", "spans", "total_s", "median_run_s", "max_span_s", "tokens_in", "tokens_out", "retries", "cost_usd"]
+    run_rows = sorted(runs, key=lambda m: -m.get("totals", {}).get("wall_ms", 0))[:top_n]
+    totals = [m.get("totals", {}) for m in runs]
+    out = [
+        f"{len(runs)} runs | wall {sum(t.get('wall_ms', 0) for t in totals) / 1000:.1f}s | "
+        f"cost ${sum(t.get('cost_usd', 0) for t in totals):.4f} | "
+        f"cache hits {sum(t.get('cache_hits', 0) for t in totals)} / misses {sum(t.get('cache_misses', 0) for t in totals)}",
+        "",
+        _table("Slowest stages (total time)", rows(("stage.",), "total_ms"), header),
+        "",
+        _table("Most expensive stages (cost, incl. children)", rows(("stage.",), "cost_usd"), header),
+        "",
+        _table("Slowest operations (LLM / Perplexity / HTTP)", rows(("llm.", "perplexity.", "http."), "total_ms"), header),
+        "",
+        _table(
+            "Slowest runs",
+            [[m.get("run_id"), m.get("sessions"), f"{m['totals'].get('wall_ms', 0) / 1000:.1f}", m["totals"].get("tokens_in", 0),
+              m["totals"].get("tokens_out", 0), f"{m['totals'].get('cost_usd', 0):.4f}"] for m in run_rows],
+            ["run_id", "sessions", "wall_s", "tokens_in", "tokens_out", "cost_usd"],
+        ),
+    ]
+    return "\n".join(out)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "report":
+        runs_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RUNS_DIR
+        print(report(runs_dir, int(sys.argv[3]) if len(sys.argv) > 3 else 10))
+    else:
+        print("Usage: python shared/telemetry.py report [runs_dir] [top_n]")
+        sys.exit(1)
@@ -0,0 +1,63 @@
+"""
+Tests for the cross-run source index.
+
+Run (from the tools root):
+    python -m pytest shared/test_source_index.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "market_research"))
+
+from research_context import ResearchContext  # noqa: E402
+from shared.source_index import SourceIndex  # noqa: E402
+
+QUESTION = "India quick commerce market size and growth"
+FACTS = [
+    ("India's quick commerce market reached $5 billion in gross order value.", ["https://a.com/report"]),
+    ("The India quick commerce market is growing at 70% a year.", ["https://b.com/x", "https://a.com/report"]),
+    ("Blinkit holds a 46% share of the India quick commerce market", ["https://c.com/blinkit"]),
+    ("Zepto's India quick commerce market growth came from 250 dark stores!", ["https://d.com/zepto"]),
+    ("India quick commerce market size is expected to hit $35 billion by 2030.", ["https://e.com/fc"]),
+]
+
+
+def test_answer_round_trips_through_research_context(tmp_path):
+    index = SourceIndex(tmp_path / "index.sqlite3")
+    for claim, urls in FACTS:
+        index.add_facts([(claim, [], urls)])
+    answer = index.answer(QUESTION, min_facts=5, min_coverage=0.5)
+    assert answer is not None
+
+    research = ResearchContext()
+    research.add_answer(answer.content, idx=1, question=QUESTION, citations=answer.citations)
+    findings = research.findings_for(1)
+
+    # One finding per fact (no header, no marker-only fragments), each keeping its sources.
+    assert sorted(f.claim for f in findings) == sorted(claim for claim, _ in FACTS)
+    urls_by_claim = {claim: urls for claim, urls in FACTS}
+    for f in findings:
+        assert sorted(f.citations) == sorted(urls_by_claim[f.claim])
+    assert set(research.cited_urls()) == {u for _, urls in FACTS for u in urls}
+
+
+def test_reused_answer_keeps_its_age_and_citation_count(tmp_path):
+    index = SourceIndex(tmp_path / "index.sqlite3")
+    researched_at = time.time() - 20 * 86400
+    index.add_sources(["https://a.com/report"], seen_at=researched_at)
+    index.add_facts([(FACTS[0][0], [], ["https://a.com/report"])], seen_at=researched_at)
+
+    # The same answer served from a cache in a later run.
+    index.add_sources(["https://a.com/report"], seen_at=researched_at, reused=True)
+    index.add_facts([(FACTS[0][0], [], ["https://a.com/report"])], seen_at=researched_at)
+
+    source = index.lookup("https://a.com/report")
+    assert source["citations"] == 1
+    assert source["last_seen"] == researched_at
+    assert index.known_facts(QUESTION, max_age_s=10 * 86400) == []
+
+    # A reused answer still records sources the index has not seen before.
+    index.add_sources(["https://new.com/a"], seen_at=researched_at, reused=True)
+    assert index.lookup("https://new.com/a")["citations"] == 1
@@ -20,22 +20,16 @@ import datetime as _dt
 import json
 import os
 import re
+import sys
 import textwrap
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-import requests
-
-# Gemini client compatibility:
-# - Preferred: google-genai (import path: from google import genai)
-# - Fallback: google-generativeai (import path: import google.generativeai as genai)
-try:
-    from google import genai as _genai  # type: ignore
-
-    _GEMINI_BACKEND = "google-genai"
-except Exception:
-    _GEMINI_BACKEND = "google-generativeai"
-    import google.generativeai as _genai_fallback  # type: ignore
+# Shared infrastructure (pooled HTTP client, Gemini client, ...) lives in ../shared
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from shared.feeds import fetch_feeds, iter_entries
+from shared.llm_client import get_llm_client
+from shared.providers import require_key
 
 
 INC42_RSS = "https://inc42.com/feed/"
@@ -110,50 +104,21 @@ def _strip_html(s: str) -> str:
     return s
 
 
-def _parse_rss_items(xml_text: str, source: str) -> List[Dict[str, str]]:
+def _parse_rss_items(xml_text: str, source: str, *, max_items: int | None = None) -> List[Dict[str, str]]:
     """
-    Minimal RSS parser that extracts title/link/pubDate/description.
-    Avoids extra dependencies (feedparser).
+    Extract title/link/pubDate/description with the shared incremental parser
+    (shared/feeds.py iter_entries; no feedparser dependency).
     """
-    import xml.etree.ElementTree as ET
-
-    # Normalize XML (some feeds include invalid control chars)
-    cleaned = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", xml_text)
-    root = ET.fromstring(cleaned)
-
-    # RSS2: channel/item
-    items = []
-    for item in root.findall(".//item"):
-        title = (item.findtext("title") or "").strip()
-        link = (item.findtext("link") or "").strip()
-        pub = (item.findtext("pubDate") or item.findtext("{http://purl.org/dc/elements/1.1/}date") or "").strip()
-        desc = (item.findtext("description") or "").strip()
-        # content:encoded (namespaced)
-        content = ""
-        for child in list(item):
-            if child.tag.endswith("}encoded"):
-                content = (child.text or "").strip()
-                break
-        excerpt = _strip_html(content or desc)[:320]
-
-        if not title or not link:
-            continue
-        items.append(
-            {
-                "title": title,
-                "url": link,
-                "date": pub or "",
-                "source": source,
-                "excerpt": excerpt,
-            }
-        )
-    return items
-
-
-def _fetch_rss(url: str) -> str:
-    r = requests.get(url, timeout=25, headers={"User-Agent": "6DegreesIdeaAgent/1.0"})
-    r.raise_for_status()
-    return r.text
+    return [
+        {
+            "title": e.title,
+            "url": e.link,
+            "date": e.published,
+            "source": source,
+            "excerpt": _strip_html(e.content or e.description)[:320],
+        }
+        for e in iter_entries(xml_text, max_items=max_items)
+    ]
 
 
 def _safe_json_parse(text: str) -> Optional[Dict[str, Any]]:
@@ -176,25 +141,13 @@ def _safe_json_parse(text: str) -> Optional[Dict[str, Any]]:
             return None
 
 
-def _gemini_generate(prompt: str, model_name: str, temperature: float = 0.4) -> str:
-    api_key = os.getenv("GEMINI_API_KEY", "").strip()
-    if not api_key:
-        raise RuntimeError("Missing GEMINI_API_KEY. Add it to your .env or environment variables.")
-
-    if _GEMINI_BACKEND == "google-genai":
-        client = _genai.Client(api_key=api_key)  # type: ignore[attr-defined]
-        resp = client.models.generate_content(  # type: ignore[attr-defined]
-            model=model_name,
-            contents=prompt,
-            config={"temperature": temperature},
-        )
-        return (resp.text or "").strip()
-
-    # Fallback: google-generativeai
-    _genai_fallback.configure(api_key=api_key)
-    model = _genai_fallback.GenerativeModel(model_name)
-    resp = model.generate_content(prompt, generation_config={"temperature": temperature})
-    return (getattr(resp, "text", "") or "").strip()
+def _gemini_generate(
+    prompt: str, model_name: str, temperature: float = 0.4, calls: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    text = get_llm_client(require_key("GEMINI_API_KEY")).generate(
+        prompt, model=model_name, temperature=temperature, label="idea_agent", calls=calls
+    )
+    return text.strip()
 
 
 def main() -> int:
@@ -213,14 +166,17 @@ def main() -> int:
     _ensure_dir(runs_dir)
 
     # Fetch + parse
-    inc42_xml = _fetch_rss(INC42_RSS)
-    entrackr_xml = _fetch_rss(ENTRACKR_RSS)
+    # Shared feed cache: feeds the prediction pipeline already pulled this period are not downloaded again.
+    feeds = fetch_feeds({"inc42": INC42_RSS, "entrackr": ENTRACKR_RSS}, user_agent="6DegreesIdeaAgent/1.0")
+    for feed in feeds.values():
+        if not feed.ok:
+            raise RuntimeError(f"Failed to fetch {feed.url}: {feed.error}")
+    inc42_xml, entrackr_xml = feeds["inc42"].text, feeds["entrackr"].text
     _write_text(runs_dir / "inc42_rss.xml", inc42_xml[:200000])  # cap
     _write_text(runs_dir / "entrackr_rss.xml", entrackr_xml[:200000])
 
-    items = _parse_rss_items(inc42_xml, "Inc42") + _parse_rss_items(entrackr_xml, "Entrackr")
     # newest-ish first: keep stable by list order (RSS is already recent-first usually)
-    items = items[: max(60, limit)]
+    items = _parse_rss_items(inc42_xml, "Inc42", max_items=limit) + _parse_rss_items(entrackr_xml, "Entrackr", max_items=limit)
     items = items[:limit]
 
     _write_json(runs_dir / "news_items.json", items)
@@ -266,8 +222,10 @@ def main() -> int:
 
     _write_text(runs_dir / "prompt.txt", prompt)
 
-    raw = _gemini_generate(prompt, model_name=model_name, temperature=0.4)
+    llm_calls: List[Dict[str, Any]] = []
+    raw = _gemini_generate(prompt, model_name=model_name, temperature=0.4, calls=llm_calls)
     _write_text(runs_dir / "gemini_raw.txt", raw)
+    _write_json(runs_dir / "llm_calls.json", llm_calls)
 
     ideas = _safe_json_parse(raw)
     if not ideas:
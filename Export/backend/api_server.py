@@ -14,11 +14,10 @@ from queue import Queue
 from add_custom_job import (
     classify_job_by_similarity,
     generate_job_details,
-    add_job_to_graph,
-    append_job_to_core_details,
-    append_embedding_to_store,
     generate_embedding_via_modal,
 )
+from job_commit import commit_new_job, recover
+from graph_stats import GraphStatsCache
 
 app = Flask(__name__)
 CORS(app)
@@ -33,6 +32,16 @@ queue_lock = threading.Lock()
 # Load the graph
 GRAPH_PATH = Path(__file__).parent.parent.parent / "version5" / "graphs" / "version2_optimized" / "job_graph_with_bridges.gpickle"
 
+# Finish any custom-job commit interrupted by a crash before loading the graph.
+# Unapplicable records are quarantined by recover(); anything else must not keep the server down.
+try:
+    replayed = recover(GRAPH_PATH)
+except Exception as e:
+    replayed = []
+    print(f"[WARN] Journal recovery failed, serving the graph as is (run: python job_commit.py fsck): {e}")
+if replayed:
+    print(f"Recovered {len(replayed)} interrupted job commits")
+
 print("Loading graph...")
 with open(GRAPH_PATH, 'rb') as f:
     G = pickle.load(f)
@@ -45,6 +54,18 @@ playable_nodes = list(main_component)
 print(f"Graph loaded: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
 print(f"Playable nodes: {len(playable_nodes)}")
 
+# Difficulty mapping to path lengths
+DIFFICULTY_RANGES = {
+    'easy': (3, 4),
+    'medium': (5, 7),
+    'hard': (8, 10),
+    'expert': (11, 15)
+}
+
+# Connectivity analytics, computed once per graph snapshot
+graph_stats_cache = GraphStatsCache(DIFFICULTY_RANGES)
+graph_stats_cache.refresh(G)
+
 
 def get_job_info(node_id):
     """Get job information for a node."""
@@ -59,15 +80,7 @@ def get_job_info(node_id):
 
 def generate_level(difficulty='medium'):
     """Generate a new level based on difficulty."""
-    # Difficulty mapping to path lengths
-    difficulty_ranges = {
-        'easy': (3, 4),
-        'medium': (5, 7),
-        'hard': (8, 10),
-        'expert': (11, 15)
-    }
-
-    min_steps, max_steps = difficulty_ranges.get(difficulty, (5, 7))
+    min_steps, max_steps = DIFFICULTY_RANGES.get(difficulty, (5, 7))
 
     # Find a valid path
     max_attempts = 100
@@ -220,6 +233,12 @@ def graph_info():
     })
 
 
+@app.route('/api/graph/stats', methods=['GET'])
+def graph_stats():
+    """Get connectivity analytics (cached per graph snapshot)."""
+    return jsonify(graph_stats_cache.get(G))
+
+
 @app.route('/api/jobs/all', methods=['GET'])
 def get_all_jobs():
     """Get all available jobs."""
@@ -284,16 +303,13 @@ def job_queue_worker():
 
             # Generate final embedding from the final description/skills/responsibilities (55% -> 60%)
             final_embedding = generate_embedding_via_modal(job_title, job_details)
-            # Persist to data stores
-            append_job_to_core_details(industry, sector, job_title, job_details)
-            append_embedding_to_store(industry, sector, job_title, job_details, final_embedding)
             job_processing_progress[job_id] = {'progress': 60, 'status': 'Adding to graph...'}
 
-            # Step 4: Add to graph (60% -> 80%)
+            # Step 4: Persist embedding, job store row and graph as one commit (60% -> 80%)
             # CRITICAL: This reads graph, modifies it, and writes it back
             # Queue ensures only ONE thread does this at a time!
             # Use the final embedding for similarity edges
-            result = add_job_to_graph(job_title, sector, industry, job_details, final_embedding, GRAPH_PATH)
+            result = commit_new_job(job_title, sector, industry, job_details, final_embedding, GRAPH_PATH)
             job_processing_progress[job_id] = {'progress': 80, 'status': 'Reloading graph...'}
 
             # Step 5: Reload graph in memory (80% -> 100%)
@@ -305,14 +321,17 @@ def job_queue_worker():
             main_component = max(components, key=len)
             playable_nodes = list(main_component)
 
+            # Recompute analytics here so requests keep serving the cached snapshot
+            graph_stats_cache.refresh(G)
+
             job_processing_progress[job_id] = {
                 'progress': 100,
-                'status': 'Complete!',
+                'status': 'Job already exists' if result.get('existing') else 'Complete!',
                 'job': {
                     'id': result['id'],
-                    'title': job_title,
-                    'sector': sector,
-                    'industry': industry
+                    'title': result['title'],
+                    'sector': result['sector'],
+                    'industry': result['industry']
                 }
             }
 
@@ -0,0 +1,155 @@
+"""
+Per-node top-k edge heaps for incremental graph updates.
+
+The similarity graph is built by connecting every job to its top-k most similar
+jobs (k=12, similarity >= 0.65). When a job is inserted later, existing nodes
+must be allowed to reconsider their own top-k lists, otherwise the graph drifts
+away from what a full rebuild would produce.
+
+Each node keeps a min-heap of its current top-k edge weights. All heaps live in
+two compact numpy arrays (one row per node), so checking whether a newcomer
+displaces a node's weakest edge is O(1) and replacing it is O(log k).
+
+The heap state is stored in G.graph['topk_heaps'] as plain numpy arrays so the
+gpickle stays loadable without importing this module.
+"""
+
+import numpy as np
+
+GRAPH_KEY = 'topk_heaps'
+EMPTY = -1
+
+
+def _edge_weight(data):
+    """Return the similarity weight of an edge, or None for non-similarity edges (bridges)."""
+    if data.get('bridge'):
+        return None
+    weight = data.get('weight', data.get('similarity'))
+    if weight is None:
+        return None
+    return float(weight)
+
+
+class TopKEdgeHeaps:
+    """
+    Compact array of per-node min-heaps over edge weights.
+
+    Row r holds the heap for node_ids[r]:
+      - weights[r, 0] is the weakest edge currently in that node's top-k
+      - nbrs[r, i] is the neighbour id for weights[r, i] (EMPTY for a free slot)
+    """
+
+    def __init__(self, k, node_ids, nbrs, weights):
+        self.k = int(k)
+        self.node_ids = node_ids
+        self.nbrs = nbrs
+        self.weights = weights
+        self.size = len(node_ids)
+        self.row_of = {int(n): i for i, n in enumerate(node_ids[:self.size])}
+
+    @classmethod
+    def build(cls, G, k):
+        """Build heaps from the current graph (one-time O(E) scan)."""
+        nodes = list(G.nodes())
+        n = len(nodes)
+        node_ids = np.array([int(x) for x in nodes], dtype=np.int64)
+        nbrs = np.full((n, k), EMPTY, dtype=np.int64)
+        weights = np.full((n, k), -np.inf, dtype=np.float32)
+
+        for row, node in enumerate(nodes):
+            edges = []
+            for other, data in G[node].items():
+                w = _edge_weight(data)
+                if w is not None:
+                    edges.append((w, int(other)))
+            edges.sort(reverse=True)
+            top = edges[:k]
+            # An ascending array is a valid min-heap; free slots (-inf) sort first.
+            top.reverse()
+            offset = k - len(top)
+            for i, (w, other) in enumerate(top):
+                nbrs[row, offset + i] = other
+                weights[row, offset + i] = w
+
+        return cls(k, node_ids, nbrs, weights)
+
+    @classmethod
+    def from_graph(cls, G, k):
+        """Load heaps stored on the graph, building them if missing or stale."""
+        state = G.graph.get(GRAPH_KEY)
+        if state is not None and int(state['k']) == k and int(state['size']) == G.number_of_nodes():
+            return cls(k, state['node_ids'], state['nbrs'], state['weights'])
+        return cls.build(G, k)
+
+    def save_to_graph(self, G):
+        G.graph[GRAPH_KEY] = {
+            'k': self.k,
+            'size': self.size,
+            'node_ids': self.node_ids[:self.size],
+            'nbrs': self.nbrs[:self.size],
+            'weights': self.weights[:self.size],
+        }
+
+    def add_node(self, node_id, edges):
+        """Append a heap row for a new node from (neighbour, weight) pairs."""
+        if self.size == len(self.node_ids):
+            # Grow geometrically so repeated inserts stay amortized O(k).
+            cap = max(16, self.size * 2)
+            self.node_ids = np.resize(self.node_ids, cap)
+            self.nbrs = np.vstack([self.nbrs, np.full((cap - self.size, self.k), EMPTY, dtype=np.int64)])
+            self.weights = np.vstack([self.weights, np.full((cap - self.size, self.k), -np.inf, dtype=np.float32)])
+
+        row = self.size
+        self.node_ids[row] = int(node_id)
+        self.nbrs[row, :] = EMPTY
+        self.weights[row, :] = -np.inf
+        top = sorted(((float(w), int(n)) for n, w in edges), reverse=True)[:self.k]
+        top.reverse()
+        offset = self.k - len(top)
+        for i, (w, other) in enumerate(top):
+            self.nbrs[row, offset + i] = other
+            self.weights[row, offset + i] = w
+        self.row_of[int(node_id)] = row
+        self.size += 1
+
+    def min_weight(self, node_id):
+        return float(self.weights[self.row_of[int(node_id)], 0])
+
+    def contains(self, node_id, other):
+        return bool(np.any(self.nbrs[self.row_of[int(node_id)]] == int(other)))
+
+    def offer(self, node_id, other, weight):
+        """
+        Offer edge (node_id, other, weight) to node_id's top-k.
+
+        Returns (accepted, evicted_neighbour). evicted_neighbour is EMPTY when a
+        free slot was used or the offer was rejected.
+        """
+        row = self.row_of[int(node_id)]
+        w_row = self.weights[row]
+        n_row = self.nbrs[row]
+        if weight <= w_row[0]:
+            return False, EMPTY
+
+        evicted = int(n_row[0])
+        w_row[0] = weight
+        n_row[0] = int(other)
+
+        # Sift the new root down to restore the min-heap property.
+        i = 0
+        k = self.k
+        while True:
+            left = 2 * i + 1
+            if left >= k:
+                break
+            child = left
+            right = left + 1
+            if right < k and w_row[right] < w_row[left]:
+                child = right
+            if w_row[child] >= w_row[i]:
+                break
+            w_row[i], w_row[child] = w_row[child], w_row[i]
+            n_row[i], n_row[child] = n_row[child], n_row[i]
+            i = child
+
+        return True, evicted
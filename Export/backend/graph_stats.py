@@ -0,0 +1,171 @@
+"""
+Graph-quality and connectivity analytics for the job graph.
+
+Computed once per graph snapshot and cached, so /api/graph/stats never
+recomputes on a request. All-pairs hop distances use a multi-source BFS over
+CSR arrays: 64 BFS sources are packed into the bits of one uint64 per node, so
+each BFS level for 64 sources is a single vectorized gather + OR-reduce.
+
+Reported:
+- diameter (of the main/playable component) and the hop-distance histogram
+- how many start/target pairs exist in each difficulty band
+- degree distribution
+- isolated jobs (degree 0; the built graph has none, so these are inserted
+  jobs that found no neighbour above the similarity threshold)
+- cross-sector edge counts per sector pair (all edges joining two sectors,
+  not only the bridge edges the graph build added)
+"""
+
+import threading
+import time
+from collections import Counter
+
+import networkx as nx
+import numpy as np
+
+# Byte popcount lookup (np.bitwise_count needs numpy >= 2.0)
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def build_csr(G):
+    """Return (node_ids, indptr, indices) for an undirected graph."""
+    node_ids = list(G.nodes())
+    index_of = {n: i for i, n in enumerate(node_ids)}
+    degrees = np.fromiter((G.degree(n) for n in node_ids), dtype=np.int64, count=len(node_ids))
+    indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    indices = np.empty(indptr[-1], dtype=np.int64)
+    for i, n in enumerate(node_ids):
+        start = indptr[i]
+        for j, nbr in enumerate(G[n]):
+            indices[start + j] = index_of[nbr]
+    return node_ids, indptr, indices
+
+
+def _popcount(words):
+    return int(_POPCOUNT8[words.view(np.uint8)].sum())
+
+
+def hop_distance_histogram(indptr, indices, sources):
+    """
+    Multi-source BFS from every node in `sources` (CSR row indices).
+
+    Returns (hist, eccentricity): hist[d] is the number of (source, target)
+    pairs at exactly d hops; eccentricity[i] is the largest distance reached
+    from sources[i].
+    """
+    n = len(indptr) - 1
+    sources = np.asarray(sources, dtype=np.int64)
+    has_nbrs = indptr[1:] > indptr[:-1]
+    starts = indptr[:-1][has_nbrs]
+    hist = Counter()
+    eccentricity = np.zeros(len(sources), dtype=np.int64)
+
+    for batch_start in range(0, len(sources), 64):
+        batch = sources[batch_start:batch_start + 64]
+        bits = np.left_shift(np.uint64(1), np.arange(len(batch), dtype=np.uint64))
+        visited = np.zeros(n, dtype=np.uint64)
+        np.bitwise_or.at(visited, batch, bits)
+        frontier = visited.copy()
+
+        level = 0
+        while True:
+            level += 1
+            reached = np.zeros(n, dtype=np.uint64)
+            if len(starts):
+                reached[has_nbrs] = np.bitwise_or.reduceat(frontier[indices], starts)
+            new = reached & ~visited
+            if not new.any():
+                break
+            hist[level] += _popcount(new)
+            # Every source whose bit appears at this level has eccentricity >= level
+            level_bits = int(np.bitwise_or.reduce(new))
+            for b in range(len(batch)):
+                if level_bits >> b & 1:
+                    eccentricity[batch_start + b] = level
+            visited |= new
+            frontier = new
+
+    max_d = max(hist) if hist else 0
+    return np.array([hist.get(d, 0) for d in range(max_d + 1)], dtype=np.int64), eccentricity
+
+
+def compute_graph_stats(G, difficulty_ranges):
+    """Compute the full analytics payload for one graph snapshot."""
+    t0 = time.perf_counter()
+    node_ids, indptr, indices = build_csr(G)
+    degrees = np.diff(indptr)
+
+    components = list(nx.connected_components(G))
+    main_component = max(components, key=len) if components else set()
+    index_of = {n: i for i, n in enumerate(node_ids)}
+    main_rows = np.array(sorted(index_of[n] for n in main_component), dtype=np.int64)
+
+    hist, ecc = hop_distance_histogram(indptr, indices, main_rows)
+    # Ordered pairs -> unordered start/target pairs
+    pair_hist = (hist // 2).tolist()
+
+    bands = {}
+    for name, (lo, hi) in difficulty_ranges.items():
+        pairs = int(sum(pair_hist[lo:hi + 1]))
+        bands[name] = {'minSteps': lo, 'maxSteps': hi, 'pairs': pairs, 'possible': pairs > 0}
+
+    degree_counts = np.bincount(degrees) if len(degrees) else np.zeros(0, dtype=np.int64)
+    isolated = [int(node_ids[i]) for i in np.flatnonzero(degrees == 0)]
+
+    sector_pairs = Counter()
+    for u, v in G.edges():
+        su = G.nodes[u].get('sector_name', '')
+        sv = G.nodes[v].get('sector_name', '')
+        if su != sv:
+            sector_pairs[tuple(sorted((su, sv)))] += 1
+
+    return {
+        'totalNodes': G.number_of_nodes(),
+        'totalEdges': G.number_of_edges(),
+        'components': len(components),
+        'playableNodes': len(main_component),
+        'outsideMainComponent': G.number_of_nodes() - len(main_component),
+        'diameter': int(ecc.max()) if len(ecc) else 0,
+        'hopDistanceHistogram': {str(d): int(c) for d, c in enumerate(pair_hist) if d > 0},
+        'difficultyBands': bands,
+        'degree': {
+            'min': int(degrees.min()) if len(degrees) else 0,
+            'max': int(degrees.max()) if len(degrees) else 0,
+            'mean': round(float(degrees.mean()), 2) if len(degrees) else 0.0,
+            'median': float(np.median(degrees)) if len(degrees) else 0.0,
+            'distribution': {str(d): int(c) for d, c in enumerate(degree_counts) if c},
+        },
+        'isolatedJobs': len(isolated),
+        'isolatedJobIds': isolated,
+        'crossSectorEdges': [
+            {'sectors': list(pair), 'edges': count} for pair, count in sector_pairs.most_common()
+        ],
+        'computeMs': int((time.perf_counter() - t0) * 1000),
+    }
+
+
+class GraphStatsCache:
+    """Holds the stats for the current graph snapshot; recomputes only when the snapshot changes."""
+
+    def __init__(self, difficulty_ranges):
+        self.difficulty_ranges = difficulty_ranges
+        self._lock = threading.Lock()
+        self._key = None
+        self._stats = None
+
+    @staticmethod
+    def _snapshot_key(G):
+        return (id(G), G.number_of_nodes(), G.number_of_edges())
+
+    def get(self, G):
+        key = self._snapshot_key(G)
+        with self._lock:
+            if self._key != key:
+                self._stats = compute_graph_stats(G, self.difficulty_ranges)
+                self._key = key
+            return self._stats
+
+    def refresh(self, G):
+        """Compute stats for a new snapshot ahead of the next request."""
+        return self.get(G)
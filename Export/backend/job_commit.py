@@ -0,0 +1,386 @@
+"""
+Crash-safe commit of a new job across the embedding NPZ, the job store and the graph.
+
+A custom job touches three stores (core_jobs_with_embeddings.npz, the SQLite job
+store and the graph gpickle). Writing them one after another means a crash in
+the middle leaves them disagreeing, e.g. an embedding_index pointing at the wrong
+row. This module makes the three writes one commit unit:
+
+1. A write-ahead record (node id, embedding index, job fields, embedding) is
+   written to journal/<txid>.json with fsync + atomic rename. Once it exists,
+   the job is committed.
+2. Each store is updated with an idempotent step; files are replaced atomically
+   (write to temp, fsync, os.replace), so a reader only ever sees old or new.
+3. The journal record is deleted once all three steps are durable.
+
+After a crash, recover() replays pending records instead of rebuilding.
+A record that fails to apply (e.g. its embedding row or graph node already
+holds a different job) is moved to journal/failed/ with the error, so one bad
+record cannot block every later startup and commit. Move it back into
+journal/ once fixed to replay it.
+fsck() checks that node ids, embedding indices and row counts agree, and
+reports quarantined records.
+
+Usage:
+    python job_commit.py fsck
+    python job_commit.py recover
+"""
+
+import json
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from job_manager import (
+    GRAPH_PATH,
+    DATA_DIR,
+    EMB_NPZ_PATH,
+    insert_job_node,
+    load_naics_industries,
+)
+from job_store import get_store
+
+JOURNAL_DIR = DATA_DIR / "journal"
+FAILED_DIRNAME = "failed"  # quarantine for records that cannot be applied, under JOURNAL_DIR
+
+# Serializes commits within the process (the API queue worker is the only writer).
+_commit_lock = threading.Lock()
+
+
+def _fsync_dir(path):
+    # Persist the rename itself. Not supported on Windows; there os.replace is the best we get.
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path, write_fn):
+    """Write a file via temp file + fsync + os.replace so readers never see a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    _fsync_dir(path.parent)
+
+
+def _load_graph(graph_path):
+    with open(graph_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _npz_row_count():
+    if not EMB_NPZ_PATH.exists():
+        return 0
+    with np.load(EMB_NPZ_PATH) as data:
+        return int(data['embeddings'].shape[0])
+
+
+# -----------------------
+# Write-ahead journal
+# -----------------------
+def _write_record(record):
+    path = JOURNAL_DIR / f"{record['txid']}.json"
+    _atomic_write(path, lambda f: f.write(json.dumps(record).encode('utf-8')))
+    return path
+
+
+def _quarantine(record_path, record, error):
+    """Move a record that failed to apply to journal/failed/, keeping the error with it."""
+    failed_path = JOURNAL_DIR / FAILED_DIRNAME / record_path.name
+    failed = dict(record, error=f"{type(error).__name__}: {error}", failed_at=time.time())
+    _atomic_write(failed_path, lambda f: f.write(json.dumps(failed).encode('utf-8')))
+    record_path.unlink()
+    _fsync_dir(record_path.parent)
+    print(f"[Recover] Quarantined {record['txid']} ({record['job_title']!r}) to {failed_path}: {failed['error']}")
+
+
+def _quarantined_records():
+    failed_dir = JOURNAL_DIR / FAILED_DIRNAME
+    if not failed_dir.exists():
+        return []
+    records = []
+    for path in sorted(failed_dir.glob("*.json")):
+        with open(path, encoding='utf-8') as f:
+            records.append(json.load(f))
+    return records
+
+
+def _pending_records():
+    if not JOURNAL_DIR.exists():
+        return []
+    records = []
+    for path in sorted(JOURNAL_DIR.glob("*.json")):
+        with open(path, encoding='utf-8') as f:
+            records.append((path, json.load(f)))
+    # Replay in commit order.
+    records.sort(key=lambda item: item[1]['embedding_index'])
+    return records
+
+
+# -----------------------
+# Idempotent apply steps
+# -----------------------
+def _apply_embedding(record):
+    emb = np.asarray(record['embedding'], dtype=np.float32).reshape(1, -1)
+    index = record['embedding_index']
+
+    if EMB_NPZ_PATH.exists():
+        with np.load(EMB_NPZ_PATH) as data:
+            existing = data['embeddings']
+    else:
+        existing = np.zeros((0, emb.shape[1]), dtype=np.float32)
+
+    if existing.shape[0] > index:
+        if not np.allclose(existing[index], emb[0], atol=1e-6):
+            raise RuntimeError(f"Embedding row {index} already holds a different vector")
+        return  # already applied
+    if existing.shape[0] < index:
+        raise RuntimeError(f"Embedding store has {existing.shape[0]} rows, expected {index} before commit")
+
+    combined = np.vstack([existing, emb]) if existing.size else emb
+    _atomic_write(EMB_NPZ_PATH, lambda f: np.savez_compressed(f, embeddings=combined))
+
+
+def _apply_store(record):
+    job = record['job_details']
+    get_store().append_job({
+        'industry_code': record['naics_code'],
+        'industry_name': record['industry'],
+        'sector_name': record['sector'],
+        'job_title': record['job_title'],
+        'job_description': job.get('job_description', ''),
+        'key_skills': job.get('key_skills', ''),
+        'responsibilities': job.get('responsibilities', ''),
+        'embedding_index': record['embedding_index'],
+        'node_id': record['node_id'],
+    })
+
+
+def _apply_graph(record, graph_path):
+    G = _load_graph(graph_path)
+    node_id = record['node_id']
+    if node_id in G:
+        if G.nodes[node_id].get('job_title') != record['job_title']:
+            raise RuntimeError(f"Graph node {node_id} already holds a different job")
+        return G  # already applied
+
+    insert_job_node(
+        G, node_id, record['job_title'], record['sector'], record['industry'],
+        record['job_details'], np.asarray(record['embedding'], dtype=np.float32),
+        embedding_index=record['embedding_index'],
+    )
+
+    backup_path = graph_path.parent / f"job_graph_backup_{node_id - 1}.gpickle"
+    shutil.copy2(graph_path, backup_path)
+    _atomic_write(graph_path, lambda f: pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL))
+    return G
+
+
+def _apply(record_path, record, graph_path):
+    _apply_embedding(record)
+    _apply_store(record)
+    G = _apply_graph(record, graph_path)
+    record_path.unlink()
+    _fsync_dir(record_path.parent)
+    return G
+
+
+def _existing_job_summary(G, row):
+    node_id = row['node_id']
+    if node_id is None:  # rows imported from the CSVs carry no node id
+        node_id = next(
+            (n for n, data in G.nodes(data=True)
+             if data.get('job_title', '').lower() == row['job_title'].lower()
+             and data.get('industry_name') == row['industry_name']),
+            None,
+        )
+    if node_id is None or node_id not in G:
+        raise RuntimeError(f"Job {row['job_title']!r} ({row['industry_name']}) is in the job store but not in the graph")
+    print(f"[Commit] {row['job_title']!r} already exists in {row['industry_name']!r} | node_id={node_id}")
+    return {
+        'id': node_id,
+        'title': G.nodes[node_id]['job_title'],
+        'sector': G.nodes[node_id].get('sector_name', row['sector_name']),
+        'industry': row['industry_name'],
+        'connections': len(list(G.neighbors(node_id))),
+        'existing': True,
+    }
+
+
+# -----------------------
+# Public API
+# -----------------------
+def commit_new_job(job_title, sector, industry, job_details, embedding, graph_path=GRAPH_PATH):
+    """
+    Persist a new job to the embedding NPZ, job store and graph as one commit unit.
+    Returns the same summary dict as add_job_to_graph. If the store already holds a job
+    with this title (case-insensitive) and industry, nothing is written and that job's
+    summary is returned with existing=True.
+    """
+    graph_path = Path(graph_path)
+    with _commit_lock:
+        # Finish any interrupted commit first so ids are allocated from a consistent state.
+        recover(graph_path)
+
+        G = _load_graph(graph_path)
+
+        # The store is keyed by (title, industry): committing the same job again would
+        # orphan the first commit's embedding row and graph node, so hand that job back.
+        existing = get_store().get_job(job_title, industry)
+        if existing is not None:
+            return _existing_job_summary(G, existing)
+
+        node_id = int(max(G.nodes())) + 1
+        embedding_index = _npz_row_count()
+        naics_code = load_naics_industries().get(industry, {}).get('code', '')
+
+        record = {
+            'txid': f"{embedding_index:08d}_{uuid.uuid4().hex[:8]}",
+            'node_id': node_id,
+            'embedding_index': embedding_index,
+            'job_title': job_title,
+            'sector': sector,
+            'industry': industry,
+            'naics_code': naics_code,
+            'job_details': {
+                'job_description': job_details['job_description'],
+                'key_skills': job_details['key_skills'],
+                'responsibilities': job_details['responsibilities'],
+            },
+            'embedding': np.asarray(embedding, dtype=np.float32).ravel().tolist(),
+        }
+        record_path = _write_record(record)
+        print(f"[Commit] Journaled {job_title!r} | node_id={node_id} | embedding_index={embedding_index}")
+
+        G = _apply(record_path, record, graph_path)
+        print(f"[Commit] Committed {job_title!r} | graph={G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+
+        return {
+            'id': node_id,
+            'title': job_title,
+            'sector': sector,
+            'industry': industry,
+            'connections': len(list(G.neighbors(node_id))),
+        }
+
+
+def recover(graph_path=GRAPH_PATH):
+    """
+    Replay journal records left behind by an interrupted commit. Returns replayed txids.
+    Records that fail to apply are quarantined (see _quarantine) rather than raised.
+    """
+    graph_path = Path(graph_path)
+    replayed = []
+    for record_path, record in _pending_records():
+        print(f"[Recover] Replaying {record['txid']} ({record['job_title']!r})")
+        try:
+            _apply(record_path, record, graph_path)
+        except Exception as e:
+            _quarantine(record_path, record, e)
+            continue
+        replayed.append(record['txid'])
+    return replayed
+
+
+def fsck(graph_path=GRAPH_PATH):
+    """
+    Verify the graph, job store and embedding NPZ agree.
+
+    Checks:
+    - the store's embedding_index values are exactly 0..N-1 where N is the NPZ row count
+    - every store row with a node_id exists in the graph with the same job title
+    - every graph node carrying an embedding_index matches the store row for that index
+    - no journal records are pending or quarantined
+    """
+    graph_path = Path(graph_path)
+    errors = []
+    G = _load_graph(graph_path)
+    npz_rows = _npz_row_count()
+    store = get_store()
+
+    by_index = {}
+    store_rows = 0
+    for row in store.iter_jobs():
+        store_rows += 1
+        idx = row['embedding_index']
+        if idx is not None:
+            by_index[idx] = row
+            if not 0 <= idx < npz_rows:
+                errors.append(f"store row {row['id']} ({row['job_title']!r}): embedding_index {idx} out of range (npz rows={npz_rows})")
+        node_id = row['node_id']
+        if node_id is not None:
+            if node_id not in G:
+                errors.append(f"store row {row['id']} ({row['job_title']!r}): node {node_id} missing from graph")
+            elif G.nodes[node_id].get('job_title') != row['job_title']:
+                errors.append(f"store row {row['id']}: node {node_id} title {G.nodes[node_id].get('job_title')!r} != {row['job_title']!r}")
+
+    missing = [i for i in range(npz_rows) if i not in by_index]
+    if missing:
+        errors.append(f"{len(missing)} embedding rows have no store row (first: {missing[:5]})")
+
+    for node_id, data in G.nodes(data=True):
+        idx = data.get('embedding_index')
+        if idx is None:
+            continue
+        row = by_index.get(idx)
+        if row is None:
+            errors.append(f"graph node {node_id}: embedding_index {idx} not in store")
+        elif row['node_id'] != node_id or row['job_title'] != data.get('job_title'):
+            errors.append(f"graph node {node_id}: embedding_index {idx} belongs to store row {row['id']} ({row['job_title']!r})")
+
+    pending = [record['txid'] for _, record in _pending_records()]
+    if pending:
+        errors.append(f"{len(pending)} pending journal records (run recover): {pending}")
+
+    quarantined = [{'txid': r['txid'], 'job_title': r['job_title'], 'error': r.get('error')} for r in _quarantined_records()]
+    for r in quarantined:
+        errors.append(f"quarantined journal record {r['txid']} ({r['job_title']!r}) in {FAILED_DIRNAME}/: {r['error']}")
+
+    return {
+        'ok': not errors,
+        'graph_nodes': G.number_of_nodes(),
+        'store_rows': store_rows,
+        'embedding_rows': npz_rows,
+        'pending': pending,
+        'quarantined': quarantined,
+        'errors': errors,
+    }
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'fsck':
+        report = fsck()
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report['ok'] else 1)
+    elif command == 'recover':
+        replayed = recover()
+        print(f"[OK] Replayed {len(replayed)} journal records")
+        quarantined = _quarantined_records()
+        if quarantined:
+            print(f"[WARN] {len(quarantined)} records quarantined in {JOURNAL_DIR / FAILED_DIRNAME}")
+    else:
+        print("Usage: python job_commit.py [fsck|recover]")
+        sys.exit(1)
@@ -18,7 +18,10 @@ import numpy as np
 import os
 import sys
 import json
-import csv
+import functools
+
+from edge_heaps import TopKEdgeHeaps, EMPTY
+from job_store import get_store, read_naics_csv
 
 # Add version5/scripts to path to import Modal embedding generator
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "version5" / "scripts"))
@@ -35,23 +38,29 @@ DETAILS_CSV_PATH = DATA_DIR / "core_jobs_with_details.csv"
 EMB_NPZ_PATH = DATA_DIR / "core_jobs_with_embeddings.npz"
 EMB_CSV_PATH = DATA_DIR / "core_jobs_with_embeddings.csv"
 
+# Embedding backend: "modal" (GPU, default) or "onnx" (local int8 model, CPU-only boxes)
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'modal').strip().lower()
+
+# Graph construction parameters (must match the version2 build)
+TOP_K = 12
+SIMILARITY_THRESHOLD = 0.65
+
 
+@functools.lru_cache(maxsize=1)
 def load_naics_industries():
-    """Load NAICS industry classifications from CSV."""
-    import pandas as pd
+    """
+    Load NAICS industry classifications (memoized: read once per process).
+    Returns mapping of industry_name -> {'sector': ..., 'code': ...}.
+    """
     try:
-        df = pd.read_csv(NAICS_PATH)
-        # Create mapping of industry_name to sector_name
-        industries = {}
-        for _, row in df.iterrows():
-            industries[row['industry_name']] = {
-                'sector': row['sector_name'],
-                'code': row['naics_code']
-            }
-        return industries
+        return read_naics_csv(NAICS_PATH)
     except Exception as e:
-        print(f"Could not load NAICS data: {e}")
-        return {}
+        print(f"Could not load NAICS data from CSV, using job store: {e}")
+        try:
+            return get_store().naics_map()
+        except Exception as e:
+            print(f"Could not load NAICS data: {e}")
+            return {}
 
 
 def generate_job_details(job_title, industry_name="Unknown Industry", sector_name="Unknown Sector"):
@@ -128,6 +137,10 @@ def generate_embedding_via_modal(job_title, job_data):
     Generate embedding using Modal (GPU-accelerated).
     Combines job_title + job_description + key_skills + responsibilities.
 
+    With EMBEDDING_BACKEND=onnx, skips Modal and uses the local int8 ONNX model
+    (see onnx_embeddings.py). If Modal fails, the ONNX model is tried before
+    falling back to full-precision sentence-transformers.
+
     Args:
         job_title: Title of the job
         job_data: dict with job_description, key_skills, responsibilities
@@ -135,14 +148,18 @@ def generate_embedding_via_modal(job_title, job_data):
     Returns:
         numpy array of embedding
     """
+    # Combine text fields (INCLUDING job_title for better semantic matching)
+    combined_text = f"{job_title} | {job_data['job_description']} | {job_data['key_skills']} | {job_data['responsibilities']}"
+
+    if EMBEDDING_BACKEND == 'onnx':
+        from onnx_embeddings import get_onnx_embedder
+        return get_onnx_embedder().embed([combined_text])[0]
+
     try:
         # Try to use Modal
         import modal
         import modal_embeddings
 
-        # Combine text fields (INCLUDING job_title for better semantic matching)
-        combined_text = f"{job_title} | {job_data['job_description']} | {job_data['key_skills']} | {job_data['responsibilities']}"
-
         # Generate embedding via Modal
         with modal_embeddings.app.run():
             generator = modal_embeddings.EmbeddingGenerator()
@@ -151,14 +168,22 @@ def generate_embedding_via_modal(job_title, job_data):
         return np.array(embeddings[0])
     except Exception as e:
         print(f"Modal not available, using local generation: {e}")
+        try:
+            from onnx_embeddings import get_onnx_embedder
+            return get_onnx_embedder().embed([combined_text])[0]
+        except Exception as e:
+            print(f"ONNX backend not available: {e}")
         # Fallback: use sentence-transformers locally
         try:
-            from sentence_transformers import SentenceTransformer
-            model = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
-            combined_text = f"{job_title} | {job_data['job_description']} | {job_data['key_skills']} | {job_data['responsibilities']}"
-            return model.encode(combined_text)
+            return _load_sentence_transformer().encode(combined_text)
         except:
-            raise Exception("Neither Modal nor sentence-transformers available")
+            raise Exception("Neither Modal, ONNX nor sentence-transformers available")
+
+
+@functools.lru_cache(maxsize=1)
+def _load_sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
 
 
 def classify_job_by_similarity(job_title, job_details, graph):
@@ -214,39 +239,22 @@ def classify_job_by_similarity(job_title, job_details, graph):
 
 def append_job_to_core_details(industry_name, sector_name, job_title, job_details):
     """
-    Append the new job to core_jobs_with_details.csv as the source of truth.
+    Record the new job in the job store (source of truth for job metadata).
     Columns: industry_code, industry_name, sector_name, job_title, job_description, key_skills, responsibilities
+    core_jobs_with_details.csv is regenerated with `python job_store.py export`.
     """
     try:
         industries = load_naics_industries()
         naics_code = industries.get(industry_name, {}).get('code', '')
-
-        DETAILS_CSV_PATH.parent.mkdir(parents=True, exist_ok=True)
-        file_exists = DETAILS_CSV_PATH.exists()
-        with open(DETAILS_CSV_PATH, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow([
-                    'industry_code', 'industry_name', 'sector_name', 'job_title',
-                    'job_description', 'key_skills', 'responsibilities'
-                ])
-            writer.writerow([
-                naics_code,
-                industry_name,
-                sector_name,
-                job_title,
-                job_details.get('job_description', ''),
-                job_details.get('key_skills', ''),
-                job_details.get('responsibilities', '')
-            ])
-        print(f"[OK] Appended to {DETAILS_CSV_PATH.name}: {job_title}")
+        get_store().append_job(_job_row(naics_code, industry_name, sector_name, job_title, job_details))
+        print(f"[OK] Recorded in job store: {job_title}")
     except Exception as e:
-        print(f"[WARN] Could not append to core_jobs_with_details.csv: {e}")
+        print(f"[WARN] Could not record job in job store: {e}")
 
 
 def append_embedding_to_store(industry_name, sector_name, job_title, job_details, embedding: np.ndarray) -> int:
     """
-    Append embedding to NPZ store and metadata CSV and return embedding_index.
+    Append embedding to NPZ store, record its embedding_index in the job store and return it.
     """
     try:
         emb = np.array(embedding, dtype=np.float32)
@@ -267,24 +275,9 @@ def append_embedding_to_store(industry_name, sector_name, job_title, job_details
 
         industries = load_naics_industries()
         naics_code = industries.get(industry_name, {}).get('code', '')
-        file_exists = EMB_CSV_PATH.exists()
-        with open(EMB_CSV_PATH, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow([
-                    'industry_code', 'industry_name', 'sector_name', 'job_title',
-                    'job_description', 'key_skills', 'responsibilities', 'embedding_index'
-                ])
-            writer.writerow([
-                naics_code,
-                industry_name,
-                sector_name,
-                job_title,
-                job_details.get('job_description', ''),
-                job_details.get('key_skills', ''),
-                job_details.get('responsibilities', ''),
-                new_index
-            ])
+        row = _job_row(naics_code, industry_name, sector_name, job_title, job_details)
+        row['embedding_index'] = new_index
+        get_store().append_job(row)
         print(f"[OK] Updated embeddings store: index {new_index} for {job_title}")
         return int(new_index)
     except Exception as e:
@@ -292,6 +285,18 @@ def append_embedding_to_store(industry_name, sector_name, job_title, job_details
         return -1
 
 
+def _job_row(naics_code, industry_name, sector_name, job_title, job_details):
+    return {
+        'industry_code': naics_code,
+        'industry_name': industry_name,
+        'sector_name': sector_name,
+        'job_title': job_title,
+        'job_description': job_details.get('job_description', ''),
+        'key_skills': job_details.get('key_skills', ''),
+        'responsibilities': job_details.get('responsibilities', ''),
+    }
+
+
 def add_job_to_graph(job_title, sector, industry, job_details, embedding, graph_path=GRAPH_PATH):
     """
     Add a new job to the graph with proper embedding and connections.
@@ -301,18 +306,23 @@ def add_job_to_graph(job_title, sector, industry, job_details, embedding, graph_
     2. Adds ONE new node with all job fields + embedding
     3. Compares new embedding with ALL existing embeddings
     4. Creates edges to top-12 most similar jobs (similarity >= 0.65)
-    5. Saves UPDATED graph back to disk (overwrites pickle file)
-    6. Creates backup of previous graph version
+    5. Lets existing nodes reconsider their own top-12: if the new job beats a
+       node's weakest edge, it takes that slot (reverse-edge refresh)
+    6. Saves UPDATED graph back to disk (overwrites pickle file)
+    7. Creates backup of previous graph version
 
     NOTE:
     - No bridge logic is applied. If a job has no similar neighbors above the
       threshold, it will remain isolated and may not appear in UI lists that
       only include the main component.
+    - Each node's top-12 is tracked in a per-node min-heap (see edge_heaps.py),
+      stored on the graph. An edge displaced from a node's top-12 is removed
+      only if the other endpoint does not also keep it in its own top-12, which
+      matches what a full rebuild would produce.
 
     WHAT THIS DOES NOT DO:
     - Does NOT regenerate any existing embeddings
     - Does NOT rebuild entire graph from scratch
-    - Does NOT modify existing nodes or edges
     - Does NOT add bridges
 
     Args:
@@ -333,6 +343,38 @@ def add_job_to_graph(job_title, sector, industry, job_details, embedding, graph_
     new_id = max_id + 1
 
     print(f"Using pre-computed embedding for '{job_title}'...")
+    insert_job_node(G, new_id, job_title, sector, industry, job_details, embedding)
+
+    # Save updated graph (with backup)
+    print(f"Saving updated graph...")
+    # Create backup before modifying
+    backup_path = graph_path.parent / f"job_graph_backup_{max_id}.gpickle"
+    import shutil
+    shutil.copy2(graph_path, backup_path)
+    print(f"  Backup saved: {backup_path.name}")
+
+    # Save new graph (ONLY the graph file is regenerated, not embeddings)
+    with open(graph_path, 'wb') as f:
+        pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    print(f"[SUCCESS] Job added successfully! Node ID: {new_id}")
+    print(f"[SUCCESS] Graph saved with {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+
+    return {
+        'id': int(new_id),
+        'title': job_title,
+        'sector': sector,
+        'industry': industry,
+        'connections': len(list(G.neighbors(new_id)))
+    }
+
+
+def insert_job_node(G, new_id, job_title, sector, industry, job_details, embedding, **extra_attrs):
+    """
+    Insert a job node into an in-memory graph and update edges (no disk I/O).
+    See add_job_to_graph for the edge rules.
+    """
+    heaps = TopKEdgeHeaps.from_graph(G, TOP_K)
 
     # Add node to graph with ALL fields (matching original graph structure)
     G.add_node(new_id,
@@ -342,7 +384,8 @@ def add_job_to_graph(job_title, sector, industry, job_details, embedding, graph_
                job_description=job_details['job_description'],
                key_skills=job_details['key_skills'],
                responsibilities=job_details['responsibilities'],
-               embedding=embedding)
+               embedding=embedding,
+               **extra_attrs)
 
     print(f"Finding similar jobs to connect...")
     # Find top-k most similar jobs using EXISTING embeddings
@@ -361,39 +404,42 @@ def add_job_to_graph(job_title, sector, industry, job_details, embedding, graph_
 
     # Connect to top 12 most similar jobs (similar to version2 top_k=12)
     similarities.sort(key=lambda x: x[1], reverse=True)
-    top_k = 12
 
-    for node_id, similarity in similarities[:top_k]:
-        if similarity >= 0.65:  # Use version2 threshold
+    own_edges = []
+    for node_id, similarity in similarities[:TOP_K]:
+        if similarity >= SIMILARITY_THRESHOLD:  # Use version2 threshold
             G.add_edge(new_id, node_id, weight=float(similarity))
+            own_edges.append((node_id, float(similarity)))
             print(f"  Connected to: {G.nodes[node_id]['job_title']} (similarity: {similarity:.3f})")
 
+    # Reverse-edge refresh: existing nodes whose weakest top-k edge is beaten by
+    # the newcomer take it into their own top-k (O(log k) per affected node).
+    refreshed = 0
+    dropped = 0
+    for node_id, similarity in similarities:
+        if similarity < SIMILARITY_THRESHOLD:
+            break
+        accepted, evicted = heaps.offer(node_id, new_id, float(similarity))
+        if not accepted:
+            continue
+        refreshed += 1
+        if not G.has_edge(new_id, node_id):
+            G.add_edge(new_id, node_id, weight=float(similarity))
+        if evicted == EMPTY or evicted == new_id:
+            continue
+        # Keep the displaced edge if the other endpoint still ranks it in its own top-k.
+        if G.has_edge(node_id, evicted) and not (evicted in heaps.row_of and heaps.contains(evicted, node_id)):
+            G.remove_edge(node_id, evicted)
+            dropped += 1
+
+    heaps.add_node(new_id, own_edges)
+    heaps.save_to_graph(G)
+    print(f"  Reverse-edge refresh: {refreshed} neighbours updated, {dropped} displaced edges removed")
+
     # No bridge logic: if the node has zero neighbors after thresholding, it
     # remains isolated. This keeps graph construction consistent with
     # similarity-only edges.
-
-    # Save updated graph (with backup)
-    print(f"Saving updated graph...")
-    # Create backup before modifying
-    backup_path = graph_path.parent / f"job_graph_backup_{max_id}.gpickle"
-    import shutil
-    shutil.copy2(graph_path, backup_path)
-    print(f"  Backup saved: {backup_path.name}")
-
-    # Save new graph (ONLY the graph file is regenerated, not embeddings)
-    with open(graph_path, 'wb') as f:
-        pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL)
-
-    print(f"[SUCCESS] Job added successfully! Node ID: {new_id}")
-    print(f"[SUCCESS] Graph saved with {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
-
-    return {
-        'id': int(new_id),
-        'title': job_title,
-        'sector': sector,
-        'industry': industry,
-        'connections': len(list(G.neighbors(new_id)))
-    }
+    return G
 
 
 if __name__ == '__main__':
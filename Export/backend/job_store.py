@@ -0,0 +1,230 @@
+"""
+SQLite-backed job metadata store.
+
+Replaces the append-only core_jobs_with_details.csv / core_jobs_with_embeddings.csv
+files as the write target for new jobs. Rows are keyed by (job_title, industry_name)
+with indexes for title and industry lookups, and appends are batched into a single
+transaction. The NAICS industry table lives in the same database.
+
+The CSVs remain the interchange format:
+
+    python job_store.py import     # load today's CSVs (and NAICS) into the store
+    python job_store.py export     # regenerate the CSVs from the store
+"""
+
+import csv
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent.parent / "version5" / "data" / "industry"
+STORE_PATH = DATA_DIR / "core_jobs.sqlite"
+DETAILS_CSV_PATH = DATA_DIR / "core_jobs_with_details.csv"
+EMB_CSV_PATH = DATA_DIR / "core_jobs_with_embeddings.csv"
+NAICS_PATH = DATA_DIR / "focused_naics_4digit.csv"
+
+JOB_COLUMNS = [
+    'industry_code', 'industry_name', 'sector_name', 'job_title',
+    'job_description', 'key_skills', 'responsibilities',
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    industry_code TEXT,
+    industry_name TEXT NOT NULL,
+    sector_name TEXT,
+    job_title TEXT NOT NULL,
+    job_description TEXT,
+    key_skills TEXT,
+    responsibilities TEXT,
+    embedding_index INTEGER,
+    node_id INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_title_industry ON jobs (job_title COLLATE NOCASE, industry_name);
+CREATE INDEX IF NOT EXISTS idx_jobs_title ON jobs (job_title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_jobs_industry ON jobs (industry_name);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_embedding_index ON jobs (embedding_index) WHERE embedding_index IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS naics (
+    industry_name TEXT PRIMARY KEY,
+    sector_name TEXT,
+    naics_code TEXT
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO jobs (industry_code, industry_name, sector_name, job_title,
+                  job_description, key_skills, responsibilities, embedding_index, node_id)
+VALUES (:industry_code, :industry_name, :sector_name, :job_title,
+        :job_description, :key_skills, :responsibilities, :embedding_index, :node_id)
+ON CONFLICT (job_title COLLATE NOCASE, industry_name) DO UPDATE SET
+    industry_code = excluded.industry_code,
+    sector_name = excluded.sector_name,
+    job_description = excluded.job_description,
+    key_skills = excluded.key_skills,
+    responsibilities = excluded.responsibilities,
+    embedding_index = COALESCE(excluded.embedding_index, jobs.embedding_index),
+    node_id = COALESCE(excluded.node_id, jobs.node_id)
+"""
+
+
+def _normalize_row(row):
+    out = {col: ('' if row.get(col) is None else str(row.get(col))) for col in JOB_COLUMNS}
+    for col in ('embedding_index', 'node_id'):
+        value = row.get(col)
+        out[col] = int(value) if value not in (None, '') else None
+    return out
+
+
+class JobStore:
+    """Indexed job metadata + NAICS lookup backed by a single SQLite file."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # -----------------------
+    # Writes
+    # -----------------------
+    def append_jobs(self, rows):
+        """
+        Insert or update many jobs in one transaction.
+        Rows are dicts with JOB_COLUMNS plus optional embedding_index / node_id.
+        """
+        rows = [_normalize_row(r) for r in rows]
+        if not rows:
+            return 0
+        with self._lock, self.conn:
+            self.conn.executemany(UPSERT_SQL, rows)
+        return len(rows)
+
+    def append_job(self, row):
+        return self.append_jobs([row])
+
+    def replace_naics(self, industries):
+        """Replace the NAICS table from {industry_name: {'sector': ..., 'code': ...}}."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM naics")
+            self.conn.executemany(
+                "INSERT INTO naics (industry_name, sector_name, naics_code) VALUES (?, ?, ?)",
+                [(name, info.get('sector', ''), str(info.get('code', ''))) for name, info in industries.items()],
+            )
+
+    # -----------------------
+    # Reads
+    # -----------------------
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def find_by_title(self, job_title):
+        cur = self.conn.execute(
+            "SELECT * FROM jobs WHERE job_title = ? COLLATE NOCASE ORDER BY id", (job_title,)
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+    def find_by_industry(self, industry_name):
+        cur = self.conn.execute(
+            "SELECT * FROM jobs WHERE industry_name = ? ORDER BY id", (industry_name,)
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+    def get_job(self, job_title, industry_name):
+        row = self.conn.execute(
+            "SELECT * FROM jobs WHERE job_title = ? COLLATE NOCASE AND industry_name = ?",
+            (job_title, industry_name),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def iter_jobs(self):
+        for row in self.conn.execute("SELECT * FROM jobs ORDER BY id"):
+            yield dict(row)
+
+    def naics_map(self):
+        cur = self.conn.execute("SELECT industry_name, sector_name, naics_code FROM naics")
+        return {r['industry_name']: {'sector': r['sector_name'], 'code': r['naics_code']} for r in cur}
+
+    # -----------------------
+    # CSV import / export
+    # -----------------------
+    def import_csv(self, details_csv=DETAILS_CSV_PATH, embeddings_csv=EMB_CSV_PATH, naics_csv=NAICS_PATH):
+        """Load the legacy CSVs into the store. Safe to re-run (rows are upserted)."""
+        imported = 0
+        for path in (details_csv, embeddings_csv):
+            if path and Path(path).exists():
+                with open(path, newline='', encoding='utf-8') as f:
+                    imported += self.append_jobs(csv.DictReader(f))
+        if naics_csv and Path(naics_csv).exists():
+            self.replace_naics(read_naics_csv(naics_csv))
+        return imported
+
+    def export_csv(self, details_csv=DETAILS_CSV_PATH, embeddings_csv=EMB_CSV_PATH):
+        """Write core_jobs_with_details.csv and core_jobs_with_embeddings.csv from the store."""
+        with open(details_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(JOB_COLUMNS)
+            for row in self.iter_jobs():
+                writer.writerow([row[c] for c in JOB_COLUMNS])
+
+        with open(embeddings_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(JOB_COLUMNS + ['embedding_index'])
+            cur = self.conn.execute(
+                "SELECT * FROM jobs WHERE embedding_index IS NOT NULL ORDER BY embedding_index"
+            )
+            for row in cur:
+                writer.writerow([row[c] for c in JOB_COLUMNS] + [row['embedding_index']])
+
+
+def read_naics_csv(path=NAICS_PATH):
+    """Parse the NAICS CSV into {industry_name: {'sector': ..., 'code': ...}}."""
+    industries = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            industries[row['industry_name']] = {
+                'sector': row['sector_name'],
+                'code': row['naics_code'],
+            }
+    return industries
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(path=STORE_PATH):
+    """Process-wide store. On first creation, seeds itself from the legacy CSVs."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            is_new = not Path(path).exists()
+            _store = JobStore(path)
+            if is_new:
+                imported = _store.import_csv()
+                if imported:
+                    print(f"[OK] Imported {imported} jobs from CSV into {Path(path).name}")
+        return _store
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    store = JobStore(STORE_PATH)
+    if command == 'import':
+        n = store.import_csv()
+        print(f"[OK] Imported {n} rows into {STORE_PATH} ({store.count()} jobs total)")
+    elif command == 'export':
+        store.export_csv()
+        print(f"[OK] Exported {store.count()} jobs to {DETAILS_CSV_PATH.name} and {EMB_CSV_PATH.name}")
+    else:
+        print("Usage: python job_store.py [import|export]")
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+CPU-only embedding backend: ONNX-exported, int8-quantized all-mpnet-base-v2.
+
+Produces the same 768-dim, L2-normalized vectors as the sentence-transformers
+model used to build core_jobs_with_embeddings.npz (mean pooling + normalize),
+so new jobs can be embedded locally without Modal or a full-precision model.
+
+Setup (one-time, needs optimum + onnxruntime):
+    python onnx_embeddings.py export
+
+Checks:
+    python onnx_embeddings.py parity      # cosine vs stored embeddings (must be >= 0.99)
+    python onnx_embeddings.py benchmark   # texts/sec at the configured batch size/threads
+    python -m pytest test_onnx_embeddings.py   # parity as a regression test (skips without the model)
+
+Env:
+    ONNX_MODEL_DIR         where the exported model lives
+    EMBEDDING_BATCH_SIZE   texts per session run (default 32)
+    EMBEDDING_THREADS      onnxruntime intra-op threads (default: all cores)
+"""
+
+import csv
+import functools
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+MODEL_NAME = 'sentence-transformers/all-mpnet-base-v2'
+MAX_SEQ_LENGTH = 384  # all-mpnet-base-v2 max_seq_length
+
+DATA_DIR = Path(__file__).parent.parent.parent / "version5" / "data" / "industry"
+EMB_NPZ_PATH = DATA_DIR / "core_jobs_with_embeddings.npz"
+EMB_CSV_PATH = DATA_DIR / "core_jobs_with_embeddings.csv"
+ONNX_MODEL_DIR = Path(os.environ.get('ONNX_MODEL_DIR', str(DATA_DIR / "onnx" / "all-mpnet-base-v2-int8")))
+BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', '32'))
+NUM_THREADS = int(os.environ.get('EMBEDDING_THREADS', '0'))  # 0 = let onnxruntime use all cores
+
+QUANTIZED_FILE = 'model_quantized.onnx'
+PARITY_MIN_COSINE = 0.99
+
+
+def export_quantized_model(out_dir=ONNX_MODEL_DIR):
+    """Export all-mpnet-base-v2 to ONNX and apply dynamic int8 quantization."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoTokenizer
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"Exporting {MODEL_NAME} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(MODEL_NAME, export=True)
+    model.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(out_dir)
+
+    print("Quantizing weights to int8...")
+    quantize_dynamic(
+        model_input=str(out_dir / 'model.onnx'),
+        model_output=str(out_dir / QUANTIZED_FILE),
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    print(f"[OK] Quantized model saved to {out_dir / QUANTIZED_FILE}")
+    return out_dir / QUANTIZED_FILE
+
+
+class OnnxEmbedder:
+    """Batched sentence embeddings from the quantized ONNX model."""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, batch_size=BATCH_SIZE, num_threads=NUM_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / QUANTIZED_FILE
+        if not model_path.exists():
+            raise FileNotFoundError(f"{model_path} not found. Run: python onnx_embeddings.py export")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        pad_id = self.tokenizer.token_to_id('<pad>')
+        if pad_id is None:
+            self.tokenizer.enable_padding()
+        else:
+            self.tokenizer.enable_padding(pad_id=pad_id, pad_token='<pad>')
+        self.batch_size = max(1, int(batch_size))
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalize (matches sentence-transformers)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def embed(self, texts):
+        """Embed a list of texts; returns an (n, 768) float32 array."""
+        if isinstance(texts, str):
+            texts = [texts]
+        out = [self._embed_batch(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.vstack(out) if out else np.zeros((0, 768), dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=1)
+def get_onnx_embedder():
+    """Process-wide embedder (the session is loaded once)."""
+    return OnnxEmbedder()
+
+
+def _stored_texts_and_embeddings(limit):
+    with np.load(EMB_NPZ_PATH) as data:
+        embeddings = data['embeddings']
+    texts, rows = [], []
+    with open(EMB_CSV_PATH, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            # Same text format as generate_embedding_via_modal
+            texts.append(f"{row['job_title']} | {row['job_description']} | {row['key_skills']} | {row['responsibilities']}")
+            rows.append(int(row['embedding_index']))
+            if len(texts) >= limit:
+                break
+    return texts, embeddings[rows]
+
+
+def check_parity(limit=200):
+    """Compare ONNX vectors with stored embeddings. Returns (min_cosine, mean_cosine)."""
+    texts, stored = _stored_texts_and_embeddings(limit)
+    ours = get_onnx_embedder().embed(texts)
+    stored = stored / np.linalg.norm(stored, axis=1, keepdims=True)
+    cosines = (ours * stored).sum(axis=1)
+    return float(cosines.min()), float(cosines.mean())
+
+
+def benchmark(n_texts=256, batch_sizes=(1, 8, 32, 64)):
+    """Print throughput (texts/sec) for several batch sizes."""
+    texts, _ = _stored_texts_and_embeddings(n_texts)
+    for batch_size in batch_sizes:
+        embedder = OnnxEmbedder(batch_size=batch_size)
+        embedder.embed(texts[:batch_size])  # warm-up
+        t0 = time.perf_counter()
+        embedder.embed(texts)
+        elapsed = time.perf_counter() - t0
+        print(f"batch_size={batch_size:<3} threads={NUM_THREADS or 'all'} | {len(texts) / elapsed:8.1f} texts/sec | {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'export':
+        export_quantized_model()
+    elif command == 'parity':
+        min_cos, mean_cos = check_parity()
+        print(f"Parity vs stored embeddings | min_cosine={min_cos:.4f} | mean_cosine={mean_cos:.4f}")
+        if min_cos < PARITY_MIN_COSINE:
+            print(f"[FAIL] min cosine below {PARITY_MIN_COSINE}")
+            sys.exit(1)
+        print("[OK] Parity check passed")
+    elif command == 'benchmark':
+        benchmark()
+    else:
+        print("Usage: python onnx_embeddings.py [export|parity|benchmark]")
+        sys.exit(1)
@@ -0,0 +1,79 @@
+"""
+Tests for job_commit against throwaway stores.
+
+Run:
+    cd Export/backend && python -m pytest test_job_commit.py
+"""
+
+import os
+import pickle
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')  # job_manager builds its OpenAI client at import
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import job_commit
+from job_store import JobStore
+
+DETAILS = {'job_description': 'Builds models', 'key_skills': 'Python', 'responsibilities': 'Ship models'}
+
+
+@pytest.fixture
+def graph_path(tmp_path, monkeypatch):
+    """One-job graph, NPZ and store in tmp_path, wired into job_commit."""
+    G = nx.Graph()
+    G.add_node(0, job_title='Data Analyst', sector_name='Tech', industry_name='Software',
+               embedding=np.array([1, 0, 0, 0], dtype=np.float32), embedding_index=0)
+    path = tmp_path / 'graph.gpickle'
+    with open(path, 'wb') as f:
+        pickle.dump(G, f)
+
+    npz_path = tmp_path / 'embeddings.npz'
+    np.savez_compressed(npz_path, embeddings=np.array([[1, 0, 0, 0]], dtype=np.float32))
+
+    store = JobStore(tmp_path / 'jobs.sqlite')
+    store.append_job({'industry_name': 'Software', 'sector_name': 'Tech', 'job_title': 'Data Analyst',
+                      'embedding_index': 0, 'node_id': 0})
+
+    monkeypatch.setattr(job_commit, 'EMB_NPZ_PATH', npz_path)
+    monkeypatch.setattr(job_commit, 'JOURNAL_DIR', tmp_path / 'journal')
+    monkeypatch.setattr(job_commit, 'get_store', lambda: store)
+    monkeypatch.setattr(job_commit, 'load_naics_industries', lambda: {})
+    return path
+
+
+def test_commit_same_title_twice_returns_existing_job(graph_path):
+    first = job_commit.commit_new_job('ML Engineer', 'Tech', 'Software', DETAILS,
+                                      np.array([0.9, 0.1, 0, 0], dtype=np.float32), graph_path)
+    second = job_commit.commit_new_job('ml engineer', 'Tech', 'Software', DETAILS,
+                                       np.array([0.8, 0.2, 0, 0], dtype=np.float32), graph_path)
+
+    assert not first.get('existing')
+    assert second['existing'] and second['id'] == first['id']
+    report = job_commit.fsck(graph_path)
+    assert report['ok'], report['errors']
+    assert (report['graph_nodes'], report['store_rows'], report['embedding_rows']) == (2, 2, 2)
+
+
+def test_recover_quarantines_record_that_cannot_apply(graph_path):
+    # Claims embedding row 0, which already holds a different vector.
+    bad = {
+        'txid': '00000000_deadbeef', 'node_id': 1, 'embedding_index': 0, 'job_title': 'Ghost Job',
+        'sector': 'Tech', 'industry': 'Software', 'naics_code': '', 'job_details': DETAILS,
+        'embedding': [0.0, 1.0, 0.0, 0.0],
+    }
+    job_commit._write_record(bad)
+
+    assert job_commit.recover(graph_path) == []
+    # The next commit is no longer blocked by the bad record.
+    result = job_commit.commit_new_job('ML Engineer', 'Tech', 'Software', DETAILS,
+                                       np.array([0.9, 0.1, 0, 0], dtype=np.float32), graph_path)
+    assert result['id'] == 1
+
+    report = job_commit.fsck(graph_path)
+    assert report['pending'] == []
+    assert [r['txid'] for r in report['quarantined']] == [bad['txid']]
+    assert 'different vector' in report['quarantined'][0]['error']
+    assert not report['ok']
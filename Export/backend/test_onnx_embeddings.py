@@ -0,0 +1,33 @@
+"""
+Parity test for the int8 ONNX embedding backend (same check as `python onnx_embeddings.py parity`).
+
+Skips unless onnxruntime, tokenizers, the exported model and the stored embeddings are present.
+
+Run:
+    cd Export/backend && python -m pytest test_onnx_embeddings.py
+"""
+
+import pytest
+
+import onnx_embeddings
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('tokenizers')
+
+if not (onnx_embeddings.ONNX_MODEL_DIR / onnx_embeddings.QUANTIZED_FILE).exists():
+    pytest.skip(f"no exported model in {onnx_embeddings.ONNX_MODEL_DIR} (python onnx_embeddings.py export)",
+                allow_module_level=True)
+if not (onnx_embeddings.EMB_NPZ_PATH.exists() and onnx_embeddings.EMB_CSV_PATH.exists()):
+    pytest.skip("stored embeddings not found", allow_module_level=True)
+
+
+def test_parity_with_stored_embeddings():
+    min_cos, mean_cos = onnx_embeddings.check_parity(limit=50)
+    assert min_cos >= onnx_embeddings.PARITY_MIN_COSINE, f"min_cosine={min_cos:.4f} mean_cosine={mean_cos:.4f}"
+
+
+def test_batch_size_does_not_change_vectors():
+    texts, _ = onnx_embeddings._stored_texts_and_embeddings(8)
+    one_by_one = onnx_embeddings.OnnxEmbedder(batch_size=1).embed(texts)
+    batched = onnx_embeddings.OnnxEmbedder(batch_size=8).embed(texts)
+    assert ((one_by_one * batched).sum(axis=1) > 0.999).all()